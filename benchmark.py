@@ -0,0 +1,1014 @@
+"""
+Benchmarks del pipeline edge (offline, sin micrófono ni Supabase)
+Ejecutar: python benchmark.py [--output resultados.json] [--compare referencia.json]
+
+Para aproximar el perfil de una Raspberry Pi en una máquina de desarrollo,
+el proceso se fija a un único núcleo y las librerías numéricas a un thread.
+Los números de referencia deben tomarse en el propio dispositivo ARM.
+
+Cada sección imprime un resumen legible y registra sus métricas en un JSON
+(valor, unidad y sentido de mejora). Con ``--compare`` se contrasta contra
+los resultados de una versión anterior y el proceso termina con código 1 si
+alguna métrica empeora más que ``--tolerance``: así una regresión aparece
+antes de flashear los dispositivos. Solo se comparan ejecuciones de las
+mismas secciones, y con ``--repeat`` cada métrica es la mediana de varias
+corridas (las latencias de cola varían mucho entre una corrida y otra).
+"""
+
+import os
+
+# Un solo thread para BLAS/OpenMP: igual que un núcleo de la Pi
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+# main.py exige FARM_ID al importarse; los benchmarks no envían nada a la nube
+os.environ.setdefault("FARM_ID", "benchmark-offline")
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from dataclasses import replace
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import main
+
+
+SAMPLE_RATE = main.AudioConfig.sample_rate
+CHUNK_SIZE = main.AudioConfig.chunk_size
+
+
+def pin_to_single_core() -> None:
+    """Fija el proceso a un núcleo (solo Linux) para simular el presupuesto de la Pi."""
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+        except OSError:
+            pass
+
+
+def synthetic_chunks(num_chunks: int, seed: int = 0) -> np.ndarray:
+    """
+    Genera audio sintético de granja: ruido de fondo con chillidos intercalados.
+
+    Args:
+        num_chunks: Número de chunks a generar
+        seed: Semilla del generador aleatorio
+
+    Returns:
+        Array int16 (chunks × muestras)
+    """
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0.0, 40.0, size=(num_chunks, CHUNK_SIZE))
+
+    # Un chillido de ~3 kHz en uno de cada 20 chunks
+    t = np.arange(CHUNK_SIZE) / SAMPLE_RATE
+    squeal = 6000.0 * np.sin(2 * np.pi * 3000.0 * t)
+    audio[::20] += squeal
+
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def legacy_analyze(audio_data: bytes, gain: float) -> Tuple[float, float]:
+    """Implementación de SimpleAudioAnalyzer.analyze de v0.8 (referencia 'antes')."""
+    audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float64)
+    mean_squared = np.mean(audio_array ** 2)
+    rms = 0.0 if mean_squared <= 0 or np.isnan(mean_squared) else np.sqrt(mean_squared) * gain
+    zcr = len(np.nonzero(np.diff(audio_array > 0))[0])
+    return float(rms), float(zcr)
+
+
+def measure_rate(func: Callable[[], int], min_seconds: float = 1.0) -> float:
+    """
+    Ejecuta ``func`` repetidamente y mide chunks procesados por segundo.
+
+    Args:
+        func: Función que procesa un lote y retorna cuántos chunks procesó
+        min_seconds: Duración mínima de la medición
+
+    Returns:
+        Chunks por segundo
+    """
+    func()  # Calentamiento (reserva de buffers de trabajo)
+    processed = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_seconds:
+        processed += func()
+        elapsed = time.perf_counter() - start
+    return processed / elapsed
+
+
+def wait_until(condition: Callable[[], bool], timeout: float) -> bool:
+    """
+    Espera a que se cumpla una condición, con tope de tiempo.
+
+    Args:
+        condition: Función a evaluar
+        timeout: Espera máxima en segundos
+
+    Returns:
+        True si la condición se cumplió antes del timeout
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+class BenchmarkResults:
+    """Métricas registradas por las secciones, listas para volcarse a JSON."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Dict[str, object]] = {}
+        self._runs: Dict[str, List[float]] = {}
+
+    def record(
+        self,
+        name: str,
+        value: float,
+        unit: str,
+        better: str = "lower",
+        noise: float = 0.0
+    ) -> None:
+        """
+        Registra una métrica.
+
+        Si la sección corre varias veces (``--repeat``), el valor es la
+        mediana de todas las corridas.
+
+        Args:
+            name: Identificador estable (ej. "analyzer.batch_47.chunks_per_s")
+            value: Valor medido
+            unit: Unidad del valor
+            better: "higher" o "lower", sentido en que la métrica mejora
+            noise: Cambio absoluto que nunca cuenta como regresión (métricas
+                muy pequeñas, como latencias de décimas de ms, son ruidosas)
+        """
+        runs = self._runs.setdefault(name, [])
+        runs.append(float(value))
+        self.metrics[name] = {
+            "value": float(np.median(runs)),
+            "unit": unit,
+            "better": better,
+            "noise": noise,
+            "runs": list(runs),
+        }
+
+    def to_json(self) -> Dict[str, object]:
+        """
+        Arma el documento de resultados con el contexto de la plataforma.
+
+        Returns:
+            Diccionario serializable con plataforma, versiones y métricas
+        """
+        return {
+            "schema": 1,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "platform": {
+                "machine": platform.machine(),
+                "system": platform.system(),
+                "processor": platform.processor(),
+            },
+            "versions": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "soundfile": getattr(main.soundfile, "__version__", None),
+            },
+            "metrics": self.metrics,
+        }
+
+
+def compare_results(
+    current: Dict[str, Dict[str, object]],
+    baseline: Dict[str, Dict[str, object]],
+    tolerance: float
+) -> List[str]:
+    """
+    Compara las métricas contra una ejecución de referencia.
+
+    Args:
+        current: Métricas de esta ejecución
+        baseline: Métricas de la referencia
+        tolerance: Empeoramiento relativo permitido (0.15 = 15%)
+
+    Returns:
+        Descripción de cada métrica que empeoró más que la tolerancia
+    """
+    regressions = []
+    for name, metric in sorted(current.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        value, old = metric["value"], reference["value"]
+        if abs(value - old) <= metric.get("noise", 0.0):
+            continue
+        if metric["better"] == "higher":
+            worse = value < old * (1 - tolerance)
+        else:
+            worse = value > old * (1 + tolerance)
+        if worse:
+            change = (value - old) / old * 100 if old else float("inf")
+            regressions.append(f"{name}: {old:.4g} → {value:.4g} {metric['unit']} ({change:+.1f}%)")
+    return regressions
+
+
+def bench_analyzer(results: BenchmarkResults) -> None:
+    """Compara el throughput del análisis RMS/ZCR antes y después del kernel por lotes."""
+    print("\n1. SimpleAudioAnalyzer: chunks/segundo")
+
+    chunks = synthetic_chunks(470)  # ~10 s de audio a 48 kHz
+    chunk_bytes = [row.tobytes() for row in chunks]
+    analyzer = main.SimpleAudioAnalyzer(main.AnalysisConfig())
+    gain = analyzer.config.gain
+    realtime_rate = SAMPLE_RATE / CHUNK_SIZE
+
+    def run_legacy() -> int:
+        for data in chunk_bytes:
+            legacy_analyze(data, gain)
+        return len(chunk_bytes)
+
+    def run_analyze() -> int:
+        for row in chunks:
+            analyzer.analyze(row)
+        return len(chunks)
+
+    rates = [
+        ("v0.8 analyze (float64)", "legacy", measure_rate(run_legacy)),
+        ("analyze (float32, 1 chunk)", "analyze", measure_rate(run_analyze)),
+    ]
+
+    for batch_size in (8, 47, 470):
+        batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+
+        def run_batch(batches=batches) -> int:
+            for batch in batches:
+                analyzer.analyze_batch(batch)
+            return len(chunks)
+
+        rates.append((f"analyze_batch ({batch_size} chunks)", f"batch_{batch_size}", measure_rate(run_batch)))
+
+    baseline = rates[0][2]
+    for name, key, rate in rates:
+        results.record(f"analyzer.{key}.chunks_per_s", rate, "chunks/s", better="higher")
+        print(
+            f"   {name:<30} {rate:>12,.0f} chunks/s "
+            f"({rate / realtime_rate:>8,.0f}x tiempo real, {rate / baseline:5.1f}x vs v0.8)"
+        )
+
+
+def bench_spectral(results: BenchmarkResults) -> None:
+    """Mide si el extractor espectral sostiene tiempo real en un núcleo."""
+    print("\n2. SpectralAudioAnalyzer: factor de tiempo real (CPU)")
+
+    chunks = synthetic_chunks(470)
+    audio_seconds = chunks.size / SAMPLE_RATE
+    analyzer = main.SpectralAudioAnalyzer(
+        main.AnalysisConfig(use_spectral_features=True),
+        SAMPLE_RATE
+    )
+
+    for batch_size in (1, 47):
+        analyzer.extractor.reset()
+        start = time.process_time()
+        for i in range(0, len(chunks), batch_size):
+            analyzer.extract_features(chunks[i:i + batch_size])
+        cpu_seconds = time.process_time() - start
+
+        results.record(f"spectral.batch_{batch_size}.cpu_percent", 100 * cpu_seconds / audio_seconds, "%")
+        print(
+            f"   lotes de {batch_size:>2} chunks: {audio_seconds / cpu_seconds:>8,.1f}x tiempo real "
+            f"({100 * cpu_seconds / audio_seconds:.2f}% de un núcleo)"
+        )
+
+
+def bench_cascade(results: BenchmarkResults) -> None:
+    """Compara la cascada con correr las etapas espectrales en todos los chunks."""
+    print("\n3. CascadeAnalyzer: CPU en un granero mayormente silencioso")
+
+    rng = np.random.default_rng(1)
+    # 60 s de silencio (ruido bajo) con un 5% de chunks activos
+    chunks = rng.normal(0.0, 8.0, size=(2820, CHUNK_SIZE))
+    active = rng.random(len(chunks)) < 0.05
+    chunks[active] = synthetic_chunks(int(active.sum()), seed=2) * 20.0
+    chunks = np.clip(chunks, -32768, 32767).astype(np.int16)
+    audio_seconds = chunks.size / SAMPLE_RATE
+
+    config = main.AnalysisConfig(use_cascade=True)
+    always = main.SpectralAudioAnalyzer(config, SAMPLE_RATE)
+    cascade = main.CascadeAnalyzer(config, SAMPLE_RATE)
+
+    timings = {}
+    for name, key, analyzer in (("todas las etapas", "all_stages", always), ("cascada", "cascade", cascade)):
+        start = time.process_time()
+        for i in range(0, len(chunks), 47):
+            features = analyzer.extract_features(chunks[i:i + 47])
+            for chunk_features in features:
+                analyzer.continues_event(chunk_features)
+        timings[name] = time.process_time() - start
+        results.record(f"cascade.{key}.cpu_percent", 100 * timings[name] / audio_seconds, "%")
+        print(f"   {name:<18} {100 * timings[name] / audio_seconds:6.3f}% de un núcleo")
+
+    for stage in cascade.get_stage_stats():
+        print(
+            f"   etapa {stage.name:<12} pasa {stage.pass_rate:6.1%} "
+            f"({stage.cpu_per_chunk * 1e6:7.1f} µs/chunk evaluado)"
+        )
+    print(f"   CPU ahorrada (estimada por la cascada): {cascade.estimated_cpu_saved():.3f}s "
+          f"/ medida: {timings['todas las etapas'] - timings['cascada']:.3f}s")
+
+
+def bench_model_worker(results: BenchmarkResults) -> None:
+    """Latencia y throughput del proceso de inferencia según el tamaño de micro-batch."""
+    print("\n4. ModelAnalyzer: inferencia fuera de proceso (MLP NumPy de referencia)")
+
+    num_windows = 2000
+    frame = main.FeatureFrame(
+        volume=800.0,
+        frequency=120.0,
+        band_energies=np.full(main.SpectralConfig.n_bands, -40.0, dtype=np.float32),
+        spectral_centroid=3000.0,
+        spectral_flatness=0.2
+    )
+
+    for batch_size in (1, 4, 16, 64):
+        model_config = main.ModelConfig(max_batch_size=batch_size, request_slots=num_windows)
+        analyzer = main.ModelAnalyzer(
+            main.AnalysisConfig(model=model_config),
+            SAMPLE_RATE,
+            backend=main.NumpyMLPBackend.random(
+                (main.SpectralConfig.n_bands + 4) * model_config.context_frames
+            )
+        )
+
+        # Costo del backend en el mismo proceso, sin IPC
+        windows = np.random.default_rng(0).normal(size=(batch_size, analyzer.input_dim)).astype(np.float32)
+        rate = measure_rate(lambda: (analyzer.backend.predict(windows), batch_size)[1], min_seconds=0.3)
+
+        analyzer.submit(frame)  # Arranque del proceso (spawn) fuera de la medición
+        if not wait_until(lambda: analyzer.get_model_stats().completed >= 1, timeout=30.0):
+            analyzer.close()
+            print("   ❌ El proceso de inferencia no respondió")
+            return
+
+        start = time.perf_counter()
+        for _ in range(num_windows):
+            analyzer.submit(frame)
+        wait_until(lambda: analyzer.get_model_stats().completed >= num_windows + 1, timeout=30.0)
+        elapsed = time.perf_counter() - start
+
+        stats = analyzer.get_model_stats()
+        analyzer.close()
+        results.record(f"model.batch_{batch_size}.windows_per_s", num_windows / elapsed, "ventanas/s", better="higher")
+        results.record(f"model.batch_{batch_size}.latency_p99_ms", stats.latency_p99_ms, "ms", noise=15.0)
+        print(
+            f"   batch≤{batch_size:<3} {num_windows / elapsed:>9,.0f} ventanas/s "
+            f"(backend solo: {rate:>9,.0f}/s), batch medio {stats.mean_batch_size:5.1f}, "
+            f"latencia p50 {stats.latency_p50_ms:6.1f} ms / p99 {stats.latency_p99_ms:6.1f} ms"
+        )
+
+
+def bench_clip_encoding(results: BenchmarkResults) -> None:
+    """Compara CPU de escritura/codificación contra bytes ahorrados por clip (3 s)."""
+    print("\n5. ClipEncoder: CPU de codificación vs bytes a subir (clip de 3 s)")
+    
+    if main.soundfile is None:
+        print("   ⚠ soundfile no instalado: FLAC no disponible, solo se mide WAV")
+    
+    clip = synthetic_chunks(int(3 * SAMPLE_RATE / CHUNK_SIZE) + 1).reshape(-1)[:3 * SAMPLE_RATE]
+    variants = [("wav", None), ("flac", None), ("wav", 16000), ("flac", 16000), ("flac", 22050)]
+    baseline_bytes = None
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for codec, target_rate in variants:
+            config = main.RecordingConfig(codec=codec, target_sample_rate=target_rate)
+            encoder = main.ClipEncoder(config, SAMPLE_RATE, 1)
+            if encoder.codec != codec:
+                continue
+            
+            path = os.path.join(directory, f"clip_{codec}_{target_rate}{encoder.extension}")
+            runs = 5
+            start = time.process_time()
+            for _ in range(runs):
+                encoder.save(path, clip)
+            cpu_ms = (time.process_time() - start) / runs * 1000
+            
+            size = os.path.getsize(path)
+            baseline_bytes = baseline_bytes or size
+            key = f"clip.{codec}_{encoder.output_rate}"
+            results.record(f"{key}.cpu_ms_per_audio_s", cpu_ms / 3, "ms/s")
+            results.record(f"{key}.kb_per_audio_s", size / 1024 / 3, "KB/s")
+            print(
+                f"   {codec.upper():<4} @ {encoder.output_rate / 1000:5.2f} kHz: "
+                f"{size / 1024:7.1f} KB ({100 * (1 - size / baseline_bytes):5.1f}% menos), "
+                f"CPU {cpu_ms:6.1f} ms"
+            )
+
+
+def bench_multichannel(results: BenchmarkResults) -> None:
+    """CPU por canal-segundo al analizar varios corrales desde un solo proceso."""
+    print("\n6. Multicanal: CPU por canal (cascada, lotes de 47 chunks, 20 s)")
+    
+    num_chunks = 940
+    baseline = None
+    for channels in (1, 4, 8):
+        # Audio intercalado: cada canal con su propia secuencia de chillidos
+        audio = np.stack([synthetic_chunks(num_chunks, seed=c) for c in range(channels)], axis=-1)
+        frames = audio.reshape(num_chunks, CHUNK_SIZE * channels)
+        config = main.AnalysisConfig(use_cascade=True)
+        analyzers = [main.CascadeAnalyzer(config, SAMPLE_RATE) for _ in range(channels)]
+        
+        start = time.process_time()
+        for i in range(0, num_chunks, 47):
+            for channel, block in enumerate(main.deinterleave(frames[i:i + 47], channels)):
+                for chunk_features in analyzers[channel].extract_features(block):
+                    analyzers[channel].continues_event(chunk_features)
+        cpu_seconds = time.process_time() - start
+        
+        channel_seconds = channels * num_chunks * CHUNK_SIZE / SAMPLE_RATE
+        per_channel = 100 * cpu_seconds / channel_seconds
+        baseline = baseline or per_channel
+        results.record(f"multichannel.{channels}ch.cpu_percent_per_channel", per_channel, "%")
+        print(
+            f"   {channels} canal(es): {100 * cpu_seconds / (channel_seconds / channels):6.2f}% de un núcleo en total, "
+            f"{per_channel:6.3f}% por canal ({per_channel / baseline:4.2f}x vs 1 canal)"
+        )
+
+
+# Periodos de PortAudio/ALSA que el driver retiene antes de sobrescribir (overflow)
+HOST_BUFFER_PERIODS = 4
+
+
+def paced_producer(
+    ring: main.AudioRingBuffer,
+    stats: main.CaptureStats,
+    should_stop: Callable[[], bool],
+    on_chunk: Callable[[], None] = lambda: None
+) -> None:
+    """
+    Simula el callback de PortAudio: un chunk por periodo, a ritmo de tiempo real.
+    
+    Cada chunk lleva en sus primeras muestras el instante (monótono) en que
+    el ADC lo habría entregado. Si el productor se atrasa más que el buffer
+    del driver, los chunks intermedios se cuentan como perdidos.
+    """
+    period = CHUNK_SIZE / SAMPLE_RATE
+    chunk = np.zeros(CHUNK_SIZE, dtype=np.int16)
+    due = time.monotonic()
+    while not should_stop():
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        
+        late_periods = int((time.monotonic() - due) / period)
+        if late_periods > HOST_BUFFER_PERIODS:
+            # El driver ya sobrescribió esos periodos
+            lost = late_periods - HOST_BUFFER_PERIODS
+            stats.dropped_frames += lost * CHUNK_SIZE
+            stats.overflow_count += 1
+            due += lost * period
+        
+        chunk[:4] = np.frombuffer(np.float64(due).tobytes(), dtype=np.int16)
+        ring.write(chunk)
+        stats.chunks_captured += 1
+        on_chunk()
+        due += period
+
+
+def _synthetic_capture_main(
+    ring_name: str,
+    num_slots: int,
+    samples_per_chunk: int,
+    config: main.AudioConfig
+) -> None:
+    """Proceso de captura sintético para ProcessMicrophoneCapture (sin micrófono)."""
+    ring = main.SharedAudioRingBuffer(num_slots, samples_per_chunk, name=ring_name)
+    stats = main.CaptureStats()
+    ring.publish_stats(stats)
+    try:
+        paced_producer(ring, stats, lambda: ring.stop_requested, lambda: ring.publish_stats(stats))
+    finally:
+        ring.close()
+
+
+def gil_bound_consumer(
+    wait_for_chunks: Callable[..., Tuple[int, np.ndarray]],
+    start_seq: int,
+    seconds: float,
+    burst: Callable[[], None],
+    burst_every: int = 50
+) -> List[float]:
+    """
+    Consume chunks en orden con ráfagas periódicas de trabajo que retienen el GIL.
+    
+    Args:
+        wait_for_chunks: ``wait_for`` del ring buffer o ``wait_for_chunks`` de la captura
+        start_seq: Primer chunk a consumir
+        seconds: Duración de la medición
+        burst: Trabajo que retiene el GIL (imita un analizador lento o una subida)
+        burst_every: Chunks entre ráfagas
+    
+    Returns:
+        Latencias captura → análisis de cada chunk, en segundos
+    """
+    latencies = []
+    seq = start_seq
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        result = wait_for_chunks(seq, max_chunks=64, timeout=0.5)
+        if result is None:
+            continue
+        first_seq, frames = result
+        now = time.monotonic()
+        for row in frames:
+            latencies.append(now - float(np.frombuffer(row[:4].tobytes(), dtype=np.float64)[0]))
+        seq = first_seq + len(frames)
+        if seq // burst_every != first_seq // burst_every:
+            burst()
+    return latencies
+
+
+def bench_capture_topology(results: BenchmarkResults) -> None:
+    """Latencia y pérdidas de la captura en thread vs en un proceso aparte."""
+    print("\n7. Captura: thread vs proceso aparte, con ráfagas que retienen el GIL (8 s)")
+    
+    # json.dumps en C no suelta el GIL: como serializar un lote grande de eventos
+    payload = [{"rms": float(i), "zcr": i % 97, "labels": ["a", "b", "c"]} for i in range(200_000)]
+    burst = lambda: json.dumps(payload)
+    start = time.perf_counter()
+    burst()
+    print(f"   ráfaga de carga: {(time.perf_counter() - start) * 1000:.0f} ms cada 50 chunks")
+    
+    config = main.AudioConfig()
+    runs = []
+    
+    # Modo thread: el productor compite por el GIL con el consumidor
+    ring = main.AudioRingBuffer(main.ring_buffer_slots(config), CHUNK_SIZE)
+    stats = main.CaptureStats()
+    stop = threading.Event()
+    producer = threading.Thread(target=paced_producer, args=(ring, stats, stop.is_set), daemon=True)
+    producer.start()
+    latencies = gil_bound_consumer(ring.wait_for, 0, 8.0, burst)
+    stop.set()
+    producer.join()
+    runs.append(("thread", latencies, stats))
+    
+    # Modo proceso: el productor tiene su propio intérprete
+    microphone = main.ProcessMicrophoneCapture(config, target=_synthetic_capture_main)
+    microphone.start()
+    latencies = gil_bound_consumer(microphone.wait_for_chunks, microphone.get_write_sequence(), 8.0, burst)
+    microphone.stop()
+    runs.append(("proceso", latencies, microphone.get_capture_stats()))
+    
+    for name, latencies, stats in runs:
+        latencies_ms = np.array(latencies) * 1000
+        key = "thread" if name == "thread" else "process"
+        results.record(f"capture.{key}.latency_p50_ms", np.percentile(latencies_ms, 50), "ms", noise=1.0)
+        results.record(f"capture.{key}.latency_p99_ms", np.percentile(latencies_ms, 99), "ms", noise=50.0)
+        results.record(f"capture.{key}.dropped_chunks", stats.dropped_frames // CHUNK_SIZE, "chunks", noise=1.0)
+        print(
+            f"   {name:<8} latencia captura→análisis p50 {np.percentile(latencies_ms, 50):6.1f} ms / "
+            f"p99 {np.percentile(latencies_ms, 99):6.1f} ms, {stats.overflow_count} overflows, "
+            f"{stats.dropped_frames // CHUNK_SIZE} chunks perdidos de {stats.chunks_captured}"
+        )
+
+
+def write_synthetic_recording(path: str, seconds: float, event_every: int = 400) -> None:
+    """
+    Escribe una grabación WAV sintética: ruido de fondo con eventos fuertes periódicos.
+    
+    Args:
+        path: Ruta del archivo
+        seconds: Duración de la grabación
+        event_every: Un chunk fuerte cada tantos chunks (múltiplo de 20 para caer en un chillido)
+    """
+    audio = synthetic_chunks(int(seconds * SAMPLE_RATE / CHUNK_SIZE)).astype(np.float32) * 0.05
+    audio[::event_every] *= 40.0
+    audio = np.clip(audio, -32768, 32767).astype(np.int16)
+    
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(audio.tobytes())
+
+
+def replay_monitor(
+    path: str,
+    analysis_config: "main.AnalysisConfig",
+    recording_config: "main.RecordingConfig",
+    realtime: bool = False,
+    before_start: Optional[Callable[["main.BioacousticMonitor"], None]] = None
+) -> Tuple["main.BioacousticMonitor", float, float]:
+    """
+    Ejecuta el monitor completo sobre grabaciones hasta agotarlas.
+    
+    Args:
+        path: Archivo de audio o directorio
+        analysis_config: Configuración de análisis
+        recording_config: Configuración de grabación de clips
+        realtime: Reproducir al ritmo de captura real
+        before_start: Se llama con el monitor ya creado, antes de arrancarlo
+        
+    Returns:
+        Tuple (monitor, segundos de reloj, segundos de CPU del proceso)
+    """
+    audio_config = main.WavReplaySource.config_for(path, main.AudioConfig())
+    monitor = main.BioacousticMonitor(
+        audio_config,
+        analysis_config,
+        recording_config,
+        source=main.WavReplaySource(audio_config, path, realtime=realtime)
+    )
+    monitor._display_metrics = lambda *args: None
+    if before_start is not None:
+        before_start(monitor)
+    
+    main.logger.setLevel("WARNING")
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        monitor.start()
+    finally:
+        main.logger.setLevel("INFO")
+    return monitor, time.perf_counter() - start, time.process_time() - cpu_start
+
+
+def bench_replay(results: BenchmarkResults, recordings: Optional[str] = None) -> None:
+    """
+    Reprocesa grabaciones por el pipeline completo del monitor.
+    
+    Args:
+        results: Métricas de la ejecución
+        recordings: Archivo o directorio de grabaciones reales (None = 10 min sintéticos)
+    """
+    print("\n8. WavReplaySource: monitor completo sobre grabaciones, sin micrófono")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        if recordings is None:
+            recordings = os.path.join(directory, "granero.wav")
+            write_synthetic_recording(recordings, 600)
+        
+        audio_config = main.WavReplaySource.config_for(recordings, main.AudioConfig())
+        seconds = sum(
+            main.WavReplaySource.probe(filepath)[2]
+            for filepath in main.WavReplaySource.list_recordings(recordings)
+        ) / audio_config.sample_rate
+        print(f"   {seconds / 60:.1f} min de audio ({recordings})")
+        
+        for name, key, analysis_config in (
+            ("simple", "simple", main.AnalysisConfig()),
+            ("cascada", "cascade", main.AnalysisConfig(use_cascade=True)),
+        ):
+            recording_config = main.RecordingConfig(output_directory=os.path.join(directory, name))
+            monitor, elapsed, _ = replay_monitor(recordings, analysis_config, recording_config)
+            
+            clips = [f for f in os.listdir(recording_config.output_directory) if not f.startswith(".")]
+            stats = monitor.get_monitor_stats()
+            results.record(f"replay.{key}.realtime_factor", seconds / elapsed, "x", better="higher")
+            print(
+                f"   {name:<8} {seconds / elapsed:7.0f}x tiempo real ({elapsed:5.2f} s), "
+                f"{stats.chunks_analyzed}/{stats.chunks_captured} chunks, {len(clips)} clips "
+                f"→ un día de audio en ~{86400 / (seconds / elapsed) / 60:.0f} min"
+            )
+
+
+def bench_trigger_latency(results: BenchmarkResults) -> None:
+    """
+    Latencia de disparo y CPU en tiempo real: del chunk publicado a la alerta.
+    
+    La grabación se reproduce al ritmo de captura, así que la CPU consumida
+    por segundo de audio es la que el monitor necesita en el dispositivo.
+    """
+    print("\n9. Latencia de disparo (chunk publicado → alerta) y CPU por segundo de audio")
+    
+    seconds = 20
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "granero.wav")
+        write_synthetic_recording(path, seconds, event_every=80)
+        
+        # Umbral por encima de los chillidos de fondo: cada evento inyectado es una alerta
+        analysis_config = main.AnalysisConfig(rms_threshold=5000.0, cooldown_seconds=0.5)
+        for name, key, analysis_config in (
+            ("simple", "simple", analysis_config),
+            ("cascada", "cascade", replace(analysis_config, use_cascade=True)),
+        ):
+            arrivals: Dict[int, float] = {}
+            latencies: List[float] = []
+            
+            def instrument(monitor: "main.BioacousticMonitor") -> None:
+                ring = monitor.source._ring
+                write = ring.write
+                handle_alert = monitor._handle_alert
+                
+                def timed_write(data):
+                    arrivals[ring.write_seq] = time.perf_counter()
+                    write(data)
+                
+                def timed_handle_alert(channel, volume, frequency, trigger_seq):
+                    latencies.append(time.perf_counter() - arrivals[trigger_seq])
+                    handle_alert(channel, volume, frequency, trigger_seq)
+                
+                ring.write = timed_write
+                monitor._handle_alert = timed_handle_alert
+            
+            recording_config = main.RecordingConfig(
+                output_directory=os.path.join(directory, name),
+                duration_seconds=1,
+                pre_trigger_seconds=0.5
+            )
+            _, _, cpu_seconds = replay_monitor(
+                path, analysis_config, recording_config, realtime=True, before_start=instrument
+            )
+            
+            if not latencies:
+                print(f"   {name:<8} sin alertas")
+                continue
+            latencies_ms = np.array(latencies) * 1000
+            results.record(f"trigger.{key}.latency_p50_ms", np.percentile(latencies_ms, 50), "ms", noise=1.0)
+            results.record(f"trigger.{key}.latency_max_ms", latencies_ms.max(), "ms", noise=1.0)
+            results.record(f"trigger.{key}.cpu_percent", 100 * cpu_seconds / seconds, "%", noise=0.5)
+            print(
+                f"   {name:<8} {len(latencies):3d} alertas, latencia p50 {np.percentile(latencies_ms, 50):6.2f} ms, "
+                f"máx {latencies_ms.max():6.2f} ms, CPU {100 * cpu_seconds / seconds:5.1f}% por segundo de audio"
+            )
+
+
+def bench_adaptive_thresholds(results: BenchmarkResults) -> None:
+    """Costo por chunk de aprender el piso de ruido (cuantiles P² de RMS y ZCR)."""
+    print("\n10. Umbrales adaptativos: actualización del piso de ruido por chunk")
+
+    rng = np.random.default_rng(3)
+    volumes = rng.lognormal(5.0, 1.0, 50_000).tolist()
+    frequencies = rng.lognormal(4.0, 0.5, 50_000).tolist()
+    chunk_seconds = CHUNK_SIZE / SAMPLE_RATE
+    thresholds = main.AdaptiveThresholds(main.AnalysisConfig(use_adaptive_thresholds=True))
+
+    start = time.process_time()
+    for index, (volume, frequency) in enumerate(zip(volumes, frequencies)):
+        thresholds.update(volume, frequency, index * chunk_seconds)
+    cpu_per_chunk = (time.process_time() - start) / len(volumes)
+
+    results.record("adaptive.update_us", cpu_per_chunk * 1e6, "µs", noise=1.0)
+    results.record("adaptive.cpu_percent", 100 * cpu_per_chunk / chunk_seconds, "%", noise=0.01)
+    stats = thresholds.get_stats()
+    window = volumes[-int(stats.floor_seconds / chunk_seconds) - 1:]
+    print(
+        f"   {cpu_per_chunk * 1e6:6.2f} µs/chunk ({100 * cpu_per_chunk / chunk_seconds:.3f}% de un núcleo), "
+        f"piso RMS {stats.rms_floor:.0f} (mediana exacta de la ventana: {np.median(window):.0f})"
+    )
+
+
+def bench_segments(results: BenchmarkResults) -> None:
+    """CPU y disco de la grabación continua (segmentos de 60 s) sobre 3 min de audio."""
+    print("\n11. Grabación continua: CPU de escritura y bytes por día")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "granero.wav")
+        write_synthetic_recording(path, 180)
+        audio_seconds = 180.0
+
+        for codec in ("flac", "wav"):
+            if codec == "flac" and main.soundfile is None:
+                continue
+            recording_config = main.RecordingConfig(
+                output_directory=os.path.join(directory, f"clips_{codec}"),
+                codec=codec,
+                continuous=True,
+                segments=main.SegmentConfig(directory=os.path.join(directory, f"segmentos_{codec}"))
+            )
+            monitor, _, _ = replay_monitor(path, main.AnalysisConfig(), recording_config)
+            stats = monitor.segments.get_stats()
+            cpu_percent = 100 * stats.write_cpu_seconds / audio_seconds
+            gb_per_day = stats.bytes_written / audio_seconds * 86400 / 1e9
+
+            results.record(f"segments.{codec}.cpu_percent", cpu_percent, "%", noise=0.05)
+            results.record(f"segments.{codec}.gb_per_day", gb_per_day, "GB")
+            print(
+                f"   {codec:<5} {cpu_percent:6.3f}% de un núcleo, {gb_per_day:5.2f} GB/día, "
+                f"{stats.segments_written} segmentos ({stats.segments_with_hits} con disparos), "
+                f"{stats.chunks_lost} chunks perdidos"
+            )
+
+
+def bench_sample_clock(results: BenchmarkResults) -> None:
+    """Error de las marcas de tiempo por chunk: llegada del chunk vs reloj de muestras."""
+    print("\n12. Reloj de muestras: error de fecha por chunk en 1 h con deriva de 50 ppm")
+    
+    rng = np.random.default_rng(5)
+    chunk_seconds = CHUNK_SIZE / SAMPLE_RATE
+    num_chunks = int(3600 / chunk_seconds)
+    true_onsets = 1000.0 + np.arange(num_chunks) * chunk_seconds * (1 + 50e-6)
+    
+    # Sin tiempo ADC: el chunk se fecha al llegar (jitter del scheduler y callbacks tardíos)
+    arrival_delays = rng.exponential(0.002, num_chunks)
+    stalls = rng.random(num_chunks) < 0.002
+    arrival_delays[stalls] += rng.uniform(0.05, 0.15, stalls.sum())
+    arrivals = (true_onsets + arrival_delays).tolist()
+    
+    clock = main.SampleClock(SAMPLE_RATE, CHUNK_SIZE)
+    errors = np.empty(num_chunks)
+    start = time.process_time()
+    for seq, arrival in enumerate(arrivals):
+        clock.observe(seq, arrival, from_adc=False)
+        errors[seq] = clock.onset(seq)
+    cpu_per_chunk = (time.process_time() - start) / num_chunks
+    errors = np.abs(errors - true_onsets)[int(60 / chunk_seconds):]  # Tras el primer minuto
+    
+    for name, values in (("arrival", arrival_delays), ("clock", errors)):
+        results.record(f"clock.{name}.p99_ms", float(np.percentile(values, 99)) * 1000, "ms", noise=0.05)
+        results.record(f"clock.{name}.max_ms", float(values.max()) * 1000, "ms", noise=0.1)
+    results.record("clock.observe_us", cpu_per_chunk * 1e6, "µs", noise=0.5)
+    print(
+        f"   llegada: p99 {np.percentile(arrival_delays, 99) * 1000:6.2f} ms, máx {arrival_delays.max() * 1000:6.1f} ms\n"
+        f"   reloj:   p99 {np.percentile(errors, 99) * 1000:6.2f} ms, máx {errors.max() * 1000:6.1f} ms, "
+        f"deriva estimada {clock.get_stats().drift_ppm:+.1f} ppm, {cpu_per_chunk * 1e6:.2f} µs/chunk"
+    )
+
+
+def bench_memory(results: BenchmarkResults) -> None:
+    """Pico de memoria del monitor reprocesando 2 min de grabación."""
+    print("\n13. Memoria: pico de asignaciones del monitor y máximo residente del proceso")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "granero.wav")
+        write_synthetic_recording(path, 120)
+        
+        recording_config = main.RecordingConfig(output_directory=os.path.join(directory, "clips"))
+        tracemalloc.start()
+        try:
+            replay_monitor(path, main.AnalysisConfig(), recording_config)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    
+    results.record("memory.monitor_peak_mb", peak / 2**20, "MB")
+    print(f"   pico de asignaciones del monitor (tracemalloc): {peak / 2**20:7.1f} MB")
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reinicia el máximo residente del proceso (VmHWM), para medirlo por sección.
+    
+    Returns:
+        True si el sistema lo permite (Linux); si no, el máximo es de todo el proceso
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """
+    Obtiene el máximo de memoria residente desde el último reinicio.
+    
+    Returns:
+        Máximo residente en MB
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 1024
+
+
+def record_peak_rss(results: BenchmarkResults, section: Optional[str]) -> None:
+    """
+    Registra el máximo residente de una sección (o del proceso entero).
+    
+    Args:
+        results: Métricas de la ejecución
+        section: Sección medida (None = todo el proceso, sin reinicio posible)
+    """
+    max_rss_mb = peak_rss_mb()
+    if section is None:
+        results.record("memory.max_rss_mb", max_rss_mb, "MB", noise=2.0)
+        print(f"   máximo residente del proceso (ru_maxrss): {max_rss_mb:7.1f} MB")
+    else:
+        results.record(f"rss.{section}.peak_mb", max_rss_mb, "MB", noise=2.0)
+        print(f"   máximo residente de la sección: {max_rss_mb:7.1f} MB")
+
+
+SECTIONS = {
+    "analyzer": bench_analyzer,
+    "spectral": bench_spectral,
+    "cascade": bench_cascade,
+    "model": bench_model_worker,
+    "clip": bench_clip_encoding,
+    "multichannel": bench_multichannel,
+    "capture": bench_capture_topology,
+    "replay": bench_replay,
+    "trigger": bench_trigger_latency,
+    "adaptive": bench_adaptive_thresholds,
+    "segments": bench_segments,
+    "clock": bench_sample_clock,
+    "memory": bench_memory,
+}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parsea los argumentos de línea de comandos.
+    
+    Args:
+        argv: Argumentos (None = sys.argv)
+        
+    Returns:
+        Argumentos parseados
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline edge")
+    parser.add_argument(
+        "--output", default="benchmark_results.json",
+        help="Archivo JSON donde guardar las métricas (por defecto: benchmark_results.json)"
+    )
+    parser.add_argument(
+        "--compare", metavar="REFERENCIA",
+        help="JSON de una ejecución anterior; termina con código 1 si alguna métrica empeora"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.15,
+        help="Empeoramiento relativo tolerado por --compare (por defecto: 0.15)"
+    )
+    parser.add_argument(
+        "--recordings", metavar="RUTA",
+        help="Archivo o directorio de grabaciones reales para la sección de replay"
+    )
+    parser.add_argument(
+        "--sections", nargs="+", choices=list(SECTIONS), default=list(SECTIONS),
+        help="Secciones a ejecutar (por defecto: todas)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1,
+        help="Corridas de cada sección; cada métrica es la mediana (por defecto: 1)"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # Otras secciones cambian el estado del proceso (memoria, caches): no es comparable
+        if baseline.get("sections") != args.sections:
+            sys.exit(
+                f"La referencia {args.compare} corrió las secciones {baseline.get('sections')}, "
+                f"no {args.sections}: no se puede comparar"
+            )
+    if args.recordings and not main.WavReplaySource.list_recordings(args.recordings):
+        sys.exit(f"No hay grabaciones {main.REPLAY_EXTENSIONS} en {args.recordings}")
+    pin_to_single_core()
+
+    print("=" * 50)
+    print("BENCHMARKS DEL PIPELINE EDGE")
+    print("=" * 50)
+    print(f"Plataforma: {platform.machine()} / Python {platform.python_version()} / NumPy {np.__version__}")
+
+    results = BenchmarkResults()
+    per_section_rss = reset_peak_rss()
+    for section in args.sections:
+        reset_peak_rss()
+        for _ in range(args.repeat):
+            if section == "replay":
+                bench_replay(results, args.recordings)
+            else:
+                SECTIONS[section](results)
+        if per_section_rss:
+            record_peak_rss(results, section)
+    if not per_section_rss:
+        print()
+        record_peak_rss(results, None)
+
+    document = results.to_json()
+    document["sections"] = args.sections
+    with open(args.output, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"\n💾 {len(results.metrics)} métricas guardadas en {args.output}")
+
+    if baseline is not None:
+        regressions = compare_results(results.metrics, baseline["metrics"], args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresiones (tolerancia {args.tolerance:.0%}) vs {args.compare}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones (tolerancia {args.tolerance:.0%}) vs {args.compare}")
@@ -40,3 +40,79 @@ COMMENT ON COLUMN events.alert_type IS 'Tipo de alerta (ej: noise_threshold, hig
 COMMENT ON COLUMN events.confidence IS 'Nivel de confianza de la alerta (0.0 - 1.0)';
 COMMENT ON COLUMN events.metadata IS 'Datos adicionales en formato JSON (rms, zcr, audio_file, etc)';
 
+
+-- Resúmenes acústicos periódicos (niveles ambientales por corral)
+-- Una fila por canal cada RollupConfig.period_seconds; el edge las envía en bloque
+CREATE TABLE IF NOT EXISTS acoustic_rollups (
+    id UUID PRIMARY KEY,
+    period_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    period_seconds REAL NOT NULL,
+    device_id TEXT NOT NULL,
+    farm_id UUID NOT NULL REFERENCES farms(id),
+    pen_id TEXT NOT NULL,
+    channel SMALLINT NOT NULL DEFAULT 0,
+    chunks INTEGER NOT NULL,
+    rms_min REAL, rms_max REAL, rms_mean REAL, rms_p95 REAL,
+    zcr_min REAL, zcr_max REAL, zcr_mean REAL, zcr_p95 REAL,
+    band_edges_hz INTEGER[],
+    band_db_mean REAL[],
+    band_db_p95 REAL[]
+);
+
+CREATE INDEX IF NOT EXISTS idx_rollups_device_period ON acoustic_rollups(device_id, period_start DESC);
+CREATE INDEX IF NOT EXISTS idx_rollups_farm_period ON acoustic_rollups(farm_id, period_start DESC);
+
+ALTER TABLE acoustic_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Permitir inserts públicos" ON acoustic_rollups
+    FOR INSERT
+    TO anon
+    WITH CHECK (true);
+
+CREATE POLICY "Permitir lectura pública" ON acoustic_rollups
+    FOR SELECT
+    TO anon
+    USING (true);
+
+COMMENT ON TABLE acoustic_rollups IS 'Resúmenes periódicos de RMS/ZCR y energía por banda de cada corral';
+COMMENT ON COLUMN acoustic_rollups.period_start IS 'Inicio del período (hora de captura del primer chunk)';
+COMMENT ON COLUMN acoustic_rollups.chunks IS 'Chunks resumidos (menos que el período completo al arrancar o apagar)';
+COMMENT ON COLUMN acoustic_rollups.band_edges_hz IS 'Límite inferior de cada banda de octava; la última llega hasta Nyquist';
+COMMENT ON COLUMN acoustic_rollups.band_db_mean IS 'Media por banda de la energía de cada chunk (dB relativos a escala completa)';
+
+-- Segmentos de grabación continua (dataset de entrenamiento)
+-- Una fila por segmento subido (RecordingConfig.continuous); el audio está en Storage
+CREATE TABLE IF NOT EXISTS audio_segments (
+    id UUID PRIMARY KEY,
+    started_at TIMESTAMP WITH TIME ZONE,
+    duration_seconds REAL,
+    device_id TEXT NOT NULL,
+    farm_id UUID NOT NULL REFERENCES farms(id),
+    pen_ids TEXT[],
+    sample_rate INTEGER,
+    codec TEXT,
+    size_bytes BIGINT,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    hits JSONB NOT NULL DEFAULT '[]',
+    audio_url TEXT NOT NULL,
+    storage_path TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_segments_device_started ON audio_segments(device_id, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_segments_farm_hits ON audio_segments(farm_id, hit_count DESC);
+
+ALTER TABLE audio_segments ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Permitir inserts públicos" ON audio_segments
+    FOR INSERT
+    TO anon
+    WITH CHECK (true);
+
+CREATE POLICY "Permitir lectura pública" ON audio_segments
+    FOR SELECT
+    TO anon
+    USING (true);
+
+COMMENT ON TABLE audio_segments IS 'Segmentos de audio continuo para etiquetar y entrenar modelos';
+COMMENT ON COLUMN audio_segments.started_at IS 'Hora de captura del primer chunk del segmento';
+COMMENT ON COLUMN audio_segments.hits IS 'Disparos del detector: [{offset_seconds, pen_id}] desde el inicio del segmento';
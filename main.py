@@ -1,8 +1,34 @@
 """
 Sistema de Monitoreo Bioacústico para Granjas Porcinas
-Versión: 0.8 (Multi-Tenant SaaS)
+Versión: 0.9 (Multi-Tenant SaaS)
 Edge Device: Raspberry Pi / Mac Dev
 
+Cambios v0.9:
+- ✅ Captura por callback de PyAudio sobre ring buffer int16 preasignado
+- ✅ Análisis sin pérdidas: se consume cada chunk en orden por número de secuencia
+- ✅ Pre-roll: los clips incluyen el audio previo al disparo de la alerta
+- ✅ Alertas no bloqueantes: la detección sigue activa mientras se graba el clip
+- ✅ Kernel RMS/ZCR por lotes en float32 sin temporales (analyze_batch)
+- ✅ Features espectrales en streaming (STFT, bandas mel, centroide, planitud)
+- ✅ Detector en cascada: compuerta de energía entera → espectral → modelo
+- ✅ ModelAnalyzer: inferencia en un proceso aparte con micro-batching
+- ✅ Outbox persistente en SQLite (WAL): ningún evento se pierde sin conexión
+- ✅ Pool fijo de workers de subida con prioridades y un único cliente HTTP
+- ✅ Clips en FLAC sin pérdidas con remuestreo polifásico opcional (16/22.05 kHz)
+- ✅ Clips escritos en disco a medida que llega el audio y subidos en streaming
+- ✅ Retención en disco: cuota, edad máxima y LRU solo sobre clips ya subidos
+- ✅ Multicanal: un analizador y cooldown por canal, eventos etiquetados por corral
+- ✅ Captura opcional en un proceso aparte con ring buffer en memoria compartida
+- ✅ AudioSource: reprocesar grabaciones WAV/FLAC más rápido que tiempo real (--replay)
+- ✅ Latencia por etapa de cada evento (captura → insert) en histogramas y en metadata
+- ✅ Endpoint local de métricas Prometheus (/metrics) y salud (/health)
+- ✅ Resúmenes acústicos por minuto (RMS/ZCR/bandas) en inserts en bloque
+- ✅ Umbrales adaptativos: piso de ruido por corral con cuantiles P² en streaming
+- ✅ Segmentación con histéresis: un evento por episodio (duración, pico, medias, disparos)
+- ✅ Grabación continua en segmentos marcados por disparos, con cuota y presupuesto de subida
+- ✅ Reloj de muestras anclado al ADC: disparos, clips y segmentos con hora exacta
+- ✅ Reconexión del micrófono sin límite de intentos, con registro de huecos de captura
+
 Cambios v0.8:
 - ✅ Soporte Multi-Tenant: FARM_ID obligatorio
 - ✅ Validación estricta de configuración antes de iniciar
@@ -20,21 +46,43 @@ Cambios v0.7:
 """
 
 import os
+import sys
+import argparse
+import json
 import time
+import uuid
 import wave
+import random
+import resource
+import shutil
+import signal
+import sqlite3
+import queue
 import threading
+import bisect
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import logging
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional, Tuple, List
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Tuple, List, Dict, Union, Sequence, Callable, Iterator, Set
 from collections import deque
 
 import pyaudio
 import numpy as np
 import numpy.typing as npt
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+
+try:
+    import soundfile  # Opcional: clips en FLAC (pip install soundfile)
+except ImportError:
+    soundfile = None
 
 
 # ========== CARGAR VARIABLES DE ENTORNO ==========
@@ -82,10 +130,65 @@ class AudioConfig:
     """Configuración de captura de audio."""
     sample_rate: int = 48000
     chunk_size: int = 1024
+    # Canales de la interfaz (ej. USB de 4 u 8 entradas). Varios micrófonos USB se
+    # agregan como un solo dispositivo (plugin "multi" de ALSA) para compartir reloj
     channels: int = 1
+    channel_labels: Tuple[str, ...] = ()  # Corral/ID por canal (vacío = "ch1", "ch2", ...)
     format: int = pyaudio.paInt16
     device_index: Optional[int] = None  # None = auto-detect
     prefer_iphone: bool = True  # Buscar iPhone primero
+    use_callback: bool = True  # Callback de PyAudio (False = lectura bloqueante en thread)
+    capture_process: bool = False  # Capturar en un proceso aparte (ring buffer en memoria compartida)
+    ring_buffer_seconds: float = 10.0  # Historial preasignado en el ring buffer
+    stall_timeout_seconds: float = 0.5  # Sin audio durante este tiempo = micrófono caído
+    reconnect_initial_delay: float = 0.25  # Espera antes del segundo intento de reconexión
+    reconnect_max_delay: float = 5.0  # Tope del backoff exponencial (los reintentos no se agotan)
+
+
+@dataclass(frozen=True)
+class SpectralConfig:
+    """Configuración del extractor de features espectrales."""
+    n_fft: int = 1024
+    hop_length: int = 512  # Solape del 50% con n_fft = 1024
+    n_bands: int = 32  # Bandas mel
+    fmin: float = 200.0
+    fmax: Optional[float] = None  # None = Nyquist
+    min_centroid_hz: float = 0.0  # Centroide mínimo para alertar (0 = sin filtro)
+    max_flatness: float = 1.0  # Planitud máxima para alertar (1 = sin filtro)
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    """Configuración del modelo de inferencia fuera de proceso."""
+    model_path: Optional[str] = None  # Pesos .npz del MLP (None = pesos aleatorios de referencia)
+    hidden_units: Tuple[int, ...] = (64,)  # Capas ocultas de los pesos de referencia
+    context_frames: int = 8  # FeatureFrames por ventana enviada al modelo
+    max_batch_size: int = 16
+    max_batch_latency_ms: float = 5.0  # Espera máxima para completar un micro-batch
+    request_slots: int = 256  # Ventanas en vuelo en memoria compartida
+    score_threshold: float = 0.5
+    max_score_age_seconds: float = 0.25  # Un score más viejo no decide el chunk actual
+
+
+@dataclass(frozen=True)
+class AdaptiveThresholdConfig:
+    """Configuración de los umbrales adaptativos al piso de ruido de cada galpón."""
+    quantile: float = 0.5  # Cuantil de RMS/ZCR que define el piso (0.5 = mediana)
+    horizon_seconds: float = 300.0  # Historia que cubre el piso (ventana deslizante)
+    warmup_seconds: float = 30.0  # Hasta entonces rigen rms_threshold/zcr_threshold
+    rms_ratio: float = 4.0  # Disparo: RMS > piso × ratio (4× ≈ +12 dB)
+    zcr_ratio: float = 1.5  # Disparo: ZCR > piso × ratio
+    min_rms: float = 60.0  # Umbral mínimo aunque el galpón esté en silencio
+    min_zcr: float = 40.0
+
+
+@dataclass(frozen=True)
+class SegmentationConfig:
+    """Segmentación de eventos con histéresis: un evento por episodio acústico."""
+    enabled: bool = True  # False = cooldown fijo entre alertas (cooldown_seconds)
+    onset_chunks: int = 1  # Detecciones seguidas que abren un episodio
+    offset_ratio: float = 0.5  # El episodio sigue mientras RMS > umbral × ratio (sin exigir ZCR)
+    max_event_seconds: float = 120.0  # Un episodio más largo se parte en varios eventos
 
 
 @dataclass(frozen=True)
@@ -94,14 +197,83 @@ class AnalysisConfig:
     rms_threshold: float = 300.0
     zcr_threshold: int = 80
     gain: float = 5.0
-    cooldown_seconds: float = 5.0  # Tiempo mínimo entre alertas
+    cooldown_seconds: float = 5.0  # Tiempo mínimo entre alertas (solo sin segmentación)
+    consume_all_chunks: bool = True  # Analizar cada chunk en orden (False = muestrear el último)
+    use_spectral_features: bool = False  # Usar SpectralAudioAnalyzer por defecto
+    spectral: SpectralConfig = SpectralConfig()
+    use_cascade: bool = False  # Usar CascadeAnalyzer (compuerta → espectral → modelo)
+    cascade_gate_rms: float = 150.0  # RMS mínimo para pasar la compuerta de energía
+    use_model: bool = False  # Agregar ModelAnalyzer como etapa 3 de la cascada
+    model: ModelConfig = ModelConfig()
+    use_adaptive_thresholds: bool = False  # Umbrales relativos al piso de ruido aprendido
+    adaptive: AdaptiveThresholdConfig = AdaptiveThresholdConfig()
+    segmentation: SegmentationConfig = SegmentationConfig()
+
+
+@dataclass(frozen=True)
+class SegmentConfig:
+    """Configuración de la grabación continua por segmentos (dataset de entrenamiento)."""
+    segment_seconds: float = 60.0
+    directory: str = "segmentos"  # Aparte de los clips de alerta: cuota y retención propias
+    max_bytes: int = 8 * 1024 ** 3  # Cuota en disco (~2 días a 48 kHz mono en FLAC)
+    max_age_days: float = 14.0
+    min_free_bytes: int = 1024 ** 3  # Se deja lugar para los clips de alerta
+    upload_bytes_per_day: int = 512 * 1024 ** 2  # Presupuesto de subida (0 = solo en disco)
+    upload_hits_only: bool = False  # Subir solo segmentos con disparos del detector
 
 
 @dataclass(frozen=True)
 class RecordingConfig:
     """Configuración de grabación."""
-    duration_seconds: int = 3
+    duration_seconds: int = 3  # Audio posterior al último chunk activo (cierra el episodio)
+    pre_trigger_seconds: float = 2.0  # Audio previo al disparo (pre-roll)
+    max_clip_seconds: float = 8.0  # Tope de un evento extendido (debe caber en el ring buffer)
     output_directory: str = "grabaciones"
+    codec: str = "flac"  # "flac" (requiere soundfile) o "wav"
+    target_sample_rate: Optional[int] = None  # Remuestreo antes de guardar (ej. 16000, 22050)
+    continuous: bool = False  # Grabar además todo el audio en segmentos (SegmentRecorder)
+    segments: SegmentConfig = SegmentConfig()
+
+
+@dataclass(frozen=True)
+class RetentionConfig:
+    """Configuración de retención de clips en el directorio de grabaciones."""
+    max_bytes: int = 2 * 1024 ** 3  # Cuota total de clips
+    max_age_days: float = 30.0  # Edad máxima de un clip ya subido
+    min_free_bytes: int = 256 * 1024 ** 2  # Espacio libre mínimo en la tarjeta SD
+    check_interval_seconds: float = 300.0
+    index_filename: str = ".clips_index.db"  # Índice SQLite dentro del directorio
+    evict_pending: bool = False  # Borrar también lo no subido (segmentos continuos: sin disparos primero)
+
+
+@dataclass(frozen=True)
+class OutboxConfig:
+    """Configuración del outbox persistente de eventos hacia Supabase."""
+    database_path: str = "outbox.db"
+    batch_size: int = 50  # Eventos por insert masivo
+    max_uploads_per_cycle: int = 4  # Clips subidos por ciclo de drenado
+    drain_interval_seconds: float = 1.0  # Pausa entre ciclos mientras quede atraso
+    base_backoff_seconds: float = 5.0
+    max_backoff_seconds: float = 600.0
+    upload_workers: int = 2  # Requests simultáneas a Supabase
+    upload_queue_size: int = 8  # Tareas en espera antes de aplicar backpressure
+
+
+@dataclass(frozen=True)
+class RollupConfig:
+    """Configuración de los resúmenes acústicos periódicos (tabla acoustic_rollups)."""
+    period_seconds: float = 60.0  # Un resumen por canal cada N segundos (1.0 = por segundo)
+    upload_interval_seconds: float = 300.0  # Un insert en bloque cada N segundos
+    batch_size: int = 500  # Filas por insert
+    max_pending_rows: int = 50_000  # Tope en el outbox sin conexión (se descartan las más viejas)
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    """Configuración del endpoint local de métricas (formato Prometheus)."""
+    host: str = "127.0.0.1"  # Solo el colector local; "0.0.0.0" para exponerlo en la red
+    port: int = 9108
+    slow_metrics_seconds: float = 5.0  # Caché de las métricas que consultan disco/SQLite
 
 
 # ========== CONFIGURACIÓN DE LOGGING ==========
@@ -130,7 +302,18 @@ def initialize_supabase() -> Optional[Client]:
     """
     if SUPABASE_URL and SUPABASE_KEY:
         try:
-            client = create_client(SUPABASE_URL, SUPABASE_KEY)
+            # Un solo cliente HTTP (pool keep-alive, HTTP/2) compartido por BD y Storage
+            http_client = httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)
+            )
+            client = create_client(
+                SUPABASE_URL,
+                SUPABASE_KEY,
+                options=ClientOptions(httpx_client=http_client)
+            )
             logger.info("✓ Cliente de Supabase inicializado correctamente")
             return client
         except Exception as e:
@@ -141,27 +324,405 @@ def initialize_supabase() -> Optional[Client]:
         return None
 
 
+# ========== UMBRALES ADAPTATIVOS: PISO DE RUIDO EN STREAMING ==========
+
+class P2Quantile:
+    """
+    Estimador de un cuantil en streaming con el algoritmo P² (Jain y Chlamtac, 1985).
+    
+    Mantiene cinco marcadores (mínimo, q/2, q, (1+q)/2 y máximo) cuyas alturas
+    se corrigen con interpolación parabólica: memoria O(1) y unas pocas
+    comparaciones por muestra, sin guardar el historial.
+    """
+    
+    __slots__ = ("q", "count", "_heights", "_positions", "_desired", "_increments")
+    
+    def __init__(self, q: float):
+        """
+        Inicializa el estimador.
+        
+        Args:
+            q: Cuantil a estimar, en (0, 1)
+            
+        Raises:
+            ValueError: Si q está fuera de (0, 1)
+        """
+        if not 0.0 < q < 1.0:
+            raise ValueError(f"El cuantil debe estar en (0, 1): {q}")
+        self.q = q
+        self._increments = (0.0, q / 2, q, (1 + q) / 2, 1.0)
+        self.reset()
+    
+    def reset(self) -> None:
+        """Descarta las muestras vistas."""
+        q = self.q
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1.0, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5.0]
+    
+    def update(self, value: float) -> None:
+        """
+        Incorpora una muestra.
+        
+        Args:
+            value: Valor observado
+        """
+        self.count += 1
+        heights = self._heights
+        if self.count <= 5:
+            bisect.insort(heights, value)
+            return
+        
+        # Celda k tal que heights[k] <= value < heights[k + 1] (los extremos se estiran)
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = bisect.bisect_right(heights, value, 1, 4) - 1
+        
+        positions, desired, increments = self._positions, self._desired, self._increments
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(1, 4):
+            desired[i] += increments[i]
+        desired[4] += 1.0
+        
+        # Los marcadores centrales que se alejaron de su posición ideal se mueven un paso
+        for i in range(1, 4):
+            delta = desired[i] - positions[i]
+            if ((delta >= 1.0 and positions[i + 1] - positions[i] > 1) or
+                    (delta <= -1.0 and positions[i - 1] - positions[i] < -1)):
+                step = 1 if delta > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+    
+    def _parabolic(self, i: int, step: int) -> float:
+        """
+        Altura del marcador i desplazado ``step`` posiciones (fórmula P² parabólica).
+        
+        Args:
+            i: Marcador central (1..3)
+            step: +1 o -1
+            
+        Returns:
+            Altura interpolada
+        """
+        h, n = self._heights, self._positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+    
+    @property
+    def value(self) -> Optional[float]:
+        """Cuantil estimado (None sin muestras; exacto con 5 o menos)."""
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self._heights[int(round(self.q * (self.count - 1)))]
+        return self._heights[2]
+
+
+class SlidingQuantile:
+    """
+    Cuantil sobre una ventana deslizante aproximada de ``horizon_seconds``.
+    
+    Dos estimadores P² desfasados medio horizonte se reinician por turnos: el
+    valor sale del más antiguo, que cubre entre la mitad y la totalidad del
+    horizonte. Así el piso olvida los cambios viejos (un ventilador que se
+    apagó) sin guardar muestras.
+    """
+    
+    def __init__(self, q: float, horizon_seconds: float):
+        """
+        Inicializa la ventana.
+        
+        Args:
+            q: Cuantil a estimar, en (0, 1)
+            horizon_seconds: Historia máxima que cubre el valor
+        """
+        self.horizon_seconds = horizon_seconds
+        self._estimators = (P2Quantile(q), P2Quantile(q))
+        self._started: List[Optional[float]] = [None, None]
+    
+    def update(self, value: float, now: float) -> None:
+        """
+        Incorpora una muestra.
+        
+        Args:
+            value: Valor observado
+            now: Instante de la muestra (segundos, mismo reloj en cada llamada)
+        """
+        started = self._started
+        if started[0] is None:
+            started[0] = now
+        elif started[1] is None and now - started[0] >= self.horizon_seconds / 2:
+            started[1] = now
+        
+        for estimator, index in zip(self._estimators, (0, 1)):
+            start = started[index]
+            if start is None:
+                continue
+            if now - start >= self.horizon_seconds:
+                estimator.reset()
+                started[index] = now
+            estimator.update(value)
+    
+    def _oldest(self) -> int:
+        """Índice del estimador con más historia."""
+        first, second = self._started
+        if second is not None and first is not None and second < first:
+            return 1
+        return 0
+    
+    @property
+    def value(self) -> Optional[float]:
+        """Cuantil estimado por el estimador más antiguo (None sin muestras)."""
+        return self._estimators[self._oldest()].value
+    
+    def covered_seconds(self, now: float) -> float:
+        """
+        Historia que respalda ``value``.
+        
+        Args:
+            now: Instante actual (mismo reloj que ``update``)
+            
+        Returns:
+            Segundos desde el inicio del estimador más antiguo
+        """
+        start = self._started[self._oldest()]
+        return 0.0 if start is None else max(now - start, 0.0)
+
+
+@dataclass
+class ThresholdStats:
+    """Umbrales vigentes de un analizador y el piso de ruido aprendido."""
+    adaptive: bool
+    warmed_up: bool  # False = rigen los umbrales fijos de AnalysisConfig
+    rms_threshold: float
+    zcr_threshold: float
+    rms_floor: Optional[float] = None
+    zcr_floor: Optional[float] = None
+    floor_seconds: float = 0.0  # Historia que respalda el piso
+
+
+class AdaptiveThresholds:
+    """
+    Umbrales RMS/ZCR relativos al piso de ruido del galpón.
+    
+    El piso es un cuantil de cada métrica sobre una ventana deslizante; se
+    dispara cuando el chunk se aparta de él en ``rms_ratio``/``zcr_ratio``.
+    Hasta completar el calentamiento rigen los umbrales fijos.
+    """
+    
+    def __init__(self, config: AnalysisConfig):
+        """
+        Inicializa los estimadores.
+        
+        Args:
+            config: Configuración de análisis (usa ``config.adaptive``)
+        """
+        self.config = config.adaptive
+        self._rms = SlidingQuantile(self.config.quantile, self.config.horizon_seconds)
+        self._zcr = SlidingQuantile(self.config.quantile, self.config.horizon_seconds)
+        # El calentamiento no puede superar la historia mínima garantizada (medio horizonte)
+        self._warmup_seconds = min(self.config.warmup_seconds, self.config.horizon_seconds / 2)
+        self._last_update: float = 0.0
+        self.warmed_up = False
+        self.rms_threshold = config.rms_threshold
+        self.zcr_threshold = float(config.zcr_threshold)
+    
+    def update(self, volume_metric: float, frequency_metric: float, now: float) -> None:
+        """
+        Aprende de un chunk y recalcula los umbrales.
+        
+        Args:
+            volume_metric: Valor RMS del chunk
+            frequency_metric: Valor ZCR del chunk
+            now: Instante del chunk (reloj del analizador)
+        """
+        self._rms.update(volume_metric, now)
+        self._zcr.update(frequency_metric, now)
+        self._last_update = now
+        
+        if not self.warmed_up:
+            if self._rms.covered_seconds(now) < self._warmup_seconds:
+                return
+            self.warmed_up = True
+        
+        config = self.config
+        self.rms_threshold = max(config.min_rms, self._rms.value * config.rms_ratio)
+        self.zcr_threshold = max(config.min_zcr, self._zcr.value * config.zcr_ratio)
+    
+    def get_stats(self) -> ThresholdStats:
+        """
+        Obtiene los umbrales vigentes y el piso aprendido.
+        
+        Returns:
+            Snapshot de ThresholdStats
+        """
+        return ThresholdStats(
+            adaptive=True,
+            warmed_up=self.warmed_up,
+            rms_threshold=self.rms_threshold,
+            zcr_threshold=self.zcr_threshold,
+            rms_floor=self._rms.value,
+            zcr_floor=self._zcr.value,
+            floor_seconds=self._rms.covered_seconds(self._last_update),
+        )
+
+
 # ========== CAPA DE ABSTRACCIÓN: ANÁLISIS DE AUDIO ==========
 
+# Chunk de audio int16: bytes crudos o vista NumPy sin copia del ring buffer
+AudioBuffer = Union[bytes, npt.NDArray[np.int16]]
+
+
+def deinterleave(frames: npt.NDArray[np.int16], channels: int) -> npt.NDArray[np.int16]:
+    """
+    Separa por canal un lote de chunks intercalados, en una sola copia vectorizada.
+    
+    Args:
+        frames: Array 2-D int16 (chunks × muestras intercaladas)
+        channels: Canales intercalados
+        
+    Returns:
+        Array int16 (canales × chunks × muestras por canal); cada canal es un
+        bloque contiguo listo para ``extract_features``
+    """
+    if channels == 1:
+        return frames[np.newaxis]
+    return np.ascontiguousarray(frames.reshape(len(frames), -1, channels).transpose(2, 0, 1))
+
+
+@dataclass
+class FeatureFrame:
+    """
+    Features de un chunk de audio.
+    
+    ``volume`` y ``frequency`` siempre están presentes; los campos espectrales
+    solo los completan los analizadores que los calculan.
+    """
+    volume: float  # RMS con ganancia
+    frequency: float  # Zero-crossing rate
+    band_energies: Optional[npt.NDArray[np.float32]] = None  # Energía por banda mel (dB)
+    spectral_centroid: Optional[float] = None  # Hz
+    spectral_flatness: Optional[float] = None  # 0 = tonal, 1 = ruido blanco
+    stages_passed: Optional[int] = None  # Etapas superadas en un CascadeAnalyzer
+
+
 class AudioAnalyzer(ABC):
     """
     Interfaz abstracta para analizadores de audio.
     Permite reemplazar fácilmente el análisis simple por un modelo de ML.
     """
     
+    # Reloj de los cooldowns en segundos; el monitor lo reemplaza por la
+    # posición en el audio para que reprocesar grabaciones dé los mismos eventos
+    clock: Callable[[], float] = time.time
+    
     @abstractmethod
-    def analyze(self, audio_data: bytes) -> Tuple[float, float]:
+    def analyze(self, audio_data: AudioBuffer) -> Tuple[float, float]:
         """
         Analiza un fragmento de audio y retorna métricas.
         
         Args:
-            audio_data: Datos de audio en formato raw bytes
+            audio_data: Datos de audio int16 (raw bytes o vista NumPy)
             
         Returns:
             Tuple con (métrica_volumen, métrica_frecuencia)
         """
         pass
     
+    def analyze_batch(
+        self,
+        frames: npt.NDArray[np.int16]
+    ) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+        """
+        Analiza varios chunks consecutivos.
+        
+        La implementación por defecto llama a ``analyze`` por cada chunk;
+        los analizadores vectorizados la sobrescriben.
+        
+        Args:
+            frames: Array 2-D int16 (chunks × muestras)
+            
+        Returns:
+            Tuple (métricas_volumen, métricas_frecuencia), un valor por chunk
+        """
+        metrics = np.array([self.analyze(row) for row in frames], dtype=np.float32)
+        metrics = metrics.reshape(-1, 2)
+        return metrics[:, 0], metrics[:, 1]
+    
+    def extract_features(self, frames: npt.NDArray[np.int16]) -> List[FeatureFrame]:
+        """
+        Calcula un FeatureFrame por chunk.
+        
+        La implementación por defecto envuelve ``analyze_batch``; los
+        analizadores con features más ricas la sobrescriben.
+        
+        Args:
+            frames: Array 2-D int16 (chunks × muestras)
+            
+        Returns:
+            Lista de FeatureFrame, una por chunk
+        """
+        volumes, frequencies = self.analyze_batch(frames)
+        return [
+            FeatureFrame(volume=volume, frequency=frequency)
+            for volume, frequency in zip(volumes.tolist(), frequencies.tolist())
+        ]
+    
+    def should_trigger_on(self, features: FeatureFrame) -> bool:
+        """
+        Determina si se debe disparar una alerta a partir de un FeatureFrame.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si se debe disparar alerta
+        """
+        return self.should_trigger_alert(features.volume, features.frequency)
+    
+    def continues_event(self, features: FeatureFrame) -> bool:
+        """
+        Determina si un FeatureFrame prolonga el evento abierto.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si el chunk sigue perteneciendo al evento
+        """
+        return self.is_event_active(features.volume, features.frequency)
+    
+    def sustains_event(self, features: FeatureFrame) -> bool:
+        """
+        Umbral de salida de la histéresis: el chunk mantiene abierto el episodio.
+        
+        Por defecto coincide con ``continues_event``; los analizadores por
+        umbrales lo relajan para no cortar un episodio en sus valles.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si el chunk sigue perteneciendo al episodio
+        """
+        return self.continues_event(features)
+    
+    def close(self) -> None:
+        """Libera recursos del analizador (procesos, memoria compartida)."""
+        pass
+    
     @abstractmethod
     def should_trigger_alert(self, volume_metric: float, frequency_metric: float) -> bool:
         """
@@ -175,6 +736,22 @@ class AudioAnalyzer(ABC):
             True si se debe disparar alerta, False en caso contrario
         """
         pass
+    
+    def is_event_active(self, volume_metric: float, frequency_metric: float) -> bool:
+        """
+        Determina si un chunk prolonga un evento ya abierto.
+        
+        A diferencia de ``should_trigger_alert`` no aplica cooldown, para que
+        los disparos consecutivos se fusionen en un único evento extendido.
+        
+        Args:
+            volume_metric: Métrica de volumen del análisis
+            frequency_metric: Métrica de frecuencia del análisis
+            
+        Returns:
+            True si el chunk sigue perteneciendo al evento
+        """
+        return self.should_trigger_alert(volume_metric, frequency_metric)
 
 
 class SimpleAudioAnalyzer(AudioAnalyzer):
@@ -191,41 +768,106 @@ class SimpleAudioAnalyzer(AudioAnalyzer):
             config: Configuración de análisis
         """
         self.config = config
-        self._last_alert_time: float = 0.0
+        self._last_alert_time: float = float("-inf")
+        
+        # Piso de ruido aprendido (None = umbrales fijos de la configuración)
+        self.adaptive: Optional[AdaptiveThresholds] = (
+            AdaptiveThresholds(config) if config.use_adaptive_thresholds else None
+        )
+        
+        # Buffers de trabajo reutilizados entre llamadas (no thread-safe)
+        self._scratch_shape: Tuple[int, int] = (0, 0)
+        self._samples_f32: npt.NDArray[np.float32] = np.empty((0, 0), dtype=np.float32)
+        self._positive: npt.NDArray[np.bool_] = np.empty((0, 0), dtype=np.bool_)
+        self._crossings: npt.NDArray[np.bool_] = np.empty((0, 0), dtype=np.bool_)
+        self._rms: npt.NDArray[np.float32] = np.empty(0, dtype=np.float32)
+        self._zcr: npt.NDArray[np.float32] = np.empty(0, dtype=np.float32)
+    
+    def _ensure_scratch(self, num_frames: int, num_samples: int) -> None:
+        """
+        Reserva los buffers de trabajo si cambió la forma del lote.
+        
+        Args:
+            num_frames: Chunks por lote
+            num_samples: Muestras por chunk
+        """
+        if self._scratch_shape == (num_frames, num_samples):
+            return
+        
+        self._samples_f32 = np.empty((num_frames, num_samples), dtype=np.float32)
+        self._positive = np.empty((num_frames, num_samples), dtype=np.bool_)
+        self._crossings = np.empty((num_frames, max(num_samples - 1, 0)), dtype=np.bool_)
+        self._rms = np.empty(num_frames, dtype=np.float32)
+        self._zcr = np.empty(num_frames, dtype=np.float32)
+        self._scratch_shape = (num_frames, num_samples)
+    
+    def analyze_batch(
+        self,
+        frames: npt.NDArray[np.int16]
+    ) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+        """
+        Calcula RMS y ZCR de varios chunks en una sola pasada vectorizada.
+        
+        Trabaja en float32 sobre buffers reutilizados: no crea arrays
+        temporales del tamaño del audio en cada llamada.
+        
+        Args:
+            frames: Array 2-D int16 (chunks × muestras), p.ej. vistas del ring buffer
+            
+        Returns:
+            Tuple (rms, zcr) de vectores float32, uno por chunk. Son buffers
+            internos: se sobrescriben en la siguiente llamada.
+        """
+        num_frames, num_samples = frames.shape
+        self._ensure_scratch(num_frames, num_samples)
+        if num_samples == 0:
+            self._rms.fill(0.0)
+            self._zcr.fill(0.0)
+            return self._rms, self._zcr
+        
+        samples = self._samples_f32
+        np.copyto(samples, frames)
+        np.greater(frames, 0, out=self._positive)
+        np.not_equal(self._positive[:, 1:], self._positive[:, :-1], out=self._crossings)
+        
+        if num_frames == 1:
+            # Un solo chunk: producto punto y conteo escalar tienen menos overhead
+            self._rms[0] = np.dot(samples[0], samples[0])
+            self._zcr[0] = np.count_nonzero(self._crossings)
+        else:
+            # Suma de cuadrados por fila (einsum no materializa x**2)
+            np.einsum('ij,ij->i', samples, samples, out=self._rms)
+            np.sum(self._crossings, axis=1, out=self._zcr)
+        
+        # RMS = sqrt(media de cuadrados) * ganancia; ZCR = transiciones del signo (> 0)
+        self._rms /= num_samples
+        np.sqrt(self._rms, out=self._rms)
+        self._rms *= self.config.gain
+        
+        return self._rms, self._zcr
     
-    def analyze(self, audio_data: bytes) -> Tuple[float, float]:
+    def analyze(self, audio_data: AudioBuffer) -> Tuple[float, float]:
         """
         Calcula RMS (volumen) y ZCR (frecuencia) del audio.
         
         Args:
-            audio_data: Datos de audio en formato raw bytes
+            audio_data: Datos de audio int16 (raw bytes o vista NumPy)
             
         Returns:
             Tuple con (rms, zero_crossing_rate)
         """
-        if not audio_data:
+        if audio_data is None or len(audio_data) == 0:
             return 0.0, 0.0
         
         try:
-            # Convertir bytes a array numpy
-            audio_array: npt.NDArray[np.float64] = np.frombuffer(
-                audio_data, 
-                dtype=np.int16
-            ).astype(np.float64)
+            # Vista int16 sin copia sobre los bytes o el slot del ring buffer
+            samples = np.frombuffer(audio_data, dtype=np.int16)
             
-            if len(audio_array) == 0:
+            if samples.size == 0:
                 return 0.0, 0.0
             
-            # Calcular RMS (Root Mean Square) - medida de volumen
-            mean_squared = np.mean(audio_array ** 2)
-            rms = 0.0 if mean_squared <= 0 or np.isnan(mean_squared) else \
-                  np.sqrt(mean_squared) * self.config.gain
-            
-            # Calcular Zero Crossing Rate - medida de frecuencia
-            zero_crossings = np.nonzero(np.diff(audio_array > 0))[0]
-            zcr = len(zero_crossings)
-            
-            return float(rms), float(zcr)
+            rms, zcr = self.analyze_batch(samples.reshape(1, -1))
+            return float(rms[0]), float(zcr[0])
             
         except Exception as e:
             logger.error(f"Error en análisis de audio: {e}")
@@ -235,6 +877,9 @@ class SimpleAudioAnalyzer(AudioAnalyzer):
         """
         Determina si el sonido es lo suficientemente fuerte y agudo.
         
+        En modo adaptativo cada chunk fuera de un evento abierto alimenta
+        también el piso de ruido.
+        
         Args:
             volume_metric: Valor RMS del audio
             frequency_metric: Valor ZCR del audio
@@ -242,601 +887,6734 @@ class SimpleAudioAnalyzer(AudioAnalyzer):
         Returns:
             True si cumple condiciones de alerta
         """
-        current_time = time.time()
+        current_time = self.clock()
+        if self.adaptive is not None:
+            self.adaptive.update(volume_metric, frequency_metric, current_time)
         
         # Verificar cooldown para evitar alertas repetidas
         if current_time - self._last_alert_time < self.config.cooldown_seconds:
             return False
         
-        # Verificar umbrales
-        is_loud = volume_metric > self.config.rms_threshold
-        is_high_pitch = frequency_metric > self.config.zcr_threshold
-        
-        if is_loud and is_high_pitch:
+        if self.is_event_active(volume_metric, frequency_metric):
             self._last_alert_time = current_time
             return True
         
         return False
-
-
-# ========== CAPA DE CAPTURA: MICRÓFONO ==========
-
-class MicrophoneCapture:
-    """
-    Gestiona la captura de audio desde el micrófono.
-    Maneja reconexión automática en caso de fallos.
-    """
     
-    def __init__(self, config: AudioConfig):
+    def is_event_active(self, volume_metric: float, frequency_metric: float) -> bool:
         """
-        Inicializa el sistema de captura de audio.
+        Verifica los umbrales de volumen y frecuencia, sin cooldown.
         
         Args:
-            config: Configuración de audio
+            volume_metric: Valor RMS del audio
+            frequency_metric: Valor ZCR del audio
+            
+        Returns:
+            True si el sonido es fuerte y agudo
         """
-        self.config = config
-        self._audio_interface: Optional[pyaudio.PyAudio] = None
-        self._stream: Optional[pyaudio.Stream] = None
-        self._is_capturing: bool = False
-        self._capture_thread: Optional[threading.Thread] = None
-        
-        # Device index resuelto (puede ser diferente al config si se auto-detecta)
-        self._resolved_device_index: Optional[int] = config.device_index
-        
-        # Buffer circular para audio en tiempo real (solo último chunk)
-        self._realtime_buffer: deque = deque(maxlen=1)
-        
-        # Buffer de grabación (acumula frames cuando está grabando)
-        self._recording_frames: List[bytes] = []
-        self._is_recording: bool = False
-        
-        # Lock para thread-safety
-        self._lock = threading.Lock()
-        
-        # Control de reconexión
-        self._max_reconnect_attempts: int = 5
-        self._reconnect_delay: float = 2.0
+        rms_threshold, zcr_threshold = self.current_thresholds()
+        return volume_metric > rms_threshold and frequency_metric > zcr_threshold
     
-    def _find_device_by_name(self, search_terms: List[str]) -> Optional[int]:
+    def sustains_event(self, features: FeatureFrame) -> bool:
         """
-        Busca un dispositivo de audio por términos de búsqueda en el nombre.
+        Umbral de salida: solo volumen, a ``offset_ratio`` del umbral de entrada.
+        
+        En modo adaptativo el chunk también alimenta el piso de ruido, para que
+        un cambio sostenido (un ventilador que arrancó) no congele los umbrales
+        dentro de un episodio interminable.
         
         Args:
-            search_terms: Lista de términos a buscar (ej: ["iPhone", "iPad"])
+            features: Features del chunk
             
         Returns:
-            Índice del dispositivo encontrado o None
+            True si el chunk sigue perteneciendo al episodio
         """
-        if not self._audio_interface:
-            self._audio_interface = pyaudio.PyAudio()
+        if self.adaptive is not None:
+            self.adaptive.update(features.volume, features.frequency, self.clock())
+        rms_threshold, _ = self.current_thresholds()
+        return features.volume > rms_threshold * self.config.segmentation.offset_ratio
+    
+    def current_thresholds(self) -> Tuple[float, float]:
+        """
+        Umbrales vigentes: los aprendidos en modo adaptativo o los de la configuración.
         
-        try:
-            host_api_info = self._audio_interface.get_host_api_info_by_index(0)
-            num_devices = host_api_info.get('deviceCount', 0)
-            
-            for i in range(num_devices):
-                device_info = self._audio_interface.get_device_info_by_host_api_device_index(0, i)
-                if device_info.get('maxInputChannels', 0) > 0:
-                    device_name = device_info.get('name', '').lower()
-                    for term in search_terms:
-                        if term.lower() in device_name:
+        Returns:
+            Tuple (umbral_rms, umbral_zcr)
+        """
+        if self.adaptive is not None:
+            return self.adaptive.rms_threshold, self.adaptive.zcr_threshold
+        return self.config.rms_threshold, self.config.zcr_threshold
+    
+    def get_threshold_stats(self) -> ThresholdStats:
+        """
+        Obtiene los umbrales vigentes y, en modo adaptativo, el piso aprendido.
+        
+        Returns:
+            Snapshot de ThresholdStats
+        """
+        if self.adaptive is not None:
+            return self.adaptive.get_stats()
+        return ThresholdStats(
+            adaptive=False,
+            warmed_up=True,
+            rms_threshold=self.config.rms_threshold,
+            zcr_threshold=float(self.config.zcr_threshold),
+        )
+
+
+# ========== EXTRACCIÓN DE FEATURES ESPECTRALES ==========
+
+@lru_cache(maxsize=8)
+def hann_window(n_fft: int) -> npt.NDArray[np.float32]:
+    """
+    Ventana de Hann periódica (cacheada y de solo lectura).
+    
+    Args:
+        n_fft: Tamaño de la ventana
+        
+    Returns:
+        Ventana float32
+    """
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=8)
+def mel_filterbank(
+    sample_rate: int,
+    n_fft: int,
+    n_bands: int,
+    fmin: float,
+    fmax: float
+) -> npt.NDArray[np.float32]:
+    """
+    Banco de filtros triangulares en escala mel (cacheado y de solo lectura).
+    
+    Args:
+        sample_rate: Frecuencia de muestreo
+        n_fft: Tamaño de la FFT
+        n_bands: Número de bandas mel
+        fmin: Frecuencia mínima en Hz
+        fmax: Frecuencia máxima en Hz
+        
+    Returns:
+        Matriz float32 (bins rFFT × bandas), lista para ``potencia @ filtros``
+    """
+    def hz_to_mel(hz: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+    
+    def mel_to_hz(mel: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+    
+    bin_freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)[:, np.newaxis]
+    edges = mel_to_hz(np.linspace(hz_to_mel(np.array(fmin)), hz_to_mel(np.array(fmax)), n_bands + 2))
+    lower, center, upper = edges[:-2], edges[1:-1], edges[2:]
+    
+    rising = (bin_freqs - lower) / (center - lower)
+    falling = (upper - bin_freqs) / (upper - center)
+    filterbank = np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+    filterbank.flags.writeable = False
+    return filterbank
+
+
+class SpectralFeatureExtractor:
+    """
+    Extractor de features espectrales en streaming.
+    
+    Conserva el solape entre chunks, de modo que cada hop produce un frame
+    STFT aunque los chunks no estén alineados con ``n_fft``. La ventana y el
+    banco de filtros se calculan una sola vez: por lote de hops solo se hace
+    una rFFT y una multiplicación de matrices.
+    """
+    
+    def __init__(self, config: SpectralConfig, sample_rate: int):
+        """
+        Inicializa el extractor.
+        
+        Args:
+            config: Configuración espectral
+            sample_rate: Frecuencia de muestreo del audio
+        """
+        self.config = config
+        self.sample_rate = sample_rate
+        
+        fmax = config.fmax or sample_rate / 2
+        self._window = hann_window(config.n_fft)
+        self._filterbank = mel_filterbank(sample_rate, config.n_fft, config.n_bands, config.fmin, fmax)
+        self._bin_freqs = np.fft.rfftfreq(config.n_fft, 1.0 / sample_rate).astype(np.float32)
+        
+        # Muestras pendientes; arranca con n_fft - hop ceros para emitir un frame por hop
+        self._buffer: npt.NDArray[np.float32] = np.zeros(2 * config.n_fft, dtype=np.float32)
+        self._fill: int = config.n_fft - config.hop_length
+        
+        # Buffers de trabajo reutilizados entre llamadas
+        self._windowed: npt.NDArray[np.float32] = np.empty((0, config.n_fft), dtype=np.float32)
+        self._power: npt.NDArray[np.float32] = np.empty((0, len(self._bin_freqs)), dtype=np.float32)
+        self._log_power: npt.NDArray[np.float32] = np.empty_like(self._power)
+    
+    def reset(self) -> None:
+        """Descarta el solape acumulado (p.ej. tras un hueco en la captura)."""
+        self._buffer.fill(0.0)
+        self._fill = self.config.n_fft - self.config.hop_length
+    
+    def push(self, samples: npt.NDArray[np.int16]) -> None:
+        """
+        Agrega muestras al buffer de solape sin calcular espectros.
+        
+        Args:
+            samples: Muestras int16 de un canal
+        """
+        needed = self._fill + samples.size
+        if needed > self._buffer.size:
+            grown = np.zeros(max(needed, 2 * self._buffer.size), dtype=np.float32)
+            grown[:self._fill] = self._buffer[:self._fill]
+            self._buffer = grown
+        
+        # Normalizar a escala completa (±1.0)
+        np.multiply(samples, 1.0 / 32768.0, out=self._buffer[self._fill:needed], casting='unsafe')
+        self._fill = needed
+    
+    def process(
+        self,
+        samples: npt.NDArray[np.int16]
+    ) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+        """
+        Agrega muestras y calcula los frames STFT de todos los hops completos.
+        
+        Args:
+            samples: Muestras int16 de un canal
+            
+        Returns:
+            Tuple (energías por banda en dB [frames × bandas], centroide en Hz
+            [frames], planitud espectral [frames])
+        """
+        self.push(samples)
+        
+        n_fft, hop = self.config.n_fft, self.config.hop_length
+        num_frames = 0 if self._fill < n_fft else (self._fill - n_fft) // hop + 1
+        if num_frames == 0:
+            empty = np.empty(0, dtype=np.float32)
+            return np.empty((0, self.config.n_bands), dtype=np.float32), empty, empty
+        
+        if self._windowed.shape[0] != num_frames:
+            self._windowed = np.empty((num_frames, n_fft), dtype=np.float32)
+            self._power = np.empty((num_frames, len(self._bin_freqs)), dtype=np.float32)
+            self._log_power = np.empty_like(self._power)
+        
+        # Frames solapados como vista sobre el buffer; una sola copia al ventanear
+        frames = np.lib.stride_tricks.sliding_window_view(self._buffer[:self._fill], n_fft)
+        np.multiply(frames[::hop][:num_frames], self._window, out=self._windowed)
+        
+        spectrum = np.fft.rfft(self._windowed, axis=1)
+        power = self._power
+        np.abs(spectrum, out=power)
+        power *= power
+        
+        # Energía por banda: una multiplicación de matrices para todos los frames
+        band_energies = power @ self._filterbank
+        band_energies += 1e-10
+        np.log10(band_energies, out=band_energies)
+        band_energies *= 10.0
+        
+        total = power.sum(axis=1)
+        centroid = (power @ self._bin_freqs) / (total + 1e-12)
+        
+        # Planitud: media geométrica / media aritmética del espectro de potencia
+        np.add(power, 1e-12, out=self._log_power)
+        np.log(self._log_power, out=self._log_power)
+        geometric = np.exp(self._log_power.mean(axis=1))
+        flatness = geometric / (total / power.shape[1] + 1e-12)
+        
+        # Conservar solo el solape necesario para el próximo hop
+        consumed = num_frames * hop
+        remaining = self._fill - consumed
+        self._buffer[:remaining] = self._buffer[consumed:self._fill]
+        self._fill = remaining
+        
+        return band_energies, centroid.astype(np.float32), flatness.astype(np.float32)
+
+
+class SpectralAudioAnalyzer(SimpleAudioAnalyzer):
+    """
+    Analizador RMS/ZCR enriquecido con features espectrales por chunk.
+    
+    Las alertas pueden filtrarse además por centroide y planitud espectral
+    (un chillido es agudo y tonal; el ruido de ventiladores es plano).
+    """
+    
+    def __init__(self, config: AnalysisConfig, sample_rate: int):
+        """
+        Inicializa el analizador.
+        
+        Args:
+            config: Configuración de análisis (incluye ``config.spectral``)
+            sample_rate: Frecuencia de muestreo del audio
+        """
+        super().__init__(config)
+        self.spectral_config = config.spectral
+        self.extractor = SpectralFeatureExtractor(config.spectral, sample_rate)
+    
+    def extract_features(self, frames: npt.NDArray[np.int16]) -> List[FeatureFrame]:
+        """
+        Calcula RMS/ZCR por lotes y las features espectrales de cada chunk.
+        
+        Args:
+            frames: Array 2-D int16 (chunks × muestras)
+            
+        Returns:
+            Lista de FeatureFrame con los campos espectrales completos
+        """
+        volumes, frequencies = self.analyze_batch(frames)
+        features = []
+        
+        for row, volume, frequency in zip(frames, volumes.tolist(), frequencies.tolist()):
+            band_energies, centroid, flatness = self.extractor.process(row)
+            chunk_features = FeatureFrame(volume=volume, frequency=frequency)
+            
+            # Un chunk puede contener varios hops: se promedian
+            if len(centroid):
+                chunk_features.band_energies = band_energies.mean(axis=0)
+                chunk_features.spectral_centroid = float(centroid.mean())
+                chunk_features.spectral_flatness = float(flatness.mean())
+            features.append(chunk_features)
+        
+        return features
+    
+    def _passes_spectral_filters(self, features: FeatureFrame) -> bool:
+        """
+        Verifica los filtros de centroide y planitud espectral.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si el chunk cumple los filtros (o no tiene datos espectrales)
+        """
+        if features.spectral_centroid is None or features.spectral_flatness is None:
+            return True
+        return (features.spectral_centroid >= self.spectral_config.min_centroid_hz and
+                features.spectral_flatness <= self.spectral_config.max_flatness)
+    
+    def should_trigger_on(self, features: FeatureFrame) -> bool:
+        """
+        Aplica los filtros espectrales antes de los umbrales RMS/ZCR.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si se debe disparar alerta
+        """
+        if not self._passes_spectral_filters(features):
+            # El chunk descartado sigue describiendo el ruido de fondo
+            if self.adaptive is not None:
+                self.adaptive.update(features.volume, features.frequency, self.clock())
+            return False
+        return super().should_trigger_on(features)
+    
+    def continues_event(self, features: FeatureFrame) -> bool:
+        """
+        Aplica los filtros espectrales para prolongar el evento abierto.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si el chunk sigue perteneciendo al evento
+        """
+        return self._passes_spectral_filters(features) and super().continues_event(features)
+
+
+# ========== DETECTOR EN CASCADA ==========
+
+@dataclass
+class StageStats:
+    """Tasa de paso y costo de CPU de una etapa de la cascada."""
+    name: str
+    evaluated: int = 0  # Chunks que llegaron a la etapa
+    passed: int = 0  # Chunks que la superaron
+    cpu_seconds: float = 0.0  # Tiempo de CPU del thread de análisis en la etapa
+    
+    @property
+    def pass_rate(self) -> float:
+        """Fracción de chunks evaluados que superaron la etapa."""
+        return self.passed / self.evaluated if self.evaluated else 0.0
+    
+    @property
+    def cpu_per_chunk(self) -> float:
+        """Costo medio de CPU por chunk evaluado (segundos)."""
+        return self.cpu_seconds / self.evaluated if self.evaluated else 0.0
+
+
+class CascadeAnalyzer(AudioAnalyzer):
+    """
+    Detector en cascada: cada etapa solo corre si la anterior la deja pasar.
+    
+    1. Compuerta de energía con aritmética entera: descarta chunks silenciosos.
+    2. Features espectrales y umbrales RMS/ZCR (SpectralAudioAnalyzer).
+    3. Modelo (opcional): cualquier AudioAnalyzer que decida sobre FeatureFrame.
+    
+    Expone tasa de paso y CPU por etapa para ajustar las compuertas y medir
+    el ahorro frente a correr todas las etapas siempre.
+    """
+    
+    def __init__(
+        self,
+        config: AnalysisConfig,
+        sample_rate: int,
+        model: Optional[AudioAnalyzer] = None
+    ):
+        """
+        Inicializa la cascada.
+        
+        Args:
+            config: Configuración de análisis
+            sample_rate: Frecuencia de muestreo del audio
+            model: Analizador de la etapa 3 (None = cascada de dos etapas)
+        """
+        self.config = config
+        # La compuerta descarta el silencio antes del umbral RMS/ZCR: un piso aprendido
+        # solo de los chunks que la superan quedaría sesgado, así que rigen los fijos
+        self.spectral = SpectralAudioAnalyzer(replace(config, use_adaptive_thresholds=False), sample_rate)
+        self.model = model
+        self._last_alert_time: float = float("-inf")
+        
+        # Umbral de la compuerta en suma de cuadrados int16, por tamaño de chunk
+        self._gate_thresholds: dict = {}
+        self._gate_was_open: bool = False  # El último chunk del lote anterior pasó la compuerta
+        
+        self._stages = [StageStats("energy_gate"), StageStats("spectral")]
+        if model is not None:
+            self._stages.append(StageStats("model"))
+    
+    def _gate_threshold(self, num_samples: int) -> int:
+        """
+        Convierte ``cascade_gate_rms`` en un umbral entero de suma de cuadrados.
+        
+        rms = sqrt(suma / n) * ganancia > gate  ⇔  suma > n * (gate / ganancia)²
+        
+        Args:
+            num_samples: Muestras por chunk
+            
+        Returns:
+            Umbral entero para la suma de cuadrados
+        """
+        threshold = self._gate_thresholds.get(num_samples)
+        if threshold is None:
+            threshold = int(num_samples * (self.config.cascade_gate_rms / self.config.gain) ** 2)
+            self._gate_thresholds[num_samples] = threshold
+        return threshold
+    
+    def analyze(self, audio_data: AudioBuffer) -> Tuple[float, float]:
+        """
+        Calcula RMS y ZCR del chunk (sin pasar por la cascada).
+        
+        Args:
+            audio_data: Datos de audio int16 (raw bytes o vista NumPy)
+            
+        Returns:
+            Tuple con (rms, zero_crossing_rate)
+        """
+        return self.spectral.analyze(audio_data)
+    
+    def extract_features(self, frames: npt.NDArray[np.int16]) -> List[FeatureFrame]:
+        """
+        Pasa el lote por la cascada y anota en cada FeatureFrame las etapas superadas.
+        
+        Args:
+            frames: Array 2-D int16 (chunks × muestras)
+            
+        Returns:
+            Lista de FeatureFrame, una por chunk
+        """
+        gate, spectral_stage = self._stages[0], self._stages[1]
+        
+        # Etapa 1: suma de cuadrados con acumulación int64, sin coma flotante
+        start = time.thread_time()
+        sum_squares = np.einsum('ij,ij->i', frames, frames, dtype=np.int64)
+        passing = np.flatnonzero(sum_squares > self._gate_threshold(frames.shape[1]))
+        gate.cpu_seconds += time.thread_time() - start
+        gate.evaluated += len(frames)
+        gate.passed += len(passing)
+        
+        # Los chunks descartados solo reportan su volumen (para la consola)
+        volumes = np.sqrt(sum_squares / max(frames.shape[1], 1)) * self.config.gain
+        features = [
+            FeatureFrame(volume=volume, frequency=0.0, stages_passed=0)
+            for volume in volumes.tolist()
+        ]
+        
+        if len(passing) == 0:
+            self._gate_was_open = False
+            return features
+        
+        # Etapa 2: features espectrales y umbrales RMS/ZCR solo de los chunks activos.
+        # La STFT en streaming solapa cada chunk con el anterior: se alimenta por
+        # tramos contiguos y el solape se descarta en cada hueco de la compuerta
+        start = time.thread_time()
+        candidates = []
+        runs = np.split(passing, np.flatnonzero(np.diff(passing) != 1) + 1)
+        for run in runs:
+            first, last = int(run[0]), int(run[-1])
+            if first > 0 or not self._gate_was_open:
+                self.spectral.extractor.reset()
+            run_features = self.spectral.extract_features(frames[first:last + 1])
+            for index, chunk_features in enumerate(run_features, start=first):
+                chunk_features.stages_passed = 1
+                if self.spectral.continues_event(chunk_features):
+                    chunk_features.stages_passed = 2
+                    candidates.append(chunk_features)
+                features[index] = chunk_features
+        self._gate_was_open = last == len(frames) - 1
+        spectral_stage.cpu_seconds += time.thread_time() - start
+        spectral_stage.evaluated += len(passing)
+        spectral_stage.passed += len(candidates)
+        
+        # Etapa 3: el modelo solo ve los candidatos de la etapa espectral
+        if self.model is not None and candidates:
+            model_stage = self._stages[2]
+            start = time.thread_time()
+            for chunk_features in candidates:
+                if self.model.continues_event(chunk_features):
+                    chunk_features.stages_passed = 3
+                    model_stage.passed += 1
+            model_stage.cpu_seconds += time.thread_time() - start
+            model_stage.evaluated += len(candidates)
+        
+        return features
+    
+    def _is_detection(self, features: FeatureFrame) -> bool:
+        """
+        Indica si el chunk superó todas las etapas de la cascada.
+        
+        Args:
+            features: Features del chunk (producidas por ``extract_features``)
+            
+        Returns:
+            True si el chunk pasó todas las etapas
+        """
+        return features.stages_passed == len(self._stages)
+    
+    def should_trigger_on(self, features: FeatureFrame) -> bool:
+        """
+        Dispara si el chunk superó todas las etapas y no hay cooldown activo.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si se debe disparar alerta
+        """
+        current_time = self.clock()
+        if current_time - self._last_alert_time < self.config.cooldown_seconds:
+            return False
+        
+        if self._is_detection(features):
+            self._last_alert_time = current_time
+            return True
+        return False
+    
+    def continues_event(self, features: FeatureFrame) -> bool:
+        """
+        Prolonga el evento si el chunk superó todas las etapas.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si el chunk sigue perteneciendo al evento
+        """
+        return self._is_detection(features)
+    
+    def sustains_event(self, features: FeatureFrame) -> bool:
+        """
+        Umbral de salida por volumen (calculado para todos los chunks, pasen o no la compuerta).
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si el chunk sigue perteneciendo al episodio
+        """
+        return self.spectral.sustains_event(features)
+    
+    def should_trigger_alert(self, volume_metric: float, frequency_metric: float) -> bool:
+        """
+        Decisión a partir de la tupla (volumen, frecuencia): solo umbrales RMS/ZCR.
+        
+        Args:
+            volume_metric: Valor RMS del audio
+            frequency_metric: Valor ZCR del audio
+            
+        Returns:
+            True si cumple condiciones de alerta
+        """
+        return self.spectral.should_trigger_alert(volume_metric, frequency_metric)
+    
+    def close(self) -> None:
+        """Libera los recursos del modelo de la etapa 3."""
+        if self.model is not None:
+            self.model.close()
+    
+    def get_stage_stats(self) -> List[StageStats]:
+        """
+        Obtiene tasa de paso y CPU de cada etapa.
+        
+        Returns:
+            Lista de snapshots de StageStats, en orden de la cascada
+        """
+        return [replace(stage) for stage in self._stages]
+    
+    def estimated_cpu_saved(self) -> float:
+        """
+        Estima la CPU ahorrada frente a correr todas las etapas en cada chunk.
+        
+        Cada chunk que no llegó a una etapa se valora al costo medio medido
+        de esa etapa.
+        
+        Returns:
+            Segundos de CPU ahorrados
+        """
+        total_chunks = self._stages[0].evaluated
+        return sum(
+            (total_chunks - stage.evaluated) * stage.cpu_per_chunk
+            for stage in self._stages[1:]
+        )
+
+
+# ========== INFERENCIA DE MODELO FUERA DE PROCESO ==========
+
+class NumpyMLPBackend:
+    """
+    Backend de referencia: perceptrón multicapa en NumPy, solo CPU.
+    
+    Capas ocultas ReLU y salida sigmoide. Sirve para probar offline todo el
+    camino de inferencia hasta tener el modelo entrenado real.
+    """
+    
+    def __init__(self, weights: Sequence[npt.NDArray[np.float32]], biases: Sequence[npt.NDArray[np.float32]]):
+        """
+        Inicializa el backend.
+        
+        Args:
+            weights: Matrices de pesos por capa (entrada × salida)
+            biases: Vectores de bias por capa
+        """
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=np.float32) for b in biases]
+    
+    @property
+    def input_dim(self) -> int:
+        """Dimensión del vector de entrada."""
+        return self.weights[0].shape[0]
+    
+    @classmethod
+    def from_file(cls, path: str) -> "NumpyMLPBackend":
+        """
+        Carga pesos desde un .npz con arrays W0, b0, W1, b1, ...
+        
+        Args:
+            path: Ruta del archivo .npz
+            
+        Returns:
+            Backend con los pesos cargados
+        """
+        with np.load(path) as data:
+            num_layers = len([key for key in data.files if key.startswith("W")])
+            weights = [data[f"W{i}"] for i in range(num_layers)]
+            biases = [data[f"b{i}"] for i in range(num_layers)]
+        return cls(weights, biases)
+    
+    @classmethod
+    def random(cls, input_dim: int, hidden_units: Sequence[int] = (64,), seed: int = 0) -> "NumpyMLPBackend":
+        """
+        Crea un MLP con pesos aleatorios (referencia para pruebas y benchmarks).
+        
+        Args:
+            input_dim: Dimensión del vector de entrada
+            hidden_units: Unidades por capa oculta
+            seed: Semilla del generador aleatorio
+            
+        Returns:
+            Backend con pesos aleatorios
+        """
+        rng = np.random.default_rng(seed)
+        sizes = [input_dim, *hidden_units, 1]
+        weights = [
+            rng.normal(0.0, np.sqrt(2.0 / fan_in), size=(fan_in, fan_out))
+            for fan_in, fan_out in zip(sizes[:-1], sizes[1:])
+        ]
+        biases = [np.zeros(fan_out) for fan_out in sizes[1:]]
+        return cls(weights, biases)
+    
+    def predict(self, batch: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        """
+        Calcula el score de cada ventana del lote.
+        
+        Args:
+            batch: Array (ventanas × input_dim)
+            
+        Returns:
+            Scores en [0, 1], uno por ventana
+        """
+        activations = batch
+        for weights, bias in zip(self.weights[:-1], self.biases[:-1]):
+            activations = activations @ weights
+            activations += bias
+            np.maximum(activations, 0.0, out=activations)
+        
+        logits = (activations @ self.weights[-1] + self.biases[-1])[:, 0]
+        return 1.0 / (1.0 + np.exp(-logits))
+
+
+def _inference_worker_main(
+    requests_name: str,
+    scores_name: str,
+    request_slots: int,
+    input_dim: int,
+    backend: NumpyMLPBackend,
+    max_batch_size: int,
+    max_batch_latency: float,
+    request_queue: "multiprocessing.Queue",
+    result_queue: "multiprocessing.Queue"
+) -> None:
+    """
+    Loop del proceso de inferencia (ejecutado en un proceso separado).
+    
+    Espera la primera ventana, junta las que lleguen dentro del presupuesto de
+    latencia (o hasta ``max_batch_size``) y evalúa el micro-batch de una vez.
+    Los scores se escriben en memoria compartida; por la cola solo viajan
+    índices de slots.
+    """
+    # Los bloques los crea y libera el proceso padre (comparte su resource_tracker)
+    requests_block = shared_memory.SharedMemory(name=requests_name)
+    scores_block = shared_memory.SharedMemory(name=scores_name)
+    requests = np.ndarray((request_slots, input_dim), dtype=np.float32, buffer=requests_block.buf)
+    scores = np.ndarray((request_slots,), dtype=np.float32, buffer=scores_block.buf)
+    
+    try:
+        running = True
+        while running:
+            item = request_queue.get()
+            if item is None:
+                break
+            
+            batch = [item]
+            deadline = time.monotonic() + max_batch_latency
+            while len(batch) < max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = request_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            
+            slots = [slot for slot, _ in batch]
+            start = time.perf_counter()
+            scores[slots] = backend.predict(requests[slots])
+            result_queue.put((batch, time.perf_counter() - start))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del requests, scores
+        requests_block.close()
+        scores_block.close()
+
+
+@dataclass
+class ModelStats:
+    """Métricas del proceso de inferencia."""
+    requests: int = 0
+    completed: int = 0
+    dropped: int = 0  # Ventanas descartadas por no haber slots libres
+    batches: int = 0
+    compute_seconds: float = 0.0  # Tiempo de cómputo dentro del proceso de inferencia
+    latency_p50_ms: float = 0.0  # Envío → score disponible
+    latency_p99_ms: float = 0.0
+    
+    @property
+    def mean_batch_size(self) -> float:
+        """Tamaño medio de los micro-batches."""
+        return self.completed / self.batches if self.batches else 0.0
+
+
+class ModelAnalyzer(AudioAnalyzer):
+    """
+    Analizador que delega la inferencia en un proceso separado.
+    
+    Las ventanas de features viajan por memoria compartida y el proceso de
+    inferencia las agrupa en micro-batches; los scores vuelven de forma
+    asíncrona, por lo que la decisión de un chunk usa el último score
+    disponible (típicamente el de uno o dos chunks atrás). Así el modelo no
+    compite por el GIL con el thread de detección.
+    
+    Pensado como etapa 3 de CascadeAnalyzer; usado solo calcula sus propias
+    features con SpectralAudioAnalyzer.
+    """
+    
+    def __init__(
+        self,
+        config: AnalysisConfig,
+        sample_rate: int,
+        backend: Optional[NumpyMLPBackend] = None
+    ):
+        """
+        Inicializa el analizador (el proceso de inferencia arranca con la primera ventana).
+        
+        Args:
+            config: Configuración de análisis (incluye ``config.model``)
+            sample_rate: Frecuencia de muestreo del audio
+            backend: Backend de inferencia (None = según ``config.model``)
+        """
+        self.config = config
+        self.model_config = config.model
+        self.sample_rate = sample_rate
+        self._features_analyzer = SpectralAudioAnalyzer(config, sample_rate)
+        self._last_alert_time: float = float("-inf")
+        
+        # Vector por frame: bandas mel + centroide + planitud + volumen + frecuencia
+        self._frame_dim = config.spectral.n_bands + 4
+        self.input_dim = self._frame_dim * self.model_config.context_frames
+        
+        if backend is None:
+            if self.model_config.model_path:
+                backend = NumpyMLPBackend.from_file(self.model_config.model_path)
+            else:
+                logger.warning("⚠ ModelAnalyzer sin model_path: usando pesos aleatorios de referencia")
+                backend = NumpyMLPBackend.random(self.input_dim, self.model_config.hidden_units)
+        if backend.input_dim != self.input_dim:
+            raise ValueError(
+                f"El modelo espera {backend.input_dim} features, la ventana tiene {self.input_dim}"
+            )
+        self.backend = backend
+        
+        # Ventana deslizante de frames (ring) por stream (un stream por canal de audio)
+        self._windows: Dict[int, npt.NDArray[np.float32]] = {}
+        self._window_positions: Dict[int, int] = {}
+        
+        # Proceso de inferencia y memoria compartida (se crean al primer envío)
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._requests_block: Optional[shared_memory.SharedMemory] = None
+        self._scores_block: Optional[shared_memory.SharedMemory] = None
+        self._requests: Optional[npt.NDArray[np.float32]] = None
+        self._scores: Optional[npt.NDArray[np.float32]] = None
+        self._request_queue = None
+        self._result_queue = None
+        self._result_thread: Optional[threading.Thread] = None
+        
+        # Estado de las solicitudes en vuelo (protegido por _lock)
+        self._lock = threading.Lock()
+        self._next_request_id: int = 0
+        self._slot_busy = np.zeros(self.model_config.request_slots, dtype=np.bool_)
+        self._slot_submit_time = np.zeros(self.model_config.request_slots, dtype=np.float64)
+        self._slot_stream = np.zeros(self.model_config.request_slots, dtype=np.int32)
+        self._latest_results: Dict[int, Tuple[int, float, float]] = {}  # stream → (id, score, envío)
+        self._latencies: deque = deque(maxlen=1000)
+        self._stats = ModelStats()
+    
+    def _ensure_worker(self) -> None:
+        """Crea la memoria compartida y arranca el proceso de inferencia."""
+        if self._process is not None and self._process.is_alive():
+            return
+        if self._process is not None:
+            logger.error("✗ El proceso de inferencia terminó inesperadamente; reiniciando...")
+            self.close()
+        
+        slots = self.model_config.request_slots
+        self._requests_block = shared_memory.SharedMemory(create=True, size=slots * self.input_dim * 4)
+        self._scores_block = shared_memory.SharedMemory(create=True, size=slots * 4)
+        self._requests = np.ndarray((slots, self.input_dim), dtype=np.float32, buffer=self._requests_block.buf)
+        self._scores = np.ndarray((slots,), dtype=np.float32, buffer=self._scores_block.buf)
+        self._slot_busy[:] = False
+        
+        # spawn: nunca hacer fork de un proceso con threads de PortAudio activos
+        context = multiprocessing.get_context("spawn")
+        self._request_queue = context.Queue()
+        self._result_queue = context.Queue()
+        self._process = context.Process(
+            target=_inference_worker_main,
+            args=(
+                self._requests_block.name,
+                self._scores_block.name,
+                slots,
+                self.input_dim,
+                self.backend,
+                self.model_config.max_batch_size,
+                self.model_config.max_batch_latency_ms / 1000.0,
+                self._request_queue,
+                self._result_queue
+            ),
+            daemon=True,
+            name="ModelInferenceProcess"
+        )
+        self._process.start()
+        
+        self._result_thread = threading.Thread(
+            target=self._result_loop,
+            args=(self._result_queue,),
+            daemon=True,
+            name="ModelResultThread"
+        )
+        self._result_thread.start()
+        logger.info(f"✓ Proceso de inferencia iniciado (PID {self._process.pid})")
+    
+    def _result_loop(self, result_queue: "multiprocessing.Queue") -> None:
+        """Recibe los micro-batches evaluados y publica sus scores (thread separado)."""
+        while True:
+            try:
+                item = result_queue.get()
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+            
+            batch, compute_seconds = item
+            now = time.monotonic()
+            with self._lock:
+                if self._scores is None:
+                    break
+                for slot, request_id in batch:
+                    submit_time = self._slot_submit_time[slot]
+                    stream = int(self._slot_stream[slot])
+                    self._latencies.append(now - submit_time)
+                    if request_id > self._latest_results.get(stream, (-1, 0.0, 0.0))[0]:
+                        self._latest_results[stream] = (request_id, float(self._scores[slot]), submit_time)
+                    self._slot_busy[slot] = False
+                self._stats.completed += len(batch)
+                self._stats.batches += 1
+                self._stats.compute_seconds += compute_seconds
+    
+    def frame_vector(self, features: FeatureFrame) -> npt.NDArray[np.float32]:
+        """
+        Convierte un FeatureFrame en el vector de entrada de un frame.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            Vector float32 de ``n_bands + 4`` valores aproximadamente normalizados
+        """
+        vector = np.zeros(self._frame_dim, dtype=np.float32)
+        n_bands = self.config.spectral.n_bands
+        if features.band_energies is not None:
+            vector[:n_bands] = features.band_energies / 100.0
+        vector[n_bands] = (features.spectral_centroid or 0.0) / (self.sample_rate / 2)
+        vector[n_bands + 1] = features.spectral_flatness or 0.0
+        vector[n_bands + 2] = np.log1p(features.volume) / 10.0
+        vector[n_bands + 3] = features.frequency / 1000.0
+        return vector
+    
+    def submit(self, features: FeatureFrame, stream: int = 0) -> Optional[int]:
+        """
+        Agrega el frame a la ventana del stream y la envía al proceso de inferencia.
+        
+        Args:
+            features: Features del chunk más reciente
+            stream: Stream (canal) al que pertenece el frame
+            
+        Returns:
+            ID de la solicitud, o None si no había slots libres
+        """
+        self._ensure_worker()
+        
+        context = self.model_config.context_frames
+        window = self._windows.get(stream)
+        if window is None:
+            window = self._windows[stream] = np.zeros((context, self._frame_dim), dtype=np.float32)
+        position = self._window_positions.get(stream, 0)
+        window[position % context] = self.frame_vector(features)
+        position = self._window_positions[stream] = position + 1
+        
+        with self._lock:
+            request_id = self._next_request_id
+            slot = request_id % self.model_config.request_slots
+            self._stats.requests += 1
+            if self._slot_busy[slot]:
+                self._stats.dropped += 1
+                return None
+            self._next_request_id += 1
+            self._slot_busy[slot] = True
+            self._slot_submit_time[slot] = time.monotonic()
+            self._slot_stream[slot] = stream
+        
+        # Escribir la ventana en orden cronológico directamente en memoria compartida
+        oldest = position % context
+        request = self._requests[slot].reshape(context, self._frame_dim)
+        request[:context - oldest] = window[oldest:]
+        request[context - oldest:] = window[:oldest]
+        
+        self._request_queue.put((slot, request_id))
+        return request_id
+    
+    def latest_score(self, stream: int = 0) -> Optional[float]:
+        """
+        Obtiene el score más reciente del stream, si es suficientemente nuevo.
+        
+        Args:
+            stream: Stream (canal) consultado
+            
+        Returns:
+            Score en [0, 1] o None si no hay un score reciente
+        """
+        with self._lock:
+            request_id, score, submit_time = self._latest_results.get(stream, (-1, 0.0, 0.0))
+        if request_id < 0 or time.monotonic() - submit_time > self.model_config.max_score_age_seconds:
+            return None
+        return score
+    
+    def analyze(self, audio_data: AudioBuffer) -> Tuple[float, float]:
+        """
+        Calcula RMS y ZCR del chunk (sin pasar por el modelo).
+        
+        Args:
+            audio_data: Datos de audio int16 (raw bytes o vista NumPy)
+            
+        Returns:
+            Tuple con (rms, zero_crossing_rate)
+        """
+        return self._features_analyzer.analyze(audio_data)
+    
+    def extract_features(self, frames: npt.NDArray[np.int16]) -> List[FeatureFrame]:
+        """
+        Calcula las features espectrales de cada chunk (uso sin cascada).
+        
+        Args:
+            frames: Array 2-D int16 (chunks × muestras)
+            
+        Returns:
+            Lista de FeatureFrame, una por chunk
+        """
+        return self._features_analyzer.extract_features(frames)
+    
+    def continues_event(self, features: FeatureFrame) -> bool:
+        """
+        Envía el frame al modelo y decide con el último score disponible.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si el score más reciente supera ``score_threshold``
+        """
+        self.submit(features)
+        score = self.latest_score()
+        return score is not None and score >= self.model_config.score_threshold
+    
+    def should_trigger_on(self, features: FeatureFrame) -> bool:
+        """
+        Dispara según el score del modelo, respetando el cooldown.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si se debe disparar alerta
+        """
+        if not self.continues_event(features):
+            return False
+        
+        current_time = self.clock()
+        if current_time - self._last_alert_time < self.config.cooldown_seconds:
+            return False
+        self._last_alert_time = current_time
+        return True
+    
+    def should_trigger_alert(self, volume_metric: float, frequency_metric: float) -> bool:
+        """
+        Sin features espectrales el modelo no puede decidir: usa umbrales RMS/ZCR.
+        
+        Args:
+            volume_metric: Valor RMS del audio
+            frequency_metric: Valor ZCR del audio
+            
+        Returns:
+            True si cumple condiciones de alerta
+        """
+        return self._features_analyzer.should_trigger_alert(volume_metric, frequency_metric)
+    
+    def get_model_stats(self) -> ModelStats:
+        """
+        Obtiene las métricas de inferencia (throughput, batching y latencia).
+        
+        Returns:
+            Snapshot de ModelStats
+        """
+        with self._lock:
+            stats = replace(self._stats)
+            latencies = np.array(self._latencies, dtype=np.float64)
+        if latencies.size:
+            stats.latency_p50_ms = float(np.percentile(latencies, 50) * 1000)
+            stats.latency_p99_ms = float(np.percentile(latencies, 99) * 1000)
+        return stats
+    
+    def close(self) -> None:
+        """Detiene el proceso de inferencia y libera la memoria compartida."""
+        if self._process is not None:
+            if self._process.is_alive():
+                self._request_queue.put(None)
+                self._process.join(timeout=2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(timeout=1.0)
+            self._process = None
+        
+        if self._result_queue is not None:
+            self._result_queue.put(None)
+            if self._result_thread is not None:
+                self._result_thread.join(timeout=1.0)
+            self._result_queue = None
+            self._request_queue = None
+        
+        with self._lock:
+            self._requests = None
+            self._scores = None
+        for block in (self._requests_block, self._scores_block):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self._requests_block = None
+        self._scores_block = None
+
+
+class ModelStreamAnalyzer(AudioAnalyzer):
+    """
+    Vista de un canal sobre un ModelAnalyzer compartido.
+    
+    Cada canal conserva su ventana de contexto, su último score y su
+    cooldown, pero todos comparten el proceso de inferencia: los frames de
+    varios micrófonos se agrupan en los mismos micro-batches.
+    """
+    
+    def __init__(self, model: ModelAnalyzer, stream: int):
+        """
+        Inicializa la vista del canal.
+        
+        Args:
+            model: ModelAnalyzer compartido (lo cierra su dueño, no esta vista)
+            stream: Canal de audio
+        """
+        self.model = model
+        self.stream = stream
+        self.config = model.config
+        self._features_analyzer = SpectralAudioAnalyzer(model.config, model.sample_rate)
+        self._last_alert_time: float = float("-inf")
+    
+    def analyze(self, audio_data: AudioBuffer) -> Tuple[float, float]:
+        """
+        Calcula RMS y ZCR del chunk (sin pasar por el modelo).
+        
+        Args:
+            audio_data: Datos de audio int16 (raw bytes o vista NumPy)
+            
+        Returns:
+            Tuple con (rms, zero_crossing_rate)
+        """
+        return self._features_analyzer.analyze(audio_data)
+    
+    def extract_features(self, frames: npt.NDArray[np.int16]) -> List[FeatureFrame]:
+        """
+        Calcula las features espectrales del canal (estado STFT propio).
+        
+        Args:
+            frames: Array 2-D int16 (chunks × muestras) del canal
+            
+        Returns:
+            Lista de FeatureFrame, una por chunk
+        """
+        return self._features_analyzer.extract_features(frames)
+    
+    def continues_event(self, features: FeatureFrame) -> bool:
+        """
+        Envía el frame al modelo compartido y decide con el último score del canal.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si el score más reciente del canal supera ``score_threshold``
+        """
+        self.model.submit(features, self.stream)
+        score = self.model.latest_score(self.stream)
+        return score is not None and score >= self.model.model_config.score_threshold
+    
+    def should_trigger_on(self, features: FeatureFrame) -> bool:
+        """
+        Dispara según el score del canal, con cooldown propio del canal.
+        
+        Args:
+            features: Features del chunk
+            
+        Returns:
+            True si se debe disparar alerta
+        """
+        if not self.continues_event(features):
+            return False
+        
+        current_time = self.clock()
+        if current_time - self._last_alert_time < self.config.cooldown_seconds:
+            return False
+        self._last_alert_time = current_time
+        return True
+    
+    def should_trigger_alert(self, volume_metric: float, frequency_metric: float) -> bool:
+        """
+        Sin features espectrales usa los umbrales RMS/ZCR.
+        
+        Args:
+            volume_metric: Valor RMS del audio
+            frequency_metric: Valor ZCR del audio
+            
+        Returns:
+            True si cumple condiciones de alerta
+        """
+        return self._features_analyzer.should_trigger_alert(volume_metric, frequency_metric)
+
+
+# ========== CAPA DE CAPTURA: MICRÓFONO ==========
+
+@dataclass
+class CaptureStats:
+    """Contadores de salud de la captura de audio."""
+    chunks_captured: int = 0
+    overflow_count: int = 0  # Callbacks con flag paInputOverflow
+    dropped_frames: int = 0  # Frames perdidos (estimados por saltos de tiempo ADC)
+    read_errors: int = 0
+    reconnections: int = 0
+    process_restarts: int = 0  # Reinicios del proceso de captura (modo multiproceso)
+
+
+# Causas de un hueco de captura; la primera se asume si la captura no informó otra
+CAPTURE_GAP_CAUSES = ("overflow", "stall", "stream_closed", "read_error", "device_unavailable", "capture_process")
+
+
+@dataclass
+class CaptureGap:
+    """Hueco en el audio capturado (medido por el reloj de muestras)."""
+    seq: int  # Primer chunk después del hueco
+    started_at: datetime
+    duration_seconds: float
+    cause: str  # Una de CAPTURE_GAP_CAUSES
+
+
+def ring_buffer_slots(config: AudioConfig) -> int:
+    """
+    Calcula cuántos chunks caben en el historial configurado.
+    
+    Args:
+        config: Configuración de audio
+        
+    Returns:
+        Número de slots del ring buffer
+    """
+    chunk_seconds = config.chunk_size / config.sample_rate
+    return max(2, int(np.ceil(config.ring_buffer_seconds / chunk_seconds)))
+
+
+class AudioRingBuffer:
+    """
+    Buffer circular preasignado de chunks de audio int16.
+    
+    Cada chunk escrito recibe un número de secuencia monótono. Los lectores
+    obtienen vistas NumPy sin copia sobre el slot correspondiente; una vista
+    es válida hasta que el writer da la vuelta al buffer (``capacity`` chunks).
+    """
+    
+    def __init__(
+        self,
+        num_slots: int,
+        samples_per_chunk: int,
+        buffer: Optional[npt.NDArray[np.int16]] = None,
+        publish_ns: Optional[npt.NDArray[np.int64]] = None,
+        onset_ns: Optional[npt.NDArray[np.int64]] = None
+    ):
+        """
+        Inicializa el buffer.
+        
+        Args:
+            num_slots: Número de chunks que caben en el historial
+            samples_per_chunk: Muestras int16 por chunk (frames * canales)
+            buffer: Almacenamiento externo (slots × muestras), ej. memoria
+                compartida (None = array propio)
+            publish_ns: Almacenamiento externo del instante de publicación de
+                cada slot (None = array propio)
+            onset_ns: Almacenamiento externo del instante de captura de cada
+                slot (None = array propio)
+        """
+        if buffer is None:
+            buffer = np.zeros((num_slots, samples_per_chunk), dtype=np.int16)
+        if publish_ns is None:
+            publish_ns = np.zeros(num_slots, dtype=np.int64)
+        if onset_ns is None:
+            onset_ns = np.zeros(num_slots, dtype=np.int64)
+        self._buffer: npt.NDArray[np.int16] = buffer
+        self._publish_ns: npt.NDArray[np.int64] = publish_ns  # time.monotonic_ns() por slot
+        self._onset_ns: npt.NDArray[np.int64] = onset_ns  # Primera muestra según el ADC (0 = desconocido)
+        self._num_slots = num_slots
+        self._write_seq: int = 0  # Secuencia del próximo chunk a escribir
+        self._gap_cause: str = CAPTURE_GAP_CAUSES[0]
+        self._lock = threading.Lock()
+        self._data_available = threading.Condition(self._lock)
+    
+    @property
+    def capacity(self) -> int:
+        """Número de chunks que conserva el historial."""
+        return self._num_slots
+    
+    @property
+    def gap_cause(self) -> str:
+        """Causa del último corte informado por la captura (la consume quien mide el hueco)."""
+        return self._gap_cause
+    
+    @gap_cause.setter
+    def gap_cause(self, cause: str) -> None:
+        self._gap_cause = cause
+    
+    @property
+    def write_seq(self) -> int:
+        """Número total de chunks escritos desde el inicio."""
+        return self._write_seq
+    
+    def write(self, audio_data: AudioBuffer, onset_ns: int = 0) -> int:
+        """
+        Copia un chunk en el siguiente slot (única copia del camino de captura).
+        
+        Args:
+            audio_data: Chunk int16 (bytes del stream o array)
+            onset_ns: Instante de la primera muestra en ``time.monotonic_ns()``
+                según el reloj ADC del stream (0 = desconocido)
+            
+        Returns:
+            Número de secuencia asignado al chunk
+        """
+        samples = np.frombuffer(audio_data, dtype=np.int16)
+        seq = self._write_seq
+        slot = self._buffer[seq % self._num_slots]
+        
+        count = min(samples.size, slot.size)
+        slot[:count] = samples[:count]
+        if count < slot.size:
+            slot[count:] = 0
+        self._publish_ns[seq % self._num_slots] = time.monotonic_ns()
+        self._onset_ns[seq % self._num_slots] = onset_ns
+        
+        # Publicar el chunk solo después de copiarlo completo y despertar lectores
+        with self._data_available:
+            self._write_seq = seq + 1
+            self._data_available.notify_all()
+        return seq
+    
+    def wait_for(
+        self,
+        seq: int,
+        timeout: float,
+        max_chunks: int = 1
+    ) -> Optional[Tuple[int, npt.NDArray[np.int16]]]:
+        """
+        Espera (sin polling) a que el chunk ``seq`` esté disponible.
+        
+        Si el lector se quedó atrás y el chunk ya fue sobrescrito, retorna a
+        partir del chunk más antiguo todavía disponible; el llamador detecta el
+        salto comparando la secuencia retornada con la pedida.
+        
+        Args:
+            seq: Secuencia del chunk deseado
+            timeout: Tiempo máximo de espera en segundos
+            max_chunks: Máximo de chunks consecutivos a retornar (si ya existen)
+            
+        Returns:
+            Tuple (secuencia del primero, vista 2-D chunks × muestras) o None
+            si venció el timeout
+        """
+        write_seq = self._wait_published(seq, timeout)
+        if write_seq <= seq:
+            return None
+        
+        seq = max(seq, write_seq - self._num_slots)
+        
+        # Chunks contiguos en memoria: sin cruzar el final del buffer
+        first_slot = seq % self._num_slots
+        count = min(max_chunks, write_seq - seq, self._num_slots - first_slot)
+        
+        view = self._buffer[first_slot:first_slot + count]
+        view.flags.writeable = False
+        return seq, view
+    
+    def _wait_published(self, seq: int, timeout: float) -> int:
+        """
+        Espera en la condición del buffer a que se publique el chunk ``seq``.
+        
+        Args:
+            seq: Secuencia del chunk deseado
+            timeout: Tiempo máximo de espera en segundos
+            
+        Returns:
+            Secuencia del próximo chunk a escribir al terminar la espera
+        """
+        with self._data_available:
+            if self._write_seq <= seq:
+                self._data_available.wait_for(lambda: self._write_seq > seq, timeout)
+            return self._write_seq
+    
+    def publish_time(self, seq: int) -> Optional[float]:
+        """
+        Instante en que se publicó un chunk (reloj monótono del sistema).
+        
+        Args:
+            seq: Número de secuencia del chunk
+            
+        Returns:
+            Segundos de ``time.monotonic()`` o None si el chunk aún no existe
+            o ya fue sobrescrito
+        """
+        write_seq = self.write_seq
+        if seq >= write_seq or seq < write_seq - self._num_slots:
+            return None
+        return int(self._publish_ns[seq % self._num_slots]) / 1e9
+    
+    def onset_time(self, seq: int) -> Optional[float]:
+        """
+        Instante de la primera muestra de un chunk según el reloj ADC del stream.
+        
+        Args:
+            seq: Número de secuencia del chunk
+            
+        Returns:
+            Segundos de ``time.monotonic()`` o None si la captura no lo informó
+            o el chunk no está en el historial
+        """
+        write_seq = self.write_seq
+        if seq >= write_seq or seq < write_seq - self._num_slots:
+            return None
+        onset_ns = int(self._onset_ns[seq % self._num_slots])
+        return onset_ns / 1e9 if onset_ns else None
+    
+    def get_view(self, seq: int) -> Optional[npt.NDArray[np.int16]]:
+        """
+        Obtiene una vista de solo lectura del chunk con secuencia ``seq``.
+        
+        Args:
+            seq: Número de secuencia del chunk
+            
+        Returns:
+            Vista sin copia o None si el chunk aún no existe o ya fue sobrescrito
+        """
+        write_seq = self.write_seq
+        
+        if seq >= write_seq or seq < write_seq - self._num_slots:
+            return None
+        
+        view = self._buffer[seq % self._num_slots]
+        view.flags.writeable = False
+        return view
+    
+    def copy_range(self, start_seq: int, end_seq: int) -> npt.NDArray[np.int16]:
+        """
+        Copia los chunks [start_seq, end_seq) en un único array contiguo.
+        
+        El rango se recorta a lo que sigue disponible en el historial. Es la
+        única copia que se hace para construir un clip.
+        
+        Args:
+            start_seq: Primer chunk (inclusive)
+            end_seq: Último chunk (exclusive)
+            
+        Returns:
+            Array 1-D int16 con las muestras intercaladas del rango
+        """
+        write_seq = self.write_seq
+        
+        start_seq = max(start_seq, write_seq - self._num_slots, 0)
+        end_seq = min(end_seq, write_seq)
+        num_chunks = max(end_seq - start_seq, 0)
+        
+        out = np.empty((num_chunks, self._buffer.shape[1]), dtype=np.int16)
+        if num_chunks:
+            first_slot = start_seq % self._num_slots
+            head = min(num_chunks, self._num_slots - first_slot)
+            out[:head] = self._buffer[first_slot:first_slot + head]
+            out[head:] = self._buffer[:num_chunks - head]
+        return out.reshape(-1)
+    
+    def latest(self) -> Optional[Tuple[int, npt.NDArray[np.int16]]]:
+        """
+        Obtiene el último chunk escrito.
+        
+        Returns:
+            Tuple (secuencia, vista) o None si todavía no hay audio
+        """
+        seq = self.write_seq - 1
+        if seq < 0:
+            return None
+        view = self.get_view(seq)
+        return (seq, view) if view is not None else None
+
+
+class SharedAudioRingBuffer(AudioRingBuffer):
+    """
+    AudioRingBuffer en memoria compartida entre procesos.
+    
+    Un único proceso escribe (el de captura); cualquier proceso que conozca
+    el nombre del bloque puede adjuntarse y leer vistas sin copia. No hay
+    locks entre procesos: la secuencia publicada vive en una cabecera int64
+    que el writer actualiza después de copiar el chunk, y los lectores la
+    consultan con un sondeo corto. Si el proceso de captura muere, ningún
+    lock queda tomado y otro proceso puede retomar la escritura.
+    
+    La cabecera también transporta los contadores de salud de la captura,
+    un heartbeat, la causa del último corte y la orden de detenerse. Tras
+    ella van los instantes de publicación y de captura de cada slot:
+    ``time.monotonic`` es el mismo reloj en todos los procesos, así que
+    latencias y marcas de tiempo se miden igual que con un thread.
+    """
+    
+    # Campos de la cabecera (int64)
+    _SEQ, _STOP, _HEARTBEAT_NS = 0, 1, 2
+    _STATS_FIELDS = ("chunks_captured", "overflow_count", "dropped_frames", "read_errors", "reconnections")
+    _GAP_CAUSE = 3 + len(_STATS_FIELDS)  # Índice en CAPTURE_GAP_CAUSES
+    _HEADER_FIELDS = _GAP_CAUSE + 1
+    _HEADER_BYTES = 128
+    
+    def __init__(
+        self,
+        num_slots: int,
+        samples_per_chunk: int,
+        name: Optional[str] = None,
+        poll_interval: float = 0.002
+    ):
+        """
+        Crea el bloque de memoria compartida o se adjunta a uno existente.
+        
+        Args:
+            num_slots: Número de chunks que caben en el historial
+            samples_per_chunk: Muestras int16 por chunk (frames * canales)
+            name: Nombre del bloque existente (None = crear uno nuevo)
+            poll_interval: Intervalo de sondeo de los lectores en segundos
+        """
+        self._owner = name is None
+        times_bytes = 2 * num_slots * 8
+        size = self._HEADER_BYTES + times_bytes + num_slots * samples_per_chunk * 2
+        self._block = shared_memory.SharedMemory(name=name, create=self._owner, size=size)
+        self._header = np.ndarray((self._HEADER_FIELDS,), dtype=np.int64, buffer=self._block.buf)
+        times_ns = np.ndarray(
+            (2, num_slots),
+            dtype=np.int64,
+            buffer=self._block.buf,
+            offset=self._HEADER_BYTES
+        )
+        if self._owner:
+            self._header[:] = 0
+            times_ns[:] = 0
+        buffer = np.ndarray(
+            (num_slots, samples_per_chunk),
+            dtype=np.int16,
+            buffer=self._block.buf,
+            offset=self._HEADER_BYTES + times_bytes
+        )
+        super().__init__(num_slots, samples_per_chunk, buffer, times_ns[0], times_ns[1])
+        self._poll_interval = poll_interval
+    
+    @property
+    def name(self) -> str:
+        """Nombre del bloque de memoria compartida (para adjuntarse desde otro proceso)."""
+        return self._block.name
+    
+    @property
+    def write_seq(self) -> int:
+        """Número total de chunks escritos desde el inicio (por cualquier proceso)."""
+        return int(self._header[self._SEQ])
+    
+    def write(self, audio_data: AudioBuffer, onset_ns: int = 0) -> int:
+        """
+        Copia un chunk en el siguiente slot y lo publica en la cabecera.
+        
+        Args:
+            audio_data: Chunk int16 (bytes del stream o array)
+            onset_ns: Instante de la primera muestra en ``time.monotonic_ns()``
+                según el reloj ADC del stream (0 = desconocido)
+            
+        Returns:
+            Número de secuencia asignado al chunk
+        """
+        samples = np.frombuffer(audio_data, dtype=np.int16)
+        seq = int(self._header[self._SEQ])
+        slot = self._buffer[seq % self._num_slots]
+        
+        count = min(samples.size, slot.size)
+        slot[:count] = samples[:count]
+        if count < slot.size:
+            slot[count:] = 0
+        self._publish_ns[seq % self._num_slots] = time.monotonic_ns()
+        self._onset_ns[seq % self._num_slots] = onset_ns
+        
+        # Publicar después de copiar: los lectores nunca leen más allá de _SEQ
+        self._header[self._SEQ] = seq + 1
+        return seq
+    
+    def _wait_published(self, seq: int, timeout: float) -> int:
+        """
+        Sondea la cabecera hasta que se publique el chunk ``seq``.
+        
+        Args:
+            seq: Secuencia del chunk deseado
+            timeout: Tiempo máximo de espera en segundos
+            
+        Returns:
+            Secuencia del próximo chunk a escribir al terminar la espera
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            write_seq = self.write_seq
+            remaining = deadline - time.monotonic()
+            if write_seq > seq or remaining <= 0:
+                return write_seq
+            time.sleep(min(self._poll_interval, remaining))
+    
+    @property
+    def stop_requested(self) -> bool:
+        """True si el dueño del bloque pidió detener al proceso de captura."""
+        return bool(self._header[self._STOP])
+    
+    def request_stop(self, stop: bool = True) -> None:
+        """
+        Pide (o cancela el pedido) que el proceso de captura se detenga.
+        
+        Args:
+            stop: Estado de la orden
+        """
+        self._header[self._STOP] = int(stop)
+    
+    @property
+    def gap_cause(self) -> str:
+        """Causa del último corte informado por el proceso de captura."""
+        return CAPTURE_GAP_CAUSES[int(self._header[self._GAP_CAUSE])]
+    
+    @gap_cause.setter
+    def gap_cause(self, cause: str) -> None:
+        self._header[self._GAP_CAUSE] = CAPTURE_GAP_CAUSES.index(cause)
+    
+    @property
+    def heartbeat(self) -> float:
+        """Último latido del proceso de captura (reloj monótono, 0 = ninguno)."""
+        return self._header[self._HEARTBEAT_NS] / 1e9
+    
+    def publish_stats(self, stats: CaptureStats) -> None:
+        """
+        Publica los contadores de la captura y un latido en la cabecera.
+        
+        Args:
+            stats: Contadores del proceso de captura
+        """
+        for index, field_name in enumerate(self._STATS_FIELDS, start=3):
+            self._header[index] = getattr(stats, field_name)
+        self._header[self._HEARTBEAT_NS] = time.monotonic_ns()
+    
+    def read_stats(self) -> CaptureStats:
+        """
+        Lee los contadores publicados por el proceso de captura.
+        
+        Returns:
+            CaptureStats del proceso de captura actual
+        """
+        values = self._header[3:3 + len(self._STATS_FIELDS)].tolist()
+        return CaptureStats(**dict(zip(self._STATS_FIELDS, values)))
+    
+    def reset_stats(self) -> None:
+        """Pone en cero contadores y latido antes de lanzar un proceso de captura."""
+        self._header[self._HEARTBEAT_NS:] = 0
+    
+    def close(self) -> None:
+        """
+        Se separa del bloque compartido (y lo elimina si es el dueño).
+        
+        Cabecera e historial quedan como copia local, de modo que las
+        lecturas posteriores (estadísticas finales, último clip) siguen
+        siendo válidas.
+        """
+        if self._block is None:
+            return
+        self._header = self._header.copy()
+        self._publish_ns = self._publish_ns.copy()
+        self._onset_ns = self._onset_ns.copy()
+        self._buffer = self._buffer.copy()
+        try:
+            self._block.close()
+        except BufferError:
+            # Quedan vistas vivas en algún lector; el mapeo se libera con ellas
+            pass
+        if self._owner:
+            self._block.unlink()
+        self._block = None
+
+
+@dataclass
+class ClockStats:
+    """Estado del reloj de muestras de la captura."""
+    anchored: bool = False
+    samples_counted: int = 0  # Posición del contador de muestras (último chunk observado)
+    drift_ppm: float = 0.0  # Deriva del reloj del ADC respecto de time.monotonic()
+    phase_error_ms: float = 0.0  # Último error de fase corregido por el lazo
+    resyncs: int = 0  # Reanclajes por audio perdido o reinicios del dispositivo
+    adc_chunks: int = 0  # Chunks fechados con el reloj ADC del stream
+    arrival_chunks: int = 0  # Chunks fechados por su llegada (sin reloj ADC)
+
+
+class SampleClock:
+    """
+    Reloj de muestras: fecha cada chunk por su posición en el stream.
+    
+    El instante de un chunk se calcula contando muestras desde un ancla y no
+    leyendo el reloj del sistema cuando alguien lo procesa, así que no
+    depende de la cola de análisis, de la grabación ni de la subida. Las
+    observaciones de la captura (reloj ADC del stream o, si falta, la llegada
+    del chunk) solo corrigen el ancla: un lazo de fase y frecuencia sigue la
+    deriva del cristal del ADC sin saltos, y un desfase sostenido (audio
+    perdido, reinicio del dispositivo) reancla el contador.
+    
+    Los instantes están en ``time.monotonic()``; ``to_datetime`` los pasa a
+    UTC con el desfase monótono → pared vigente, de modo que un ajuste
+    de NTP afecta por igual a todos los eventos del dispositivo.
+    """
+    
+    def __init__(
+        self,
+        sample_rate: int,
+        frames_per_chunk: int,
+        window_seconds: float = 10.0,
+        resync_seconds: float = 0.5,
+        max_drift_ppm: float = 1000.0,
+        max_segments: int = 64
+    ):
+        """
+        Inicializa el reloj (se ancla con la primera observación).
+        
+        Args:
+            sample_rate: Frecuencia de muestreo nominal en Hz
+            frames_per_chunk: Frames por chunk
+            window_seconds: Ventana de cada corrección del lazo
+            resync_seconds: Duración de un desfase sostenido que fuerza un reanclaje
+                (con reloj ADC bastan dos chunks)
+            max_drift_ppm: Deriva máxima aceptada para el cristal del ADC
+            max_segments: Tramos lineales conservados para fechar chunks pasados
+        """
+        self.frames_per_chunk = frames_per_chunk
+        self.nominal_period = frames_per_chunk / sample_rate
+        self._period = self.nominal_period  # Estimación del período real de un chunk
+        self._max_drift = max_drift_ppm / 1e6
+        self._window_chunks = max(1, int(round(window_seconds / self.nominal_period)))
+        self._resync_chunks = max(2, int(np.ceil(resync_seconds / self.nominal_period)))
+        self._resync_threshold = max(self.nominal_period, 0.005)
+        self._max_segments = max_segments
+        
+        # Tramos (seq inicial, instante de ese chunk, período) ordenados por secuencia
+        self._segment_seqs: List[int] = []
+        self._segments: List[Tuple[int, float, float]] = []
+        
+        self._last_seq: int = -1
+        self._window_start: int = 0
+        self._window_error: float = float("inf")  # Mínimo del error en la ventana
+        self._run_start: Optional[int] = None  # Racha de chunks fuera de umbral
+        self._run_error: float = 0.0
+        self._stats = ClockStats()
+    
+    @property
+    def anchored(self) -> bool:
+        """True una vez recibida la primera observación."""
+        return bool(self._segments)
+    
+    def onset(self, seq: int) -> float:
+        """
+        Instante de la primera muestra de un chunk según el contador de muestras.
+        
+        Args:
+            seq: Secuencia del chunk (también fuera del historial)
+            
+        Returns:
+            Segundos de ``time.monotonic()``
+            
+        Raises:
+            RuntimeError: Si el reloj todavía no está anclado
+        """
+        if not self._segments:
+            raise RuntimeError("El reloj de muestras no está anclado")
+        index = max(bisect.bisect_right(self._segment_seqs, seq) - 1, 0)
+        start_seq, start_time, period = self._segments[index]
+        return start_time + (seq - start_seq) * period
+    
+    @staticmethod
+    def to_datetime(monotonic_time: float) -> datetime:
+        """
+        Convierte un instante del reloj monótono en fecha y hora UTC.
+        
+        Args:
+            monotonic_time: Segundos de ``time.monotonic()``
+            
+        Returns:
+            Fecha y hora UTC con zona horaria (con microsegundos)
+        """
+        return datetime.fromtimestamp(monotonic_time + time.time() - time.monotonic(), tz=timezone.utc)
+    
+    def observe(self, seq: int, onset: float, from_adc: bool) -> Optional[Tuple[int, float]]:
+        """
+        Incorpora el instante observado de un chunk.
+        
+        Args:
+            seq: Secuencia del chunk (creciente; las repetidas se ignoran)
+            onset: Instante observado de su primera muestra (``time.monotonic()``)
+            from_adc: True si viene del reloj ADC del stream; False si se
+                estimó por la llegada del chunk (solo puede llegar tarde)
+                
+        Returns:
+            Tuple (primer chunk del tramo nuevo, salto en segundos) si el
+            contador se reancló; positivo = audio perdido antes de ese chunk
+        """
+        if seq <= self._last_seq:
+            return None
+        self._last_seq = seq
+        self._stats.samples_counted = (seq + 1) * self.frames_per_chunk
+        if from_adc:
+            self._stats.adc_chunks += 1
+        else:
+            self._stats.arrival_chunks += 1
+        
+        if not self._segments:
+            self._add_segment(seq, onset, self._period)
+            self._window_start = seq
+            return None
+        
+        error = onset - self.onset(seq)
+        if abs(error) > self._resync_threshold:
+            return self._track_offset(seq, error, 2 if from_adc else self._resync_chunks)
+        self._run_start = None
+        
+        # La llegada solo suma retrasos: el mínimo de la ventana es el error de fase
+        self._window_error = min(self._window_error, error)
+        if seq - self._window_start + 1 >= self._window_chunks:
+            self._correct(seq)
+        return None
+    
+    def _track_offset(self, seq: int, error: float, needed: int) -> Optional[Tuple[int, float]]:
+        """
+        Sigue una racha de chunks fuera de umbral y reancla si se sostiene.
+        
+        Un callback demorado se recupera en la ráfaga siguiente; un salto del
+        contador (frames perdidos) deja el mismo desfase en todos los chunks.
+        
+        Args:
+            seq: Secuencia del chunk observado
+            error: Observado menos predicho, en segundos
+            needed: Chunks consecutivos que confirman el salto
+            
+        Returns:
+            Tuple (primer chunk del tramo nuevo, salto en segundos) o None
+            si la racha todavía no se confirmó
+        """
+        if self._run_start is None or (error > 0) != (self._run_error > 0):
+            self._run_start, self._run_error = seq, error
+        elif error > 0:
+            self._run_error = min(self._run_error, error)
+        else:
+            self._run_error = max(self._run_error, error)
+        
+        if seq - self._run_start + 1 < needed:
+            return None
+        start, jump = self._run_start, self._run_error
+        self._add_segment(start, self.onset(start) + jump, self._period)
+        self._stats.resyncs += 1
+        self._run_start = None
+        self._window_start, self._window_error = seq + 1, float("inf")
+        return start, jump
+    
+    def _correct(self, seq: int) -> None:
+        """
+        Cierra una ventana: ajusta la frecuencia y reparte el error de fase en la siguiente.
+        
+        El tramo nuevo arranca donde termina el anterior (sin saltos) con un
+        período que absorbe el error de fase a lo largo de la ventana.
+        
+        Args:
+            seq: Último chunk de la ventana
+        """
+        chunks = seq - self._window_start + 1
+        error = self._window_error
+        nominal = self.nominal_period
+        self._period = float(np.clip(
+            self._period + 0.5 * error / chunks,
+            nominal * (1 - self._max_drift),
+            nominal * (1 + self._max_drift)
+        ))
+        self._add_segment(seq + 1, self.onset(seq + 1), self._period + error / self._window_chunks)
+        self._stats.phase_error_ms = error * 1000
+        self._stats.drift_ppm = (self._period / nominal - 1) * 1e6
+        self._window_start, self._window_error = seq + 1, float("inf")
+    
+    def _add_segment(self, seq: int, onset: float, period: float) -> None:
+        """
+        Agrega un tramo lineal del contador a partir de ``seq``.
+        
+        Args:
+            seq: Primer chunk del tramo
+            onset: Instante de ese chunk
+            period: Duración de cada chunk en el tramo
+        """
+        index = bisect.bisect_left(self._segment_seqs, seq)
+        del self._segment_seqs[index:], self._segments[index:]
+        self._segment_seqs.append(seq)
+        self._segments.append((seq, onset, period))
+        if len(self._segments) > self._max_segments:
+            del self._segment_seqs[0], self._segments[0]
+        self._stats.anchored = True
+    
+    def get_stats(self) -> ClockStats:
+        """
+        Obtiene una copia del estado del reloj.
+        
+        Returns:
+            Snapshot de ClockStats
+        """
+        return replace(self._stats)
+
+
+class AudioSource(ABC):
+    """
+    Fuente de audio del monitor: publica chunks int16 en un AudioRingBuffer.
+    
+    Las subclases deciden de dónde sale el audio (micrófono en vivo,
+    grabaciones en disco); la lectura del historial por número de secuencia
+    es común, de modo que análisis, alertas y clips funcionan igual con
+    cualquier fuente.
+    """
+    
+    def __init__(self, config: AudioConfig, ring: Optional[AudioRingBuffer] = None):
+        """
+        Inicializa la fuente.
+        
+        Args:
+            config: Configuración de audio (formato de los chunks publicados)
+            ring: Ring buffer donde publicar el audio (None = uno propio en memoria local)
+        """
+        self.config = config
+        
+        # Ring buffer preasignado con el historial reciente de audio
+        if ring is None:
+            ring = AudioRingBuffer(ring_buffer_slots(config), config.chunk_size * config.channels)
+        self._ring = ring
+        
+        # Contadores de salud
+        self._stats = CaptureStats()
+        
+        # Reloj de muestras (solo fuentes en vivo); se alimenta al leer el historial
+        self._clock: Optional[SampleClock] = None
+        self._clock_synced_seq: int = 0
+        self._clock_lock = threading.Lock()
+        
+        # Huecos de captura detectados por el reloj (protegidos por _clock_lock)
+        self._gaps: deque = deque(maxlen=256)
+        self._gap_totals: Dict[str, Tuple[int, float]] = {}
+    
+    @abstractmethod
+    def start(self) -> None:
+        """Empieza a publicar audio en el ring buffer."""
+        pass
+    
+    @abstractmethod
+    def stop(self) -> None:
+        """Deja de publicar audio y libera recursos."""
+        pass
+    
+    @property
+    def is_exhausted(self) -> bool:
+        """True si la fuente ya publicó todo su audio (nunca en una fuente en vivo)."""
+        return False
+    
+    def hold(self, key: object, seq: int) -> None:
+        """
+        Pide conservar en el historial los chunks desde ``seq``.
+        
+        Una fuente en vivo no puede esperar al lector y lo ignora; una fuente
+        que reproduce archivos no sobrescribe esos chunks hasta que se liberen.
+        
+        Args:
+            key: Identificador del lector (análisis, clip abierto, ...)
+            seq: Primer chunk que el lector todavía necesita
+        """
+        pass
+    
+    def release(self, key: object) -> None:
+        """
+        Libera lo pedido con ``hold``.
+        
+        Args:
+            key: Identificador del lector
+        """
+        pass
+    
+    def chunk_time(self, seq: int) -> datetime:
+        """
+        Instante (UTC) en que se capturó un chunk.
+        
+        Args:
+            seq: Secuencia del chunk
+            
+        Returns:
+            Fecha y hora de la primera muestra del chunk (por el reloj de
+            muestras; sin él, estimada desde el último capturado)
+        """
+        if self._clock is not None:
+            onset = self.chunk_onset(seq)
+            if onset is not None:
+                return SampleClock.to_datetime(onset)
+        chunks_ago = self._ring.write_seq - seq
+        return datetime.now(timezone.utc) - timedelta(seconds=chunks_ago * self.config.chunk_size / self.config.sample_rate)
+    
+    def publish_time(self, seq: int) -> Optional[float]:
+        """
+        Instante en que el chunk quedó disponible para el análisis.
+        
+        Args:
+            seq: Secuencia del chunk
+            
+        Returns:
+            Segundos de ``time.monotonic()`` o None si el chunk ya no está en el historial
+        """
+        return self._ring.publish_time(seq)
+    
+    def chunk_onset(self, seq: int) -> Optional[float]:
+        """
+        Instante de la primera muestra de un chunk (reloj monótono).
+        
+        Con reloj de muestras sale del contador de muestras, también para
+        chunks fuera del historial. Sin él se estima como su publicación menos
+        la duración del chunk: el audio llega completo al final del período.
+        
+        Args:
+            seq: Secuencia del chunk
+            
+        Returns:
+            Segundos de ``time.monotonic()`` o None si no se puede fechar
+        """
+        if self._clock is not None:
+            with self._clock_lock:
+                self._sync_clock()
+                if self._clock.anchored:
+                    return self._clock.onset(seq)
+        return self._observed_onset(seq)
+    
+    def _observed_onset(self, seq: int) -> Optional[float]:
+        """
+        Instante de captura de un chunk según la fuente, sin suavizar.
+        
+        Args:
+            seq: Secuencia del chunk
+            
+        Returns:
+            Tiempo ADC informado por la captura o, si falta, publicación menos
+            la duración del chunk; None si el chunk ya no está en el historial
+        """
+        onset = self._ring.onset_time(seq)
+        if onset is not None:
+            return onset
+        published = self.publish_time(seq)
+        if published is None:
+            return None
+        return published - self.config.chunk_size / self.config.sample_rate
+    
+    def _sync_clock(self) -> None:
+        """Alimenta el reloj de muestras con los chunks publicados desde la última vez."""
+        write_seq = self._ring.write_seq
+        for seq in range(max(self._clock_synced_seq, write_seq - self._ring.capacity), write_seq):
+            adc_onset = self._ring.onset_time(seq)
+            onset = adc_onset if adc_onset is not None else self._observed_onset(seq)
+            if onset is None:
+                continue
+            jump = self._clock.observe(seq, onset, adc_onset is not None)
+            if jump is not None and jump[1] > 0:
+                self._record_gap(*jump)
+        self._clock_synced_seq = write_seq
+    
+    def _record_gap(self, seq: int, seconds: float) -> None:
+        """
+        Registra un hueco de audio con la causa informada por la captura.
+        
+        Args:
+            seq: Primer chunk después del hueco
+            seconds: Duración del hueco
+        """
+        cause = self._ring.gap_cause
+        self._ring.gap_cause = CAPTURE_GAP_CAUSES[0]
+        started_at = SampleClock.to_datetime(self._clock.onset(seq) - seconds)
+        self._gaps.append(CaptureGap(seq, started_at, seconds, cause))
+        count, total = self._gap_totals.get(cause, (0, 0.0))
+        self._gap_totals[cause] = (count + 1, total + seconds)
+        logger.warning(f"⚠ Hueco de {seconds:.3f}s en la captura ({cause}) desde {started_at:%H:%M:%S}")
+    
+    def get_capture_gaps(self, start_seq: int = 0, end_seq: Optional[int] = None) -> List[CaptureGap]:
+        """
+        Obtiene los huecos recientes entre chunks de un rango.
+        
+        Args:
+            start_seq: Primer chunk del rango
+            end_seq: Fin del rango, exclusive (None = hasta el último capturado)
+            
+        Returns:
+            Huecos con ``start_seq < gap.seq < end_seq`` (los más recientes conservados)
+        """
+        if self._clock is None:
+            return []
+        with self._clock_lock:
+            self._sync_clock()
+            return [
+                gap for gap in self._gaps
+                if start_seq < gap.seq and (end_seq is None or gap.seq < end_seq)
+            ]
+    
+    def get_gap_totals(self) -> Dict[str, Tuple[int, float]]:
+        """
+        Obtiene los huecos acumulados por causa desde el inicio.
+        
+        Returns:
+            Diccionario causa → (número de huecos, segundos perdidos)
+        """
+        if self._clock is None:
+            return {}
+        with self._clock_lock:
+            self._sync_clock()
+            return dict(self._gap_totals)
+    
+    def get_clock_stats(self) -> Optional[ClockStats]:
+        """
+        Obtiene el estado del reloj de muestras.
+        
+        Returns:
+            Snapshot de ClockStats o None si la fuente no fecha por muestras
+        """
+        if self._clock is None:
+            return None
+        with self._clock_lock:
+            self._sync_clock()
+            return self._clock.get_stats()
+    
+    def get_latest_audio_chunk(self) -> Optional[npt.NDArray[np.int16]]:
+        """
+        Obtiene el último chunk de audio capturado.
+        
+        Returns:
+            Vista sin copia del chunk en el ring buffer o None si no hay disponibles
+        """
+        latest = self._ring.latest()
+        return latest[1] if latest else None
+    
+    def get_latest_chunk(self) -> Optional[Tuple[int, npt.NDArray[np.int16]]]:
+        """
+        Obtiene el último chunk capturado junto con su secuencia.
+        
+        Returns:
+            Tuple (secuencia, vista sin copia) o None si no hay disponibles
+        """
+        return self._ring.latest()
+    
+    def get_write_sequence(self) -> int:
+        """
+        Obtiene la secuencia del próximo chunk que se capturará.
+        
+        Returns:
+            Número total de chunks capturados hasta ahora
+        """
+        return self._ring.write_seq
+    
+    def wait_for_chunk(
+        self,
+        seq: int,
+        timeout: float = 0.5
+    ) -> Optional[Tuple[int, npt.NDArray[np.int16]]]:
+        """
+        Bloquea hasta que el chunk ``seq`` esté capturado.
+        
+        Args:
+            seq: Secuencia del chunk deseado
+            timeout: Tiempo máximo de espera en segundos
+            
+        Returns:
+            Tuple (secuencia, vista sin copia) o None si venció el timeout.
+            La secuencia puede ser mayor que ``seq`` si el lector se quedó atrás.
+        """
+        result = self.wait_for_chunks(seq, 1, timeout)
+        return (result[0], result[1][0]) if result else None
+    
+    def wait_for_chunks(
+        self,
+        seq: int,
+        max_chunks: int,
+        timeout: float = 0.5
+    ) -> Optional[Tuple[int, npt.NDArray[np.int16]]]:
+        """
+        Como ``wait_for_chunk``, pero retorna además los chunks siguientes ya
+        capturados, como una única vista 2-D (chunks × muestras) sin copia.
+        
+        Args:
+            seq: Secuencia del primer chunk deseado
+            max_chunks: Máximo de chunks a retornar
+            timeout: Tiempo máximo de espera en segundos
+            
+        Returns:
+            Tuple (secuencia del primero, vista 2-D) o None si venció el timeout
+        """
+        result = self._ring.wait_for(seq, timeout, max_chunks)
+        if result is not None and self._clock is not None:
+            # El lector mantiene el reloj al día: el lazo ve todos los chunks
+            with self._clock_lock:
+                self._sync_clock()
+        return result
+    
+    def get_capture_stats(self) -> CaptureStats:
+        """
+        Obtiene una copia de los contadores de salud de la captura.
+        
+        Returns:
+            Snapshot de CaptureStats
+        """
+        return replace(self._stats)
+    
+    def seconds_to_chunks(self, seconds: float) -> int:
+        """
+        Convierte una duración en número de chunks (redondeando hacia arriba).
+        
+        Args:
+            seconds: Duración en segundos
+            
+        Returns:
+            Número de chunks que cubren la duración
+        """
+        return int(np.ceil(seconds * self.config.sample_rate / self.config.chunk_size))
+    
+    def extract_clip(self, start_seq: int, end_seq: int) -> npt.NDArray[np.int16]:
+        """
+        Extrae del historial el audio de los chunks [start_seq, end_seq).
+        
+        Args:
+            start_seq: Primer chunk del clip (inclusive)
+            end_seq: Último chunk del clip (exclusive)
+            
+        Returns:
+            Muestras int16 intercaladas del clip
+        """
+        if start_seq < self._ring.write_seq - self._ring.capacity:
+            logger.warning("⚠ El clip excede el historial del ring buffer; se recorta el inicio")
+        return self._ring.copy_range(start_seq, end_seq)
+    
+    def iter_chunks(
+        self,
+        start_seq: int,
+        end_seq: int
+    ) -> Iterator[Tuple[int, npt.NDArray[np.int16]]]:
+        """
+        Recorre sin copia los chunks [start_seq, end_seq) ya capturados.
+        
+        Si parte del rango ya fue sobrescrito, empieza por el chunk más
+        antiguo disponible; el llamador detecta el salto por la secuencia.
+        
+        Args:
+            start_seq: Primer chunk (inclusive)
+            end_seq: Último chunk (exclusive)
+            
+        Yields:
+            Tuple (secuencia del primero, vista 2-D chunks × muestras)
+        """
+        seq = max(start_seq, 0)
+        while seq < end_seq:
+            result = self._ring.wait_for(seq, timeout=0.0, max_chunks=end_seq - seq)
+            if result is None:
+                return
+            first_seq, frames = result
+            yield first_seq, frames
+            seq = first_seq + len(frames)
+
+
+class MicrophoneCapture(AudioSource):
+    """
+    Gestiona la captura de audio desde el micrófono.
+    
+    Un thread supervisor detecta en menos de un segundo que el stream dejó de
+    entregar audio y lo reabre con backoff exponencial, sin límite de
+    intentos. En cada intento reinicia PortAudio y busca el dispositivo por
+    nombre, porque tras desconectar y reconectar un micrófono USB su índice
+    puede cambiar. El audio perdido queda registrado como hueco de captura.
+    
+    En modo bloqueante el supervisor también vigila al thread lector: si un
+    ``stream.read`` se cuelga, cierra el stream, lo reabre y arranca un
+    lector nuevo; el colgado queda descartado aunque algún día retorne.
+    """
+    
+    def __init__(self, config: AudioConfig, ring: Optional[AudioRingBuffer] = None):
+        """
+        Inicializa el sistema de captura de audio.
+        
+        Args:
+            config: Configuración de audio
+            ring: Ring buffer donde publicar el audio (None = uno propio en memoria local)
+        """
+        super().__init__(config, ring)
+        self._clock = SampleClock(config.sample_rate, config.chunk_size)
+        self._audio_interface: Optional[pyaudio.PyAudio] = None
+        self._stream: Optional[pyaudio.Stream] = None
+        self._is_capturing: bool = False
+        self._capture_thread: Optional[threading.Thread] = None  # Lector (modo bloqueante)
+        self._watchdog_thread: Optional[threading.Thread] = None
+        
+        # Modo bloqueante: solo el lector de la generación vigente publica chunks
+        self._reader_generation: int = 0
+        self._reader_lock = threading.Lock()
+        self._reconnecting: bool = False  # El lector está reabriendo el stream
+        
+        # Device index resuelto (puede ser diferente al config si se auto-detecta)
+        self._resolved_device_index: Optional[int] = config.device_index
+        self._device_name: Optional[str] = None  # Para volver a encontrarlo tras un hotplug
+        
+        # Grabación manual: secuencia del primer chunk grabado
+        self._recording_start_seq: int = 0
+        self._is_recording: bool = False
+        
+        # Lock para thread-safety
+        self._lock = threading.Lock()
+        
+        # Estado del callback (o de la última lectura, en modo bloqueante)
+        self._last_callback_time: float = 0.0
+        self._last_adc_time: float = 0.0
+        
+        # Despierta al supervisor durante un backoff cuando se detiene la captura
+        self._wake = threading.Event()
+    
+    def _find_device_by_name(self, search_terms: List[str]) -> Optional[int]:
+        """
+        Busca un dispositivo de audio por términos de búsqueda en el nombre.
+        
+        Args:
+            search_terms: Lista de términos a buscar (ej: ["iPhone", "iPad"])
+            
+        Returns:
+            Índice del dispositivo encontrado o None
+        """
+        if not self._audio_interface:
+            self._audio_interface = pyaudio.PyAudio()
+        
+        try:
+            host_api_info = self._audio_interface.get_host_api_info_by_index(0)
+            num_devices = host_api_info.get('deviceCount', 0)
+            
+            for i in range(num_devices):
+                device_info = self._audio_interface.get_device_info_by_host_api_device_index(0, i)
+                if device_info.get('maxInputChannels', 0) >= self.config.channels:
+                    device_name = device_info.get('name', '').lower()
+                    for term in search_terms:
+                        if term.lower() in device_name:
                             logger.info(f"✓ Dispositivo encontrado: '{device_info.get('name')}' (ID: {i})")
                             return i
         except Exception as e:
-            logger.error(f"Error buscando dispositivo: {e}")
+            logger.error(f"Error buscando dispositivo: {e}")
+        
+        return None
+    
+    def list_available_devices(self) -> None:
+        """Lista todos los dispositivos de entrada de audio disponibles."""
+        logger.info("=== DISPOSITIVOS DE AUDIO DISPONIBLES ===")
+        
+        if not self._audio_interface:
+            self._audio_interface = pyaudio.PyAudio()
+        
+        try:
+            host_api_info = self._audio_interface.get_host_api_info_by_index(0)
+            num_devices = host_api_info.get('deviceCount', 0)
+            
+            for i in range(num_devices):
+                device_info = self._audio_interface.get_device_info_by_host_api_device_index(0, i)
+                if device_info.get('maxInputChannels', 0) > 0:
+                    device_name = device_info.get('name')
+                    # Marcar el dispositivo seleccionado
+                    marker = " [SELECCIONADO]" if i == self._resolved_device_index else ""
+                    logger.info(f"  ID {i}: {device_name}{marker}")
+        except Exception as e:
+            logger.error(f"Error listando dispositivos: {e}")
+        
+        logger.info("=========================================")
+    
+    def start(self) -> None:
+        """
+        Inicia la captura de audio y el thread supervisor.
+        Auto-detecta el micrófono del iPhone si está disponible.
+        
+        Si el micrófono no se puede abrir (ej. USB todavía sin enumerar), el
+        supervisor lo sigue intentando en segundo plano en lugar de abortar.
+        """
+        # Auto-detectar dispositivo si no está especificado
+        if self._resolved_device_index is None:
+            logger.info("Auto-detectando dispositivo de audio...")
+            
+            # Si prefiere iPhone, buscarlo primero
+            if self.config.prefer_iphone:
+                device_id = self._find_device_by_name(["iPhone", "iPad"])
+                if device_id is not None:
+                    self._resolved_device_index = device_id
+                    logger.info(f"→ Usando micrófono del iPhone/iPad (ID: {device_id})")
+                else:
+                    logger.warning("⚠ iPhone/iPad no encontrado, usando micrófono por defecto del Mac")
+                    # device_index = None usará el default
+            else:
+                logger.info("→ Usando micrófono por defecto del sistema")
+        
+        self._is_capturing = True
+        self._wake.clear()
+        try:
+            self._initialize_audio_stream()
+            logger.info("✓ Captura de audio iniciada correctamente")
+        except Exception as e:
+            self._stream = None
+            logger.error(f"✗ No se pudo abrir el micrófono ({e}); se reintentará en segundo plano")
+        
+        # En modo callback PortAudio entrega el audio; en modo bloqueante lo lee
+        # un thread propio. El supervisor vigila en ambos
+        if not self.config.use_callback:
+            self._start_reader()
+        self._watchdog_thread = threading.Thread(
+            target=self._watchdog_loop,
+            daemon=True,
+            name="AudioWatchdogThread"
+        )
+        self._watchdog_thread.start()
+    
+    def _start_reader(self) -> None:
+        """Arranca un thread lector nuevo; los anteriores quedan descartados."""
+        with self._reader_lock:
+            self._reader_generation += 1
+            generation = self._reader_generation
+        self._capture_thread = threading.Thread(
+            target=self._capture_loop,
+            args=(generation,),
+            daemon=True,
+            name=f"AudioCaptureThread-{generation}"
+        )
+        self._capture_thread.start()
+    
+    def _initialize_audio_stream(self) -> None:
+        """Inicializa PyAudio y abre el stream de audio."""
+        if not self._audio_interface:
+            self._audio_interface = pyaudio.PyAudio()
+        
+        self._last_callback_time = time.monotonic()
+        self._last_adc_time = 0.0
+        
+        self._stream = self._audio_interface.open(
+            format=self.config.format,
+            channels=self.config.channels,
+            rate=self.config.sample_rate,
+            input=True,
+            input_device_index=self._resolved_device_index,
+            frames_per_buffer=self.config.chunk_size,
+            stream_callback=self._stream_callback if self.config.use_callback else None
+        )
+        
+        # Recordar el nombre del dispositivo abierto para reencontrarlo tras un hotplug
+        if self._device_name is None and self._resolved_device_index is not None:
+            try:
+                info = self._audio_interface.get_device_info_by_index(self._resolved_device_index)
+                self._device_name = info.get('name') or None
+            except Exception as e:
+                logger.warning(f"No se pudo leer el nombre del dispositivo: {e}")
+    
+    def _stream_callback(
+        self,
+        in_data: Optional[bytes],
+        frame_count: int,
+        time_info: dict,
+        status_flags: int
+    ) -> Tuple[None, int]:
+        """
+        Callback de PyAudio (ejecutado en el thread de PortAudio).
+        
+        Copia el chunk directamente al ring buffer sin crear objetos intermedios
+        y actualiza los contadores de overflow y frames perdidos. El instante
+        ADC del chunk se traduce al reloj monótono con el tiempo actual del
+        stream, para que el reloj de muestras no dependa de la latencia del
+        callback.
+        """
+        if not self._is_capturing:
+            return None, pyaudio.paComplete
+        
+        self._last_callback_time = time.monotonic()
+        
+        if status_flags & pyaudio.paInputOverflow:
+            self._stats.overflow_count += 1
+        
+        # Estimar frames perdidos por saltos en el reloj ADC del stream
+        adc_time = time_info.get('input_buffer_adc_time', 0.0) if time_info else 0.0
+        if adc_time > 0.0 and self._last_adc_time > 0.0:
+            elapsed_frames = (adc_time - self._last_adc_time) * self.config.sample_rate
+            missing = int(round(elapsed_frames)) - frame_count
+            if missing > frame_count // 2:
+                self._stats.dropped_frames += missing
+        self._last_adc_time = adc_time
+        
+        if frame_count != self.config.chunk_size:
+            self._stats.dropped_frames += abs(self.config.chunk_size - frame_count)
+        
+        if in_data:
+            stream_time = time_info.get('current_time', 0.0) if time_info else 0.0
+            onset_ns = 0
+            if adc_time > 0.0 and stream_time > 0.0:
+                onset_ns = int((adc_time - stream_time + self._last_callback_time) * 1e9)
+            self._store_chunk(in_data, onset_ns)
+        
+        return None, pyaudio.paContinue
+    
+    def _store_chunk(self, audio_data: bytes, onset_ns: int = 0) -> None:
+        """
+        Publica un chunk capturado en el ring buffer.
+        
+        Args:
+            audio_data: Chunk crudo entregado por PyAudio
+            onset_ns: Instante ADC de la primera muestra en ``time.monotonic_ns()``
+                (0 = desconocido, se fecha por su llegada)
+        """
+        self._ring.write(audio_data, onset_ns)
+        self._stats.chunks_captured += 1
+    
+    def _watchdog_loop(self) -> None:
+        """
+        Vigila el stream y reconecta si deja de entregar audio.
+        
+        En modo bloqueante el lector reabre el stream ante errores de lectura;
+        el supervisor solo actúa si el lector deja de entregar audio sin
+        retornar (``stream.read`` colgado).
+        """
+        chunk_seconds = self.config.chunk_size / self.config.sample_rate
+        stall_timeout = max(self.config.stall_timeout_seconds, 4 * chunk_seconds)
+        poll_interval = stall_timeout / 5
+        
+        last_check = time.monotonic()
+        while not self._wake.wait(poll_interval) and self._is_capturing:
+            now = time.monotonic()
+            late, last_check = now - last_check > 2 * poll_interval, now
+            if not self.config.use_callback:
+                # El lector reconecta por su cuenta: mientras tanto no hay audio que vigilar
+                if not self._reconnecting and not late and now - self._last_callback_time > stall_timeout:
+                    self._restart_reader()
+                continue
+            
+            if self._stream is None:
+                self._reconnect("device_unavailable")
+                continue
+            
+            try:
+                inactive = not self._stream.is_active()
+            except Exception:
+                inactive = True
+            if inactive:
+                self._reconnect("stream_closed")
+                continue
+            
+            # Si el propio supervisor despertó tarde (GIL ocupado), el callback también
+            # pudo estar esperando: se decide en la próxima vuelta
+            if not late and now - self._last_callback_time > stall_timeout:
+                self._reconnect("stall")
+    
+    def _restart_reader(self) -> None:
+        """Descarta el lector colgado, reabre el stream y arranca un lector nuevo."""
+        with self._reader_lock:
+            self._reader_generation += 1  # Si el read colgado retorna, su chunk no se publica
+        logger.warning("⚠ La lectura del micrófono no retorna; se reemplaza el thread lector")
+        if self._reconnect("stall"):
+            self._start_reader()
+    
+    def _capture_loop(self, generation: int) -> None:
+        """
+        Loop principal de captura en modo bloqueante (ejecutado en thread separado).
+        
+        Args:
+            generation: Generación del lector; termina cuando el supervisor
+                arranca uno nuevo
+        """
+        consecutive_errors = 0
+        max_consecutive_errors = 3
+        
+        while self._is_capturing and generation == self._reader_generation:
+            stream = self._stream
+            if stream is None:
+                self._reconnect_from_reader("device_unavailable")
+                continue
+            
+            try:
+                # Leer chunk de audio
+                audio_data = stream.read(
+                    self.config.chunk_size,
+                    exception_on_overflow=False
+                )
+                
+                with self._reader_lock:
+                    if generation != self._reader_generation:
+                        return  # Reemplazado mientras el read estaba colgado
+                    self._last_callback_time = time.monotonic()
+                    self._store_chunk(audio_data)
+                
+                # Reset contador de errores
+                consecutive_errors = 0
+                
+            except Exception as e:
+                if generation != self._reader_generation:
+                    return  # El supervisor cerró el stream de este lector
+                consecutive_errors += 1
+                self._stats.read_errors += 1
+                logger.warning(f"Error en captura (#{consecutive_errors}): {e}")
+                
+                if consecutive_errors >= max_consecutive_errors:
+                    self._reconnect_from_reader("read_error")
+                    consecutive_errors = 0
+                else:
+                    self._wake.wait(0.01)  # Evitar busy loop en caso de error
+    
+    def _reconnect_from_reader(self, cause: str) -> None:
+        """
+        Reconecta desde el lector, sin que el supervisor lo tome por colgado.
+        
+        Args:
+            cause: Causa del corte (una de CAPTURE_GAP_CAUSES)
+        """
+        self._reconnecting = True
+        try:
+            self._reconnect(cause)
+        finally:
+            self._reconnecting = False
+    
+    def _reconnect(self, cause: str) -> bool:
+        """
+        Reabre el stream con backoff exponencial hasta lograrlo.
+        
+        Cada intento reinicia PortAudio (solo así ve dispositivos conectados
+        después de iniciar) y vuelve a resolver el dispositivo por nombre.
+        
+        Args:
+            cause: Causa del corte (una de CAPTURE_GAP_CAUSES); viaja con el
+                hueco que mide el reloj de muestras
+            
+        Returns:
+            True si el stream quedó abierto; False si se detuvo la captura antes
+        """
+        self._ring.gap_cause = cause
+        logger.error(f"✗ El micrófono dejó de entregar audio ({cause}). Reconectando...")
+        delay = self.config.reconnect_initial_delay
+        attempt = 0
+        
+        while self._is_capturing:
+            attempt += 1
+            self._close_stream()
+            try:
+                self._reset_audio_interface()
+                self._resolve_device()
+                self._initialize_audio_stream()
+            except Exception as e:
+                logger.warning(f"Reconexión #{attempt} falló: {e}; reintento en {delay:.2f}s")
+                self._wake.wait(delay)
+                delay = min(delay * 2, self.config.reconnect_max_delay)
+                continue
+            
+            self._stats.reconnections += 1
+            logger.info(f"✓ Micrófono reconectado (intento #{attempt})")
+            return True
+        return False
+    
+    def _close_stream(self) -> None:
+        """Cierra el stream actual ignorando errores (el dispositivo puede no existir ya)."""
+        stream, self._stream = self._stream, None
+        if stream is None:
+            return
+        try:
+            stream.stop_stream()
+            stream.close()
+        except Exception as e:
+            logger.debug(f"Error cerrando stream: {e}")
+    
+    def _reset_audio_interface(self) -> None:
+        """Reinicia PortAudio para que vuelva a enumerar los dispositivos."""
+        if self._audio_interface:
+            try:
+                self._audio_interface.terminate()
+            except Exception as e:
+                logger.debug(f"Error terminando PyAudio: {e}")
+        self._audio_interface = pyaudio.PyAudio()
+    
+    def _resolve_device(self) -> None:
+        """
+        Vuelve a buscar por nombre el dispositivo abierto al iniciar.
+        
+        Raises:
+            RuntimeError: Si el dispositivo no está conectado
+        """
+        if self._device_name is None:
+            return  # Dispositivo por defecto del sistema
+        device_index = self._find_device_by_name([self._device_name])
+        if device_index is None:
+            raise RuntimeError(f"dispositivo '{self._device_name}' no conectado")
+        if device_index != self._resolved_device_index:
+            logger.info(f"→ '{self._device_name}' cambió de índice: {self._resolved_device_index} → {device_index}")
+            self._resolved_device_index = device_index
+    
+    def start_recording(self) -> None:
+        """Inicia la grabación de audio."""
+        with self._lock:
+            self._recording_start_seq = self._ring.write_seq
+            self._is_recording = True
+        logger.debug("Grabación iniciada")
+    
+    def stop_recording_and_save(self, filepath: str) -> str:
+        """
+        Detiene la grabación y guarda el archivo WAV.
+        
+        Args:
+            filepath: Ruta donde guardar el archivo
+            
+        Returns:
+            Ruta del archivo guardado
+        """
+        with self._lock:
+            self._is_recording = False
+            start_seq = self._recording_start_seq
+        
+        try:
+            # Escritura incremental desde el ring buffer, sin juntar el clip en memoria
+            with wave.open(filepath, 'wb') as wav_file:
+                wav_file.setnchannels(self.config.channels)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(self.config.sample_rate)
+                for _, frames in self.iter_chunks(start_seq, self._ring.write_seq):
+                    wav_file.writeframes(frames)
+            
+            logger.info(f"Audio guardado: {filepath}")
+            return filepath
+            
+        except Exception as e:
+            logger.error(f"Error guardando audio: {e}")
+            raise
+    
+    def stop(self) -> None:
+        """Detiene la captura de audio y libera recursos."""
+        logger.info("Deteniendo captura de audio...")
+        self._is_capturing = False
+        self._wake.set()
+        
+        for thread in (self._watchdog_thread, self._capture_thread):
+            if thread and thread.is_alive():
+                thread.join(timeout=2.0)
+        
+        if self._stream:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            except Exception as e:
+                logger.warning(f"Error cerrando stream: {e}")
+        
+        if self._audio_interface:
+            try:
+                self._audio_interface.terminate()
+            except Exception as e:
+                logger.warning(f"Error terminando PyAudio: {e}")
+        
+        logger.info("Captura de audio detenida")
+
+
+def _capture_process_main(
+    ring_name: str,
+    num_slots: int,
+    samples_per_chunk: int,
+    config: AudioConfig
+) -> None:
+    """
+    Loop del proceso de captura (ejecutado en un proceso separado).
+    
+    Abre el micrófono y publica cada chunk en el ring buffer compartido; el
+    hilo principal solo publica contadores y latidos hasta que el proceso
+    padre pide detenerse. No analiza ni sube nada: su GIL es solo del
+    callback de PortAudio.
+    """
+    # Ctrl+C llega a todo el grupo de procesos: el apagado lo ordena el padre
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    ring = SharedAudioRingBuffer(num_slots, samples_per_chunk, name=ring_name)
+    microphone = MicrophoneCapture(config, ring=ring)
+    try:
+        microphone.start()
+        while not ring.stop_requested:
+            ring.publish_stats(microphone.get_capture_stats())
+            time.sleep(0.1)
+    finally:
+        microphone.stop()
+        ring.publish_stats(microphone.get_capture_stats())
+        ring.close()
+
+
+class ProcessMicrophoneCapture(MicrophoneCapture):
+    """
+    Captura de audio en un proceso aparte, con el ring buffer en memoria compartida.
+    
+    El proceso de captura tiene su propio intérprete y GIL, por lo que un
+    analizador lento, el render de consola o las subidas no retrasan el
+    callback de PortAudio. Este proceso (el de análisis) lee el historial sin
+    copias a través de la misma interfaz que MicrophoneCapture; otros
+    procesos lectores pueden adjuntarse al bloque con ``ring_name``.
+    
+    Un thread supervisor reinicia el proceso de captura si termina o deja de
+    emitir latidos, con backoff exponencial si el reinicio falla; la
+    secuencia continúa donde quedó y el tiempo sin audio se cuenta como
+    frames perdidos y como hueco de captura. Las reconexiones del micrófono
+    las resuelve el propio proceso de captura.
+    """
+    
+    def __init__(
+        self,
+        config: AudioConfig,
+        target: Optional[Callable[[str, int, int, AudioConfig], None]] = None
+    ):
+        """
+        Inicializa la captura (el proceso arranca con ``start``).
+        
+        Args:
+            config: Configuración de audio
+            target: Función del proceso de captura (None = micrófono real;
+                los benchmarks inyectan una fuente sintética)
+        """
+        ring = SharedAudioRingBuffer(ring_buffer_slots(config), config.chunk_size * config.channels)
+        super().__init__(config, ring=ring)
+        self._target = target or _capture_process_main
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._startup_timeout: float = 30.0  # Spawn + import + apertura del dispositivo
+        self._heartbeat_timeout: float = 5.0
+        self._restart_delay: float = config.reconnect_initial_delay  # Crece si los reinicios fallan
+        
+        # Contadores acumulados de procesos de captura anteriores
+        self._finished_stats = CaptureStats()
+    
+    @property
+    def ring_name(self) -> str:
+        """Nombre del bloque de memoria compartida con el historial de audio."""
+        return self._ring.name
+    
+    def start(self) -> None:
+        """
+        Lanza el proceso de captura y el thread supervisor.
+        
+        Raises:
+            RuntimeError: Si el proceso de captura termina antes de emitir su
+                primer latido (un micrófono ausente no lo impide: se reintenta
+                dentro del proceso)
+        """
+        self._is_capturing = True
+        self._wake.clear()
+        self._spawn_capture_process()
+        if not self._wait_for_heartbeat():
+            exitcode = self._process.exitcode
+            self.stop()
+            raise RuntimeError(f"El proceso de captura no pudo iniciar (código de salida {exitcode})")
+        
+        self._capture_thread = threading.Thread(
+            target=self._supervisor_loop,
+            daemon=True,
+            name="CaptureSupervisorThread"
+        )
+        self._capture_thread.start()
+        logger.info(f"✓ Captura de audio iniciada en proceso aparte (PID {self._process.pid})")
+    
+    def _spawn_capture_process(self) -> None:
+        """Lanza un proceso de captura sobre el ring buffer compartido."""
+        self._ring.request_stop(False)
+        self._ring.reset_stats()
+        
+        # spawn: nunca hacer fork de un proceso con threads activos
+        context = multiprocessing.get_context("spawn")
+        self._process = context.Process(
+            target=self._target,
+            args=(
+                self._ring.name,
+                self._ring.capacity,
+                self.config.chunk_size * self.config.channels,
+                self.config
+            ),
+            daemon=True,
+            name="AudioCaptureProcess"
+        )
+        self._process.start()
+    
+    def _wait_for_heartbeat(self) -> bool:
+        """
+        Espera el primer latido del proceso de captura.
+        
+        Returns:
+            True si el proceso abrió el micrófono; False si terminó o no respondió
+        """
+        deadline = time.monotonic() + self._startup_timeout
+        while self._ring.heartbeat == 0.0:
+            if not self._process.is_alive() or time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+    
+    def _supervisor_loop(self) -> None:
+        """Vigila el proceso de captura y lo reinicia si termina o se cuelga."""
+        while not self._wake.wait(0.5) and self._is_capturing:
+            if not self._process.is_alive():
+                logger.error(
+                    f"✗ El proceso de captura terminó inesperadamente "
+                    f"(código {self._process.exitcode}); reiniciando..."
+                )
+            elif time.monotonic() - self._ring.heartbeat > self._heartbeat_timeout:
+                logger.error("✗ El proceso de captura no responde; reiniciando...")
+            else:
+                continue
+            
+            self._restart_capture_process()
+    
+    def _restart_capture_process(self) -> None:
+        """Reemplaza el proceso de captura conservando secuencia e historial."""
+        last_heartbeat = self._ring.heartbeat
+        self._terminate_capture_process()
+        self._collect_process_stats()
+        self._finished_stats.process_restarts += 1
+        
+        self._wake.wait(self._restart_delay)
+        if not self._is_capturing:
+            return
+        self._spawn_capture_process()
+        self._ring.gap_cause = "capture_process"
+        if not self._wait_for_heartbeat():
+            self._restart_delay = min(self._restart_delay * 2, self.config.reconnect_max_delay)
+            logger.error(
+                f"✗ El nuevo proceso de captura no respondió; "
+                f"se reintentará tras {self._restart_delay:.2f}s"
+            )
+            return
+        self._restart_delay = self.config.reconnect_initial_delay
+        
+        # El audio entre el último latido y el reinicio no se capturó
+        lost_seconds = time.monotonic() - last_heartbeat if last_heartbeat else 0.0
+        self._finished_stats.dropped_frames += int(lost_seconds * self.config.sample_rate)
+        logger.info(f"✓ Proceso de captura reiniciado (PID {self._process.pid})")
+    
+    def _terminate_capture_process(self) -> None:
+        """Pide al proceso de captura que se detenga y lo fuerza si no responde."""
+        if self._process is None:
+            return
+        self._ring.request_stop()
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout=1.0)
+    
+    def _collect_process_stats(self) -> None:
+        """Suma al acumulado los contadores del proceso de captura que terminó."""
+        current = self._ring.read_stats()
+        for field_name in SharedAudioRingBuffer._STATS_FIELDS:
+            total = getattr(self._finished_stats, field_name) + getattr(current, field_name)
+            setattr(self._finished_stats, field_name, total)
+        self._ring.reset_stats()
+    
+    def get_capture_stats(self) -> CaptureStats:
+        """
+        Obtiene los contadores de salud de todos los procesos de captura.
+        
+        Returns:
+            Snapshot de CaptureStats (acumulado + proceso actual)
+        """
+        stats = replace(self._finished_stats)
+        if self._process is not None:
+            current = self._ring.read_stats()
+            for field_name in SharedAudioRingBuffer._STATS_FIELDS:
+                setattr(stats, field_name, getattr(stats, field_name) + getattr(current, field_name))
+        return stats
+    
+    def stop(self) -> None:
+        """Detiene el proceso de captura y libera la memoria compartida."""
+        logger.info("Deteniendo captura de audio...")
+        self._is_capturing = False
+        self._wake.set()
+        
+        if self._capture_thread and self._capture_thread.is_alive():
+            self._capture_thread.join(timeout=5.0)
+        
+        if self._process is not None:
+            self._terminate_capture_process()
+            self._collect_process_stats()
+            self._process = None
+        self._ring.close()
+        
+        if self._audio_interface:
+            try:
+                self._audio_interface.terminate()
+            except Exception as e:
+                logger.warning(f"Error terminando PyAudio: {e}")
+        
+        logger.info("Captura de audio detenida")
+
+
+# ========== FUENTES DE AUDIO: REPRODUCCIÓN DE GRABACIONES ==========
+
+# Extensiones reconocidas al reproducir un directorio
+REPLAY_EXTENSIONS = (".wav", ".flac")
+
+
+class WavReplaySource(AudioSource):
+    """
+    Reproduce grabaciones del granero a través del mismo pipeline que el micrófono.
+    
+    Acepta un archivo o un directorio (archivos ordenados por nombre). En
+    modo rápido publica chunks tan rápido como el análisis los consume: el
+    productor solo espera cuando sobrescribiría chunks que algún lector
+    retiene con ``hold`` (análisis, pre-roll, clips abiertos), así que no se
+    pierde audio. En modo ``realtime`` respeta el ritmo de captura real.
+    
+    El inicio de cada archivo se estima como su fecha de modificación menos
+    su duración, de modo que los eventos quedan fechados en la hora de la
+    grabación y no en la del reprocesamiento.
+    """
+    
+    def __init__(self, config: AudioConfig, path: str, realtime: bool = False):
+        """
+        Inicializa la fuente.
+        
+        Args:
+            config: Configuración de audio (debe coincidir con las grabaciones)
+            path: Archivo de audio o directorio con grabaciones
+            realtime: Publicar al ritmo de captura real (False = lo más rápido posible)
+            
+        Raises:
+            ValueError: Si no hay grabaciones o su formato no coincide con ``config``
+        """
+        super().__init__(config)
+        self.realtime = realtime
+        self.paths = self.list_recordings(path)
+        if not self.paths:
+            raise ValueError(f"No hay grabaciones {REPLAY_EXTENSIONS} en {path}")
+        for filepath in self.paths:
+            sample_rate, channels, _ = self.probe(filepath)
+            if (sample_rate, channels) != (config.sample_rate, config.channels):
+                raise ValueError(
+                    f"{filepath}: {sample_rate} Hz / {channels} canales, se esperaba "
+                    f"{config.sample_rate} Hz / {config.channels} canales"
+                )
+        
+        self._is_running: bool = False
+        self._exhausted: bool = False
+        self._thread: Optional[threading.Thread] = None
+        
+        # Chunks retenidos por los lectores (protegido por _room)
+        self._holds: Dict[object, int] = {}
+        self._room = threading.Condition()
+        
+        # Inicio de cada archivo: primer chunk y fecha y hora de inicio
+        self._file_first_seqs: List[int] = []
+        self._file_start_times: List[datetime] = []
+    
+    @staticmethod
+    def list_recordings(path: str) -> List[str]:
+        """
+        Lista las grabaciones a reproducir.
+        
+        Args:
+            path: Archivo de audio o directorio
+            
+        Returns:
+            Rutas ordenadas por nombre
+        """
+        if os.path.isdir(path):
+            return [
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.lower().endswith(REPLAY_EXTENSIONS)
+            ]
+        return [path] if os.path.isfile(path) else []
+    
+    @staticmethod
+    def probe(filepath: str) -> Tuple[int, int, int]:
+        """
+        Lee el formato de una grabación.
+        
+        Args:
+            filepath: Ruta del archivo
+            
+        Returns:
+            Tuple (frecuencia de muestreo, canales, frames)
+            
+        Raises:
+            ValueError: Si el archivo no es PCM de 16 bits legible
+        """
+        if filepath.lower().endswith(".wav"):
+            with wave.open(filepath, "rb") as wav_file:
+                if wav_file.getsampwidth() != 2:
+                    raise ValueError(f"{filepath}: solo se reproduce PCM de 16 bits")
+                return wav_file.getframerate(), wav_file.getnchannels(), wav_file.getnframes()
+        if soundfile is None:
+            raise ValueError(f"{filepath}: reproducir FLAC requiere soundfile")
+        info = soundfile.info(filepath)
+        return info.samplerate, info.channels, info.frames
+    
+    @classmethod
+    def config_for(cls, path: str, base: AudioConfig) -> AudioConfig:
+        """
+        Adapta una configuración de audio al formato de las grabaciones.
+        
+        Args:
+            path: Archivo de audio o directorio
+            base: Configuración de partida
+            
+        Returns:
+            ``base`` con la frecuencia de muestreo y los canales de la primera grabación
+        """
+        paths = cls.list_recordings(path)
+        if not paths:
+            return base
+        sample_rate, channels, _ = cls.probe(paths[0])
+        if (sample_rate, channels) == (base.sample_rate, base.channels):
+            return base
+        return replace(base, sample_rate=sample_rate, channels=channels, channel_labels=())
+    
+    @property
+    def is_exhausted(self) -> bool:
+        """True cuando ya se publicaron todas las grabaciones."""
+        return self._exhausted
+    
+    def start(self) -> None:
+        """Inicia la reproducción en un thread separado."""
+        self._is_running = True
+        self._thread = threading.Thread(
+            target=self._replay_loop,
+            daemon=True,
+            name="AudioReplayThread"
+        )
+        self._thread.start()
+        mode = "tiempo real" if self.realtime else "máxima velocidad"
+        logger.info(f"✓ Reproduciendo {len(self.paths)} grabaciones a {mode}")
+    
+    def hold(self, key: object, seq: int) -> None:
+        """
+        Retiene en el historial los chunks desde ``seq``.
+        
+        Args:
+            key: Identificador del lector
+            seq: Primer chunk que el lector todavía necesita
+        """
+        with self._room:
+            self._holds[key] = seq
+            self._room.notify_all()
+    
+    def release(self, key: object) -> None:
+        """
+        Libera lo retenido por un lector.
+        
+        Args:
+            key: Identificador del lector
+        """
+        with self._room:
+            self._holds.pop(key, None)
+            self._room.notify_all()
+    
+    def _wait_for_room(self) -> None:
+        """Espera hasta poder escribir sin pisar chunks retenidos."""
+        capacity = self._ring.capacity
+        with self._room:
+            self._room.wait_for(
+                lambda: not self._is_running or not self._holds
+                or self._ring.write_seq < min(self._holds.values()) + capacity
+            )
+    
+    def chunk_time(self, seq: int) -> datetime:
+        """
+        Hora de grabación de un chunk.
+        
+        Args:
+            seq: Secuencia del chunk
+            
+        Returns:
+            Inicio del archivo que contiene el chunk más el desplazamiento del chunk
+        """
+        index = bisect.bisect_right(self._file_first_seqs, seq) - 1
+        if index < 0:
+            return super().chunk_time(seq)
+        offset_chunks = seq - self._file_first_seqs[index]
+        offset = timedelta(seconds=offset_chunks * self.config.chunk_size / self.config.sample_rate)
+        return self._file_start_times[index] + offset
+    
+    def _iter_file_chunks(self, filepath: str) -> Iterator[bytes]:
+        """
+        Lee una grabación de a un chunk.
+        
+        Args:
+            filepath: Ruta del archivo
+            
+        Yields:
+            Bytes int16 intercalados (el último chunk puede ser más corto)
+        """
+        chunk_size = self.config.chunk_size
+        if filepath.lower().endswith(".wav"):
+            with wave.open(filepath, "rb") as wav_file:
+                while True:
+                    data = wav_file.readframes(chunk_size)
+                    if not data:
+                        return
+                    yield data
+        else:
+            for block in soundfile.blocks(filepath, blocksize=chunk_size, dtype="int16"):
+                yield block.tobytes()
+    
+    def _replay_loop(self) -> None:
+        """Publica las grabaciones en el ring buffer (thread separado)."""
+        chunk_seconds = self.config.chunk_size / self.config.sample_rate
+        next_due = time.monotonic()
+        
+        try:
+            for filepath in self.paths:
+                _, _, frames = self.probe(filepath)
+                start_time = datetime.fromtimestamp(
+                    os.path.getmtime(filepath) - frames / self.config.sample_rate, tz=timezone.utc
+                )
+                self._file_start_times.append(start_time)
+                self._file_first_seqs.append(self._ring.write_seq)
+                
+                for data in self._iter_file_chunks(filepath):
+                    self._wait_for_room()
+                    if not self._is_running:
+                        return
+                    if self.realtime:
+                        next_due += chunk_seconds
+                        time.sleep(max(0.0, next_due - time.monotonic()))
+                    self._ring.write(data)
+                    self._stats.chunks_captured += 1
+        except Exception as e:
+            self._stats.read_errors += 1
+            logger.error(f"Error reproduciendo grabaciones: {e}")
+        finally:
+            self._exhausted = True
+    
+    def stop(self) -> None:
+        """Detiene la reproducción."""
+        self._is_running = False
+        with self._room:
+            self._room.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        logger.info(f"Reproducción detenida ({self._stats.chunks_captured} chunks publicados)")
+
+
+# ========== CODIFICACIÓN DE CLIPS: FLAC Y REMUESTREO ==========
+
+# Content-type de Storage según la extensión del clip
+CLIP_CONTENT_TYPES = {
+    ".wav": "audio/wav",
+    ".flac": "audio/flac",
+}
+
+
+@lru_cache(maxsize=8)
+def polyphase_filters(up: int, down: int, taps_per_phase: int) -> npt.NDArray[np.float32]:
+    """
+    Filtro anti-aliasing (sinc con ventana de Kaiser) en forma polifásica.
+    
+    Args:
+        up: Factor de interpolación (reducido)
+        down: Factor de decimación (reducido)
+        taps_per_phase: Coeficientes por fase
+        
+    Returns:
+        Matriz float32 (fases × coeficientes), con los coeficientes en orden
+        temporal para aplicarse sobre ventanas de la entrada (cacheada, solo lectura)
+    """
+    length = up * taps_per_phase
+    cutoff = 0.45 / max(up, down)  # Ciclos por muestra a la tasa interpolada (90% de Nyquist)
+    n = np.arange(length) - (length - 1) / 2.0
+    prototype = 2.0 * cutoff * np.sinc(2.0 * cutoff * n) * np.kaiser(length, 8.6)
+    prototype *= up / prototype.sum()  # Ganancia DC = 1 tras rellenar con ceros
+    
+    # Fase p usa prototype[p + k*up] sobre x[base - k]; se invierte k para operar sobre ventanas
+    filters = prototype.reshape(taps_per_phase, up).T[:, ::-1].astype(np.float32)
+    filters = np.ascontiguousarray(filters)
+    filters.flags.writeable = False
+    return filters
+
+
+class PolyphaseResampler:
+    """
+    Remuestreador racional polifásico en streaming (un canal).
+    
+    Conserva entre llamadas las últimas muestras de entrada y la posición de
+    salida, así que procesar un clip por partes da el mismo resultado (salvo
+    redondeo de ±1 LSB) que de una vez. Introduce un retardo de
+    ~``taps_per_phase / 2`` muestras de entrada.
+    """
+    
+    def __init__(self, input_rate: int, output_rate: int, taps_per_phase: int = 128):
+        """
+        Inicializa el remuestreador.
+        
+        Args:
+            input_rate: Frecuencia de muestreo de entrada
+            output_rate: Frecuencia de muestreo de salida
+            taps_per_phase: Coeficientes por fase (más = transición más angosta, más CPU)
+        """
+        divisor = int(np.gcd(input_rate, output_rate))
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.taps_per_phase = taps_per_phase
+        self._filters = polyphase_filters(self.up, self.down, taps_per_phase)
+        self.reset()
+    
+    def reset(self) -> None:
+        """Descarta el historial (inicio de un clip nuevo)."""
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._samples_in = 0
+        self._samples_out = 0
+    
+    def process(self, samples: npt.NDArray[np.int16]) -> npt.NDArray[np.int16]:
+        """
+        Remuestrea un bloque de muestras.
+        
+        Args:
+            samples: Muestras int16 de un canal
+            
+        Returns:
+            Muestras int16 a ``output_rate`` (su cantidad varía por el resto de fase)
+        """
+        up, down = self.up, self.down
+        buffer = np.concatenate((self._history, samples.astype(np.float32)))
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps_per_phase)
+        
+        # Salidas n con n*down/up dentro de la entrada disponible
+        total_in = self._samples_in + len(samples)
+        end_out = (total_in * up + down - 1) // down
+        count = end_out - self._samples_out
+        output = np.empty(count, dtype=np.float32)
+        
+        # Las salidas n, n+up, n+2·up… comparten fase y avanzan ``down`` ventanas
+        for offset in range(min(up, count)):
+            position = (self._samples_out + offset) * down
+            phase, base = position % up, position // up
+            steps = len(range(offset, count, up))
+            start = base - self._samples_in
+            output[offset::up] = windows[start:start + steps * down:down] @ self._filters[phase]
+        
+        self._history = buffer[len(buffer) - (self.taps_per_phase - 1):]
+        self._samples_in = total_in
+        self._samples_out = end_out
+        
+        np.rint(output, out=output)
+        np.clip(output, -32768, 32767, out=output)
+        return output.astype(np.int16)
+
+
+class ClipEncoder:
+    """
+    Codifica los clips de alerta antes de guardarlos y subirlos.
+    
+    FLAC es sin pérdidas y requiere ``soundfile`` (``pip install soundfile``);
+    sin él se usa WAV. El remuestreo opcional a 16 o 22.05 kHz reduce aún más
+    los bytes enviados por enlaces celulares.
+    """
+    
+    def __init__(self, config: RecordingConfig, sample_rate: int, channels: int):
+        """
+        Inicializa el codificador.
+        
+        Args:
+            config: Configuración de grabación (codec y frecuencia de salida)
+            sample_rate: Frecuencia de muestreo de la captura
+            channels: Canales intercalados de la captura
+        """
+        self.input_rate = sample_rate
+        self.channels = channels
+        self.output_rate = config.target_sample_rate or sample_rate
+        self.codec = config.codec.lower()
+        
+        if self.codec not in ("wav", "flac"):
+            raise ValueError(f"Codec no soportado: {config.codec} (usar 'wav' o 'flac')")
+        if self.codec == "flac" and soundfile is None:
+            logger.warning("⚠ soundfile no instalado: los clips se guardan en WAV (pip install soundfile)")
+            self.codec = "wav"
+    
+    @property
+    def extension(self) -> str:
+        """Extensión del archivo codificado."""
+        return f".{self.codec}"
+    
+    @property
+    def content_type(self) -> str:
+        """Content-type para Storage."""
+        return CLIP_CONTENT_TYPES[self.extension]
+    
+    def save(self, filepath: str, clip: npt.NDArray[np.int16]) -> str:
+        """
+        Remuestrea, codifica y guarda un clip completo (sincronizado a disco).
+        
+        Args:
+            filepath: Ruta destino, con la extensión de ``extension``
+            clip: Muestras int16 intercaladas a la frecuencia de captura
+            
+        Returns:
+            Ruta del archivo guardado
+        """
+        writer = ClipWriter(self, filepath)
+        writer.write(clip)
+        return writer.close()
+
+
+class ClipWriter:
+    """
+    Escribe un clip en disco a medida que llegan los chunks.
+    
+    La memoria usada no depende de la duración del clip: cada bloque se
+    remuestrea (en streaming) y se codifica al vuelo. Se escribe en
+    ``<ruta>.part`` y se renombra al cerrar, así un clip a medio escribir
+    (corte de luz) nunca se toma por uno completo.
+    """
+    
+    def __init__(self, encoder: ClipEncoder, filepath: str):
+        """
+        Abre el archivo del clip.
+        
+        Args:
+            encoder: Codificador (codec, frecuencia de salida y canales)
+            filepath: Ruta destino, con la extensión de ``encoder.extension``
+        """
+        self.encoder = encoder
+        self.filepath = filepath
+        self.frames_written = 0
+        self._partial_path = filepath + ".part"
+        self._resamplers = []
+        if encoder.output_rate != encoder.input_rate:
+            self._resamplers = [
+                PolyphaseResampler(encoder.input_rate, encoder.output_rate)
+                for _ in range(encoder.channels)
+            ]
+        
+        self._raw_file = open(self._partial_path, 'wb')
+        self._sound_file = None
+        self._wav_file = None
+        if encoder.codec == "flac":
+            self._sound_file = soundfile.SoundFile(
+                self._raw_file,
+                mode='w',
+                samplerate=encoder.output_rate,
+                channels=encoder.channels,
+                format="FLAC",
+                subtype="PCM_16"
+            )
+        else:
+            self._wav_file = wave.open(self._raw_file, 'wb')
+            self._wav_file.setnchannels(encoder.channels)
+            self._wav_file.setsampwidth(2)
+            self._wav_file.setframerate(encoder.output_rate)
+    
+    def write(self, samples: npt.NDArray[np.int16]) -> None:
+        """
+        Agrega muestras al clip.
+        
+        Args:
+            samples: Muestras int16 intercaladas a la frecuencia de captura
+                (vista del ring buffer, sin copiar; puede ser la vista
+                estridada de un canal)
+        """
+        channels = self.encoder.channels
+        frames = samples.reshape(-1, channels)
+        if self._resamplers:
+            resampled = [
+                resampler.process(frames[:, channel])
+                for channel, resampler in enumerate(self._resamplers)
+            ]
+            frames = np.stack(resampled, axis=1)
+        
+        if self._sound_file is not None:
+            self._sound_file.write(frames)
+        else:
+            self._wav_file.writeframes(np.ascontiguousarray(frames))
+        self.frames_written += len(frames)
+    
+    def close(self, filepath: Optional[str] = None) -> str:
+        """
+        Cierra el clip, lo sincroniza a disco y lo publica con su nombre final.
+        
+        Args:
+            filepath: Nombre final (None = el indicado al abrir)
+            
+        Returns:
+            Ruta del archivo guardado
+        """
+        filepath = filepath or self.filepath
+        if self._sound_file is not None:
+            self._sound_file.close()
+        else:
+            self._wav_file.close()
+        
+        # En disco antes de que el outbox lo referencie (cortes de luz)
+        self._raw_file.flush()
+        os.fsync(self._raw_file.fileno())
+        self._raw_file.close()
+        os.replace(self._partial_path, filepath)
+        
+        logger.info(f"Audio guardado: {filepath}")
+        return filepath
+    
+    def abort(self) -> None:
+        """Descarta el clip a medio escribir."""
+        try:
+            if self._sound_file is not None:
+                self._sound_file.close()
+            elif self._wav_file is not None:
+                self._wav_file.close()
+        finally:
+            self._raw_file.close()
+            if os.path.exists(self._partial_path):
+                os.remove(self._partial_path)
+
+
+# ========== RETENCIÓN DE GRABACIONES EN DISCO ==========
+
+@dataclass
+class DiskStats:
+    """Telemetría de espacio en disco del directorio de grabaciones."""
+    disk_total_bytes: int = 0
+    disk_free_bytes: int = 0
+    clip_count: int = 0
+    clip_bytes: int = 0
+    pending_upload_count: int = 0  # Clips que no se pueden borrar todavía
+    pending_upload_bytes: int = 0
+    evicted_count: int = 0  # Clips borrados por la retención en esta sesión
+    evicted_bytes: int = 0
+
+
+class ClipRetentionManager:
+    """
+    Retención de clips en disco con cuota de bytes, edad máxima y espacio libre mínimo.
+    
+    Mantiene un índice SQLite de los clips (tamaño, creación, último acceso,
+    subido o no), así nunca recorre el directorio salvo una única vez al
+    crear el índice. Solo borra clips ya subidos, del menos usado al más
+    usado (LRU); los pendientes de subida nunca se tocan, salvo con
+    ``evict_pending`` (segmentos continuos, reemplazables por los nuevos).
+    Al abrir borra los ``.part`` que dejó un ClipWriter cortado (corte de luz).
+    """
+    
+    def __init__(
+        self,
+        config: RetentionConfig,
+        directory: str,
+        pending_clips: Optional[Set[str]] = None
+    ):
+        """
+        Abre (o crea) el índice de clips.
+        
+        Args:
+            config: Configuración de retención
+            directory: Directorio de grabaciones
+            pending_clips: Clips que el outbox todavía debe subir (rutas reales);
+                solo se usa al crear el índice. None = se desconoce qué se subió
+        """
+        self.config = config
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._evicted_count = 0
+        self._evicted_bytes = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        index_path = os.path.join(directory, config.index_filename)
+        is_new = not os.path.exists(index_path)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False)
+        
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    uploaded INTEGER NOT NULL DEFAULT 0,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    metadata TEXT
+                )
+            """)
+            # Índices creados por versiones anteriores, sin las columnas de segmentos
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(clips)")}
+            if "hits" not in columns:
+                self._conn.execute("ALTER TABLE clips ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+                self._conn.execute("ALTER TABLE clips ADD COLUMN metadata TEXT")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_clips_lru ON clips(uploaded, last_access)"
+            )
+        
+        self._remove_partial_files()
+        if is_new:
+            self._import_existing_clips(pending_clips)
+    
+    def _remove_partial_files(self) -> None:
+        """Borra los clips a medio escribir (``.part``) de una ejecución interrumpida."""
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".part"):
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError as e:
+                        logger.warning(f"⚠ No se pudo borrar el clip incompleto {entry.name}: {e}")
+        if removed:
+            logger.info(f"🧹 {removed} clips incompletos (.part) borrados de {self.directory}")
+    
+    def _import_existing_clips(self, pending_clips: Optional[Set[str]]) -> None:
+        """
+        Registra los clips previos al índice (única vez).
+        
+        Por defecto entran como no subidos. Solo si se conoce el outbox, los
+        clips que no referencia (ya subidos o sin evento) entran como subidos
+        para que la edad y la cuota los alcancen.
+        
+        Args:
+            pending_clips: Clips pendientes en el outbox (None = ninguno se da por subido)
+        """
+        rows = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                extension = os.path.splitext(entry.name)[1]
+                if entry.is_file() and extension in CLIP_CONTENT_TYPES:
+                    stat = entry.stat()
+                    uploaded = pending_clips is not None and os.path.realpath(entry.path) not in pending_clips
+                    rows.append((entry.path, stat.st_size, stat.st_mtime, stat.st_mtime, int(uploaded)))
+        
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO clips (path, size, created_at, last_access, uploaded) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        if rows:
+            pending = sum(1 for row in rows if not row[4])
+            logger.info(
+                f"🗂 Índice de retención creado con {len(rows)} clips existentes ({pending} sin subir)"
+            )
+    
+    def register(self, path: str, hits: int = 0, metadata: Optional[dict] = None) -> None:
+        """
+        Agrega un clip recién guardado al índice.
+        
+        Args:
+            path: Ruta del clip
+            hits: Disparos del detector dentro del clip (segmentos continuos)
+            metadata: Fila a insertar en la nube al subirlo (None = la arma el outbox)
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO clips (path, size, created_at, last_access, hits, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, os.path.getsize(path), now, now, hits,
+                 json.dumps(metadata) if metadata is not None else None)
+            )
+    
+    def pending_uploads(self, limit: int, hits_only: bool = False) -> List[Tuple[str, int, Optional[dict]]]:
+        """
+        Obtiene clips sin subir: primero los que tienen disparos, luego los más viejos.
+        
+        Args:
+            limit: Máximo de clips
+            hits_only: Omitir los clips sin disparos
+            
+        Returns:
+            Lista de (ruta, tamaño, metadata)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, metadata FROM clips WHERE uploaded = 0 AND hits >= ? "
+                "ORDER BY hits > 0 DESC, created_at LIMIT ?",
+                (1 if hits_only else 0, limit)
+            ).fetchall()
+        return [(path, size, json.loads(metadata) if metadata else None) for path, size, metadata in rows]
+    
+    def mark_uploaded(self, path: str) -> None:
+        """
+        Marca un clip como subido: desde ahora puede borrarse.
+        
+        Args:
+            path: Ruta del clip
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE clips SET uploaded = 1, last_access = ? WHERE path = ?",
+                (time.time(), path)
+            )
+    
+    def touch(self, path: str) -> None:
+        """
+        Registra un acceso al clip (orden LRU de borrado).
+        
+        Args:
+            path: Ruta del clip
+        """
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE clips SET last_access = ? WHERE path = ?", (time.time(), path))
+    
+    def enforce(self) -> int:
+        """
+        Aplica edad máxima, cuota y espacio libre mínimo borrando clips subidos.
+        
+        Returns:
+            Cantidad de clips borrados
+        """
+        evicted = 0
+        # Con evict_pending, la edad y la cuota alcanzan también a lo no subido
+        min_uploaded = 0 if self.config.evict_pending else 1
+        with self._lock:
+            # 1. Clips subidos más viejos que la edad máxima
+            max_age = self.config.max_age_days * 86400.0
+            expired = self._conn.execute(
+                "SELECT path, size FROM clips WHERE uploaded >= ? AND created_at < ?",
+                (min_uploaded, time.time() - max_age)
+            ).fetchall()
+            evicted += self._evict(expired)
+            
+            # 2. Cuota y espacio libre: del menos usado al más usado
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM clips").fetchone()[0]
+            free = shutil.disk_usage(self.directory).free
+            excess = max(total - self.config.max_bytes, self.config.min_free_bytes - free, 0)
+            if excess > 0:
+                victims = []
+                for path, size in self._conn.execute(
+                    "SELECT path, size FROM clips WHERE uploaded >= ? "
+                    "ORDER BY uploaded DESC, hits > 0, last_access",
+                    (min_uploaded,)
+                ):
+                    if excess <= 0:
+                        break
+                    victims.append((path, size))
+                    excess -= size
+                evicted += self._evict(victims)
+                
+                if excess > 0:
+                    logger.warning(
+                        f"⚠ Retención: faltan {excess / 1e6:.1f} MB por liberar y solo quedan "
+                        "clips sin subir (no se borran)"
+                    )
+        return evicted
+    
+    def _evict(self, victims: List[Tuple[str, int]]) -> int:
+        """
+        Borra clips del disco y del índice (con el lock tomado).
+        
+        Args:
+            victims: Lista de (ruta, tamaño)
+            
+        Returns:
+            Cantidad de clips borrados
+        """
+        for path, size in victims:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Borrado a mano: solo se actualiza el índice
+            self._evicted_count += 1
+            self._evicted_bytes += size
+        
+        with self._conn:
+            self._conn.executemany("DELETE FROM clips WHERE path = ?", [(path,) for path, _ in victims])
+        return len(victims)
+    
+    def get_disk_stats(self) -> DiskStats:
+        """
+        Obtiene la telemetría de disco y del índice de clips.
+        
+        Returns:
+            Snapshot de DiskStats
+        """
+        usage = shutil.disk_usage(self.directory)
+        with self._lock:
+            (count, size), = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clips"
+            ).fetchall()
+            (pending, pending_size), = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clips WHERE uploaded = 0"
+            ).fetchall()
+            return DiskStats(
+                disk_total_bytes=usage.total,
+                disk_free_bytes=usage.free,
+                clip_count=count,
+                clip_bytes=size,
+                pending_upload_count=pending,
+                pending_upload_bytes=pending_size,
+                evicted_count=self._evicted_count,
+                evicted_bytes=self._evicted_bytes
+            )
+    
+    def start(self) -> None:
+        """Inicia la verificación periódica (edad máxima y espacio libre)."""
+        self._thread = threading.Thread(target=self._retention_loop, daemon=True, name="RetentionThread")
+        self._thread.start()
+    
+    def _retention_loop(self) -> None:
+        """Aplica la retención cada ``check_interval_seconds``."""
+        while not self._stop.wait(self.config.check_interval_seconds):
+            try:
+                self.enforce()
+            except Exception as e:
+                logger.error(f"✗ Error aplicando retención: {e}")
+    
+    def close(self) -> None:
+        """Detiene la verificación periódica y cierra el índice."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        with self._lock:
+            self._conn.close()
+
+
+# ========== GRABACIÓN CONTINUA POR SEGMENTOS ==========
+
+@dataclass
+class SegmentStats:
+    """Métricas de la grabación continua."""
+    segments_written: int = 0
+    segments_with_hits: int = 0
+    bytes_written: int = 0
+    chunks_lost: int = 0  # Sobrescritos en el ring buffer antes de escribirse
+    segments_uploaded: int = 0
+    bytes_uploaded: int = 0
+    write_cpu_seconds: float = 0.0  # CPU del thread de escritura (codificación incluida)
+
+
+class SegmentRecorder:
+    """
+    Graba todo el audio en segmentos de duración fija para armar datasets.
+    
+    Un thread lee el ring buffer hasta el último chunk ya analizado y lo
+    codifica en streaming con ClipWriter (memoria constante, un archivo
+    ``.part`` hasta cerrarlo). Como el análisis va por delante, al cerrar un
+    segmento ya se conocen sus disparos: quedan en el nombre del archivo y en
+    el índice, que ordena la subida (primero los segmentos con disparos) y la
+    cuota de disco (se borran primero los viejos sin disparos).
+    
+    La captura no se toca: el callback sigue sin escribir en la tarjeta SD.
+    """
+    
+    upload_retry_seconds: float = 300.0  # Pausa de las subidas tras un fallo
+    
+    def __init__(
+        self,
+        recording_config: RecordingConfig,
+        audio_config: AudioConfig,
+        source: AudioSource,
+        channel_labels: Sequence[str],
+        position: Callable[[], int]
+    ):
+        """
+        Inicializa el grabador.
+        
+        Args:
+            recording_config: Configuración de grabación (codec, remuestreo y ``segments``)
+            audio_config: Configuración de captura (frecuencia y canales)
+            source: Fuente de audio cuyo ring buffer se graba
+            channel_labels: Corral de cada canal
+            position: Devuelve el primer chunk todavía no analizado en todos
+                los canales (ningún disparo posterior puede caer antes)
+        """
+        self.config = recording_config.segments
+        self.source = source
+        self.channel_labels = tuple(channel_labels)
+        self._position = position
+        self.encoder = ClipEncoder(recording_config, audio_config.sample_rate, audio_config.channels)
+        self._segment_chunks = max(source.seconds_to_chunks(self.config.segment_seconds), 1)
+        self._chunk_seconds = audio_config.chunk_size / audio_config.sample_rate
+        
+        os.makedirs(self.config.directory, exist_ok=True)
+        self.retention = ClipRetentionManager(
+            RetentionConfig(
+                max_bytes=self.config.max_bytes,
+                max_age_days=self.config.max_age_days,
+                min_free_bytes=self.config.min_free_bytes,
+                evict_pending=True
+            ),
+            self.config.directory
+        )
+        
+        self._lock = threading.Lock()
+        self._hits: List[Tuple[int, int]] = []  # (secuencia, canal) de cada disparo
+        self._stats = SegmentStats()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        # Estado del segmento abierto (solo lo toca el thread de escritura)
+        self._writer: Optional[ClipWriter] = None
+        self._segment_start: int = 0
+        self._next_seq: int = 0
+        
+        # Presupuesto de subida: cubeta de bytes que se llena a upload_bytes_per_day
+        self._upload_capacity = self.config.upload_bytes_per_day / 24  # Ráfaga de una hora
+        self._upload_tokens = self._upload_capacity
+        self._upload_refill_time = time.monotonic()
+        self._uploading: Optional[Tuple[str, int]] = None  # (ruta, bytes descontados)
+        self._upload_retry_at: float = 0.0
+    
+    def start(self, start_seq: int) -> None:
+        """
+        Inicia la escritura desde un chunk.
+        
+        Args:
+            start_seq: Primer chunk a grabar
+        """
+        self._next_seq = self._segment_start = start_seq
+        self.source.hold("segments", start_seq)
+        self.retention.enforce()
+        self._thread = threading.Thread(target=self._record_loop, daemon=True, name="SegmentRecorderThread")
+        self._thread.start()
+    
+    def mark_hit(self, channel: int, seq: int) -> None:
+        """
+        Registra un disparo del detector para marcar su segmento.
+        
+        Args:
+            channel: Canal (corral) del disparo
+            seq: Secuencia del chunk del disparo
+        """
+        with self._lock:
+            self._hits.append((seq, channel))
+    
+    def _record_loop(self) -> None:
+        """Escribe el audio ya analizado cada 0.5 s (thread separado)."""
+        while not self._stop.wait(0.5):
+            try:
+                self._write_available()
+            except Exception as e:
+                logger.error(f"✗ Error grabando segmento continuo: {e}")
+                self._abort_segment()
+    
+    def _write_available(self) -> None:
+        """Agrega a los segmentos los chunks analizados desde la última pasada."""
+        start = time.thread_time()
+        end_seq = min(self._position(), self.source.get_write_sequence())
+        
+        while self._next_seq < end_seq:
+            if self._writer is None:
+                self._open_segment(self._next_seq)
+            segment_end = self._segment_start + self._segment_chunks
+            stop_seq = min(end_seq, segment_end)
+            
+            written = 0
+            for first_seq, frames in self.source.iter_chunks(self._next_seq, stop_seq):
+                frames = frames[:max(stop_seq - first_seq, 0)]
+                if len(frames):
+                    self._writer.write(frames)
+                    written += len(frames)
+            
+            lost = stop_seq - self._next_seq - written
+            if lost > 0:
+                self._stats.chunks_lost += lost
+                logger.warning(f"⚠ Segmento continuo: se perdieron {lost} chunks (ring buffer sobrescrito)")
+            self._next_seq = stop_seq
+            
+            if self._next_seq >= segment_end:
+                self._close_segment()
+        
+        self.source.hold("segments", self._next_seq)
+        self._stats.write_cpu_seconds += time.thread_time() - start
+    
+    def _open_segment(self, start_seq: int) -> None:
+        """
+        Abre un segmento nuevo.
+        
+        Args:
+            start_seq: Primer chunk del segmento
+        """
+        self._segment_start = start_seq
+        # Nombre en hora local, como los clips de alerta
+        timestamp = self.source.chunk_time(start_seq).astimezone().strftime("%Y-%m-%d_%H-%M-%S")
+        filepath = os.path.join(self.config.directory, f"segmento_{timestamp}{self.encoder.extension}")
+        self._writer = ClipWriter(self.encoder, filepath)
+    
+    def _close_segment(self) -> None:
+        """Cierra el segmento abierto, lo marca con sus disparos y lo registra en el índice."""
+        writer, start_seq, end_seq = self._writer, self._segment_start, self._next_seq
+        self._writer = None
+        if writer.frames_written == 0:
+            writer.abort()
+            return
+        
+        with self._lock:
+            hits = [(seq, channel) for seq, channel in self._hits if start_seq <= seq < end_seq]
+            self._hits = [(seq, channel) for seq, channel in self._hits if seq >= end_seq]
+        
+        # Los segmentos con disparos se reconocen a simple vista en el directorio
+        root, extension = os.path.splitext(writer.filepath)
+        final_path = f"{root}_disparos{len(hits)}{extension}" if hits else writer.filepath
+        saved_path = writer.close(final_path)
+        size = os.path.getsize(saved_path)
+        
+        metadata = {
+            "id": str(uuid.uuid4()),
+            "started_at": self.source.chunk_time(start_seq).isoformat(),
+            "duration_seconds": round(writer.frames_written / self.encoder.output_rate, 3),
+            "device_id": DEVICE_ID,
+            "farm_id": FARM_ID,
+            "pen_ids": list(self.channel_labels),
+            "sample_rate": self.encoder.output_rate,
+            "codec": self.encoder.codec,
+            "size_bytes": size,
+            "hit_count": len(hits),
+            "hits": [
+                {
+                    "offset_seconds": round((seq - start_seq) * self._chunk_seconds, 3),
+                    "pen_id": self.channel_labels[channel],
+                }
+                for seq, channel in hits
+            ],
+        }
+        self.retention.register(saved_path, hits=len(hits), metadata=metadata)
+        self.retention.enforce()  # Cuota y espacio libre, una vez por segmento
+        
+        self._stats.segments_written += 1
+        self._stats.segments_with_hits += bool(hits)
+        self._stats.bytes_written += size
+    
+    def _abort_segment(self) -> None:
+        """Descarta el segmento a medio escribir tras un error (el siguiente arranca limpio)."""
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+    
+    def next_upload(self) -> Optional[Tuple[str, dict]]:
+        """
+        Elige el próximo segmento a subir si el presupuesto de bytes lo permite.
+        
+        Returns:
+            Tuple (ruta, fila para audio_segments) o None si no hay nada que
+            subir, ya hay una subida en curso o se agotó el presupuesto
+        """
+        now = time.monotonic()
+        if self._uploading is not None or self.config.upload_bytes_per_day <= 0 or now < self._upload_retry_at:
+            return None
+        
+        rate = self.config.upload_bytes_per_day / 86400.0
+        self._upload_tokens = min(
+            self._upload_capacity,
+            self._upload_tokens + (now - self._upload_refill_time) * rate
+        )
+        self._upload_refill_time = now
+        if self._upload_tokens <= 0:
+            return None
+        
+        pending = self.retention.pending_uploads(1, hits_only=self.config.upload_hits_only)
+        if not pending:
+            return None
+        path, size, metadata = pending[0]
+        if metadata is None:
+            # Archivo dejado por una sesión interrumpida: se sube sin detalle de disparos
+            metadata = {"id": str(uuid.uuid4()), "device_id": DEVICE_ID, "farm_id": FARM_ID, "size_bytes": size}
+        
+        # La cubeta puede quedar negativa: el promedio diario se respeta igual
+        self._upload_tokens -= size
+        self._uploading = (path, size)
+        return path, metadata
+    
+    def finish_upload(self, path: str, uploaded: bool) -> None:
+        """
+        Registra el resultado de la subida elegida por ``next_upload``.
+        
+        Un fallo devuelve los bytes al presupuesto y pausa las subidas
+        ``upload_retry_seconds`` (sin conexión no tiene sentido insistir).
+        
+        Args:
+            path: Ruta del segmento
+            uploaded: True si la subida y el insert tuvieron éxito
+        """
+        _, size = self._uploading or (path, 0)
+        self._uploading = None
+        if uploaded:
+            self.retention.mark_uploaded(path)
+            self._stats.segments_uploaded += 1
+            self._stats.bytes_uploaded += size
+        else:
+            self._upload_tokens += size
+            self._upload_retry_at = time.monotonic() + self.upload_retry_seconds
+    
+    def get_stats(self) -> SegmentStats:
+        """
+        Obtiene las métricas de la grabación continua.
+        
+        Returns:
+            Snapshot de SegmentStats
+        """
+        return replace(self._stats)
+    
+    def close(self) -> None:
+        """
+        Graba el audio analizado pendiente y cierra el segmento parcial.
+        
+        El índice (``retention``) queda abierto para las subidas en curso; lo
+        cierra el monitor cuando terminan los workers.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        try:
+            self._write_available()
+            if self._writer is not None:
+                self._close_segment()
+        except Exception as e:
+            logger.error(f"✗ Error cerrando segmento continuo: {e}")
+            self._abort_segment()
+        self.source.release("segments")
+
+
+# ========== OUTBOX PERSISTENTE: EVENTOS PENDIENTES ==========
+
+@dataclass
+class OutboxItem:
+    """Evento pendiente de envío a Supabase, con la referencia a su clip."""
+    item_id: int
+    event_data: dict  # Fila de la tabla events (sin audio_url hasta subir el clip)
+    clip_path: Optional[str]  # Archivo local del clip (None = evento sin audio)
+    storage_path: Optional[str]  # Ruta destino en el bucket
+    audio_url: Optional[str]  # URL pública una vez subido el clip
+    attempts: int
+
+
+class AlertOutbox:
+    """
+    Cola persistente de eventos en SQLite (modo WAL).
+    
+    Cada evento se confirma en disco (``synchronous=FULL``) antes de intentar
+    enviarlo, de modo que sobrevive a cortes de conexión, reinicios del
+    proceso y cortes de luz. Los eventos nuevos se entregan antes que el
+    atraso acumulado; los fallidos se reprograman con backoff exponencial.
+    """
+    
+    def __init__(self, config: OutboxConfig):
+        """
+        Abre (o crea) la base de datos del outbox.
+        
+        Args:
+            config: Configuración del outbox
+        """
+        self.config = config
+        self._lock = threading.Lock()
+        self.is_new = not os.path.exists(config.database_path)  # Primer arranque con outbox
+        self._conn = sqlite3.connect(config.database_path, check_same_thread=False)
+        
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event_json TEXT NOT NULL,
+                    clip_path TEXT,
+                    storage_path TEXT,
+                    audio_url TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(next_attempt_at)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS rollups (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    row_json TEXT NOT NULL
+                )
+            """)
+    
+    def enqueue(
+        self,
+        event_data: dict,
+        clip_path: Optional[str] = None,
+        storage_path: Optional[str] = None
+    ) -> int:
+        """
+        Persiste un evento pendiente.
+        
+        Args:
+            event_data: Fila para la tabla events (debe incluir un ``id`` único)
+            clip_path: Archivo local del clip a subir antes del evento
+            storage_path: Ruta destino del clip en el bucket
+            
+        Returns:
+            Identificador local del evento en el outbox
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (event_json, clip_path, storage_path) VALUES (?, ?, ?)",
+                (json.dumps(event_data), clip_path, storage_path)
+            )
+        return cursor.lastrowid
+    
+    def fetch_due(self, limit: int, now: Optional[float] = None) -> List[OutboxItem]:
+        """
+        Obtiene los eventos listos para enviar.
+        
+        Primero los que nunca se intentaron (alertas en vivo), luego el
+        atraso del más antiguo al más nuevo.
+        
+        Args:
+            limit: Máximo de eventos a retornar
+            now: Instante de referencia (epoch); None = ahora
+            
+        Returns:
+            Lista de eventos pendientes
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, event_json, clip_path, storage_path, audio_url, attempts "
+                "FROM outbox WHERE next_attempt_at <= ? "
+                "ORDER BY attempts > 0, id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+        return [
+            OutboxItem(row[0], json.loads(row[1]), row[2], row[3], row[4], row[5])
+            for row in rows
+        ]
+    
+    def mark_uploaded(self, item_id: int, audio_url: Optional[str]) -> None:
+        """
+        Registra que el clip de un evento ya está en Storage (o ya no existe).
+        
+        Args:
+            item_id: Identificador local del evento
+            audio_url: URL pública del clip (None = evento sin audio)
+        """
+        with self._lock, self._conn:
+            if audio_url is None:
+                self._conn.execute(
+                    "UPDATE outbox SET clip_path = NULL, storage_path = NULL WHERE id = ?",
+                    (item_id,)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE outbox SET audio_url = ? WHERE id = ?",
+                    (audio_url, item_id)
+                )
+    
+    def remove(self, item_ids: Sequence[int]) -> None:
+        """
+        Elimina eventos ya entregados.
+        
+        Args:
+            item_ids: Identificadores locales a eliminar
+        """
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in item_ids])
+    
+    def reschedule(self, items: Sequence[OutboxItem], error: str, now: Optional[float] = None) -> float:
+        """
+        Reprograma eventos fallidos con backoff exponencial (con jitter).
+        
+        Args:
+            items: Eventos cuyo envío falló
+            error: Descripción del error
+            now: Instante de referencia (epoch); None = ahora
+            
+        Returns:
+            Espera del próximo reintento en segundos
+        """
+        now = time.time() if now is None else now
+        updates = []
+        next_delay = self.config.max_backoff_seconds
+        for item in items:
+            delay = self.backoff_delay(item.attempts + 1)
+            next_delay = min(next_delay, delay)
+            updates.append((now + delay, error[:500], item.item_id))
+        
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ?",
+                updates
+            )
+        return next_delay
+    
+    def backoff_delay(self, attempts: int) -> float:
+        """
+        Espera antes del reintento número ``attempts``.
+        
+        Args:
+            attempts: Intentos fallidos acumulados (>= 1)
+            
+        Returns:
+            Segundos de espera, entre la mitad y el total del backoff
+        """
+        delay = min(
+            self.config.max_backoff_seconds,
+            self.config.base_backoff_seconds * 2 ** min(attempts - 1, 30)
+        )
+        return delay * random.uniform(0.5, 1.0)
+    
+    def release_backlog(self, now: Optional[float] = None) -> None:
+        """
+        Adelanta los reintentos pendientes: la conexión volvió.
+        
+        Args:
+            now: Instante de referencia (epoch); None = ahora
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE next_attempt_at > ?",
+                (now, now)
+            )
+    
+    def next_due_time(self) -> Optional[float]:
+        """Retorna el próximo instante (epoch) con eventos para reintentar."""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_attempt_at) FROM outbox").fetchone()
+        return row[0]
+    
+    def pending_count(self) -> int:
+        """Retorna la cantidad de eventos pendientes."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+    
+    def pending_clip_paths(self) -> Set[str]:
+        """Retorna las rutas reales de los clips que todavía falta subir."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT clip_path FROM outbox WHERE clip_path IS NOT NULL AND audio_url IS NULL"
+            ).fetchall()
+        return {os.path.realpath(row[0]) for row in rows}
+    
+    def enqueue_rollups(self, rows: Sequence[dict], max_pending: int) -> int:
+        """
+        Persiste resúmenes acústicos pendientes de envío.
+        
+        Args:
+            rows: Filas para la tabla acoustic_rollups
+            max_pending: Tope de filas pendientes; se descartan las más viejas
+            
+        Returns:
+            Filas descartadas por el tope
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO rollups (row_json) VALUES (?)",
+                [(json.dumps(row),) for row in rows]
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM rollups").fetchone()[0] - max_pending
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM rollups WHERE id IN (SELECT id FROM rollups ORDER BY id LIMIT ?)",
+                    (excess,)
+                )
+        return max(excess, 0)
+    
+    def fetch_rollups(self, limit: int) -> Tuple[List[int], List[dict]]:
+        """
+        Obtiene los resúmenes pendientes más antiguos.
+        
+        Args:
+            limit: Máximo de filas
+            
+        Returns:
+            Tuple (identificadores locales, filas)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, row_json FROM rollups ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [row[0] for row in rows], [json.loads(row[1]) for row in rows]
+    
+    def remove_rollups(self, row_ids: Sequence[int]) -> None:
+        """
+        Elimina resúmenes ya entregados.
+        
+        Args:
+            row_ids: Identificadores locales a eliminar
+        """
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM rollups WHERE id = ?", [(i,) for i in row_ids])
+    
+    def pending_rollup_count(self) -> int:
+        """Retorna la cantidad de resúmenes pendientes."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rollups").fetchone()[0]
+    
+    def close(self) -> None:
+        """Cierra la base de datos (los pendientes quedan para el próximo arranque)."""
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class UploadStats:
+    """Métricas del pool de subidas a Supabase."""
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    rejected: int = 0  # Tareas rechazadas por cola llena (backpressure)
+    queue_depth: int = 0
+    in_flight: int = 0
+    latency_p50_ms: float = 0.0  # Duración de cada request (subida o insert)
+    latency_p99_ms: float = 0.0
+    queue_wait_p99_ms: float = 0.0  # Encolado → inicio de la request
+
+
+class UploadWorkerPool:
+    """
+    Pool fijo de workers para las requests a Supabase.
+    
+    La cola es acotada y con prioridades (menor = antes); ``submit`` nunca
+    bloquea: si la cola está llena rechaza la tarea y el llamador la
+    reintenta más tarde (backpressure). Las tareas retornan True si la
+    request tuvo éxito.
+    """
+    
+    def __init__(self, num_workers: int, queue_size: int):
+        """
+        Inicia los workers.
+        
+        Args:
+            num_workers: Requests simultáneas como máximo
+            queue_size: Tareas en espera como máximo
+        """
+        self._queue: "queue.PriorityQueue[Tuple[int, int, float, Optional[Callable[[], bool]]]]" = \
+            queue.PriorityQueue(maxsize=queue_size)
+        self._counter = itertools.count()  # Desempate FIFO dentro de una prioridad
+        self._lock = threading.Lock()
+        self._stats = UploadStats()
+        self._latencies: deque = deque(maxlen=512)
+        self._queue_waits: deque = deque(maxlen=512)
+        
+        self._workers = [
+            threading.Thread(target=self._worker_loop, daemon=True, name=f"UploadWorker-{i}")
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+    
+    def submit(self, task: Callable[[], bool], priority: int = 0) -> bool:
+        """
+        Encola una tarea sin bloquear.
+        
+        Args:
+            task: Función que ejecuta la request y retorna True si tuvo éxito
+            priority: Prioridad (menor = antes)
+            
+        Returns:
+            True si se encoló, False si la cola está llena
+        """
+        try:
+            self._queue.put_nowait((priority, next(self._counter), time.monotonic(), task))
+        except queue.Full:
+            with self._lock:
+                self._stats.rejected += 1
+            return False
+        
+        with self._lock:
+            self._stats.submitted += 1
+        return True
+    
+    def _worker_loop(self) -> None:
+        """Ejecuta tareas de la cola hasta recibir la señal de fin."""
+        while True:
+            _, _, enqueued_at, task = self._queue.get()
+            if task is None:
+                break
+            
+            start = time.monotonic()
+            with self._lock:
+                self._stats.in_flight += 1
+                self._queue_waits.append(start - enqueued_at)
+            
+            success = False
+            try:
+                success = bool(task())
+            except Exception as e:
+                logger.error(f"✗ Error en tarea de subida: {e}")
+            finally:
+                with self._lock:
+                    self._stats.in_flight -= 1
+                    self._latencies.append(time.monotonic() - start)
+                    if success:
+                        self._stats.completed += 1
+                    else:
+                        self._stats.failed += 1
+    
+    def get_stats(self) -> UploadStats:
+        """
+        Obtiene las métricas del pool (cola, requests en vuelo y latencia).
+        
+        Returns:
+            Snapshot de UploadStats
+        """
+        with self._lock:
+            stats = replace(self._stats)
+            latencies = np.array(self._latencies, dtype=np.float64)
+            queue_waits = np.array(self._queue_waits, dtype=np.float64)
+        stats.queue_depth = self._queue.qsize()
+        if latencies.size:
+            stats.latency_p50_ms = float(np.percentile(latencies, 50) * 1000)
+            stats.latency_p99_ms = float(np.percentile(latencies, 99) * 1000)
+            stats.queue_wait_p99_ms = float(np.percentile(queue_waits, 99) * 1000)
+        return stats
+    
+    def close(self, timeout: float = 10.0) -> bool:
+        """
+        Detiene los workers tras sus requests en curso.
+        
+        Las tareas aún en cola se descartan: su estado vive en el outbox y se
+        reintentan en el próximo arranque.
+        
+        Args:
+            timeout: Espera máxima total en segundos
+            
+        Returns:
+            True si todos los workers terminaron
+        """
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        
+        for _ in self._workers:
+            self._queue.put((-1, next(self._counter), time.monotonic(), None))
+        
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(timeout=max(0.0, deadline - time.monotonic()))
+        return not any(worker.is_alive() for worker in self._workers)
+
+
+# ========== RESÚMENES ACÚSTICOS PERIÓDICOS ==========
+
+# Límites inferiores de las bandas de energía de los resúmenes (Hz, octavas);
+# la última banda llega hasta Nyquist
+ROLLUP_BAND_EDGES_HZ = (0, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+@dataclass
+class _RollupPeriod:
+    """Período abierto de un canal: features acumuladas hasta cerrarlo."""
+    index: int  # Número de período desde el inicio de la fuente
+    start_time: datetime
+    volumes: List[npt.NDArray[np.float32]] = field(default_factory=list)
+    frequencies: List[npt.NDArray[np.float32]] = field(default_factory=list)
+    bands: List[npt.NDArray[np.float32]] = field(default_factory=list)
+
+
+class RollupAggregator:
+    """
+    Resume las features de cada canal por período (por segundo o por minuto).
+    
+    Cada fila lleva mínimo, máximo, media y p95 del RMS y el ZCR, más media
+    y p95 de la energía por banda de octava. Las bandas se calculan aquí
+    (una FFT por lote, ~0.1% de un núcleo) para que los resúmenes tengan
+    las mismas columnas con cualquier analizador.
+    """
+    
+    def __init__(
+        self,
+        config: RollupConfig,
+        sample_rate: int,
+        chunk_size: int,
+        channel_labels: Sequence[str],
+        chunk_time: Callable[[int], datetime]
+    ):
+        """
+        Inicializa el agregador.
+        
+        Args:
+            config: Configuración de los resúmenes
+            sample_rate: Frecuencia de muestreo
+            chunk_size: Frames por chunk
+            channel_labels: Corral de cada canal
+            chunk_time: Hora de captura de un chunk a partir de su secuencia
+        """
+        self.config = config
+        self.channel_labels = tuple(channel_labels)
+        self._chunk_time = chunk_time
+        self._chunk_seconds = chunk_size / sample_rate
+        
+        # Bins de la FFT agrupados por banda (los bins están ordenados por frecuencia)
+        freqs = np.fft.rfftfreq(chunk_size, 1.0 / sample_rate)
+        edges = [edge for edge in ROLLUP_BAND_EDGES_HZ if edge < sample_rate / 2]
+        self.band_edges_hz = tuple(edges)
+        self._band_starts = np.searchsorted(freqs, edges)
+        self._band_sizes = np.diff(np.append(self._band_starts, freqs.size))
+        self._window = (np.hanning(chunk_size) / 32768.0).astype(np.float32)  # Escala a dBFS
+        
+        self._periods: List[Optional[_RollupPeriod]] = [None] * len(self.channel_labels)
+    
+    def _band_db(self, frames: npt.NDArray[np.int16]) -> npt.NDArray[np.float32]:
+        """
+        Energía por banda de octava de cada chunk.
+        
+        Args:
+            frames: Array 2-D int16 (chunks × muestras) de un canal
+            
+        Returns:
+            Array float32 (chunks × bandas) en dB relativos a escala completa
+        """
+        power = np.abs(np.fft.rfft(frames * self._window, axis=1)) ** 2
+        band_power = np.add.reduceat(power, self._band_starts, axis=1) / self._band_sizes
+        return (10.0 * np.log10(band_power + 1e-12)).astype(np.float32)
+    
+    def add(
+        self,
+        channel: int,
+        first_seq: int,
+        frames: npt.NDArray[np.int16],
+        features: Sequence[FeatureFrame]
+    ) -> List[dict]:
+        """
+        Acumula un lote de chunks consecutivos de un canal.
+        
+        Args:
+            channel: Canal de audio
+            first_seq: Secuencia del primer chunk del lote
+            frames: Array 2-D int16 (chunks × muestras) del canal
+            features: FeatureFrame de cada chunk del lote
+            
+        Returns:
+            Filas de los períodos que el lote completó (normalmente ninguna)
+        """
+        count = len(features)
+        volumes = np.fromiter((f.volume for f in features), dtype=np.float32, count=count)
+        frequencies = np.fromiter((f.frequency for f in features), dtype=np.float32, count=count)
+        bands = self._band_db(frames)
+        
+        # Período de cada chunk según su posición en el audio
+        seqs = np.arange(first_seq, first_seq + count)
+        periods = (seqs * self._chunk_seconds // self.config.period_seconds).astype(np.int64)
+        splits = np.flatnonzero(np.diff(periods)) + 1
+        
+        rows = []
+        for start, end in zip(np.r_[0, splits], np.r_[splits, count]):
+            period = self._periods[channel]
+            if period is not None and period.index != periods[start]:
+                rows.append(self._close_period(channel))
+                period = None
+            if period is None:
+                period = _RollupPeriod(int(periods[start]), self._chunk_time(first_seq + int(start)))
+                self._periods[channel] = period
+            period.volumes.append(volumes[start:end])
+            period.frequencies.append(frequencies[start:end])
+            period.bands.append(bands[start:end])
+        return rows
+    
+    def _close_period(self, channel: int) -> dict:
+        """
+        Cierra el período abierto de un canal.
+        
+        Args:
+            channel: Canal de audio
+            
+        Returns:
+            Fila para la tabla acoustic_rollups
+        """
+        period = self._periods[channel]
+        self._periods[channel] = None
+        volumes = np.concatenate(period.volumes)
+        frequencies = np.concatenate(period.frequencies)
+        bands = np.concatenate(period.bands)
+        
+        row = {
+            "id": str(uuid.uuid4()),
+            "period_start": period.start_time.isoformat(),
+            "period_seconds": self.config.period_seconds,
+            "device_id": DEVICE_ID,
+            "farm_id": FARM_ID,
+            "pen_id": self.channel_labels[channel],
+            "channel": channel,
+            "chunks": int(volumes.size),
+        }
+        for name, values in (("rms", volumes), ("zcr", frequencies)):
+            row[f"{name}_min"] = round(float(values.min()), 2)
+            row[f"{name}_max"] = round(float(values.max()), 2)
+            row[f"{name}_mean"] = round(float(values.mean()), 2)
+            row[f"{name}_p95"] = round(float(np.percentile(values, 95)), 2)
+        row["band_edges_hz"] = list(self.band_edges_hz)
+        row["band_db_mean"] = np.round(bands.mean(axis=0, dtype=np.float64), 1).tolist()
+        row["band_db_p95"] = np.round(np.percentile(bands.astype(np.float64), 95, axis=0), 1).tolist()
+        return row
+    
+    def flush(self) -> List[dict]:
+        """
+        Cierra los períodos abiertos (al apagar: quedan como períodos parciales).
+        
+        Returns:
+            Filas de los períodos cerrados
+        """
+        return [
+            self._close_period(channel)
+            for channel, period in enumerate(self._periods)
+            if period is not None
+        ]
+
+
+# ========== TRAZAS DE LATENCIA POR ETAPA ==========
+
+# Etapas de un evento, en orden: cada una va del fin de la anterior a su propio fin
+#   capture:   inicio del chunk que disparó → chunk disponible en el ring buffer
+#   analysis:  chunk disponible → decisión de alerta
+#   recording: decisión → audio posterior completo (duration_seconds o evento extendido)
+#   save:      audio completo → clip cerrado en disco
+#   upload:    clip en disco → clip en Storage (incluye la espera en el outbox)
+#   insert:    clip en Storage (o en disco si no hay audio) → fila en la tabla events
+LATENCY_STAGES = ("capture", "analysis", "recording", "save", "upload", "insert")
+
+# Límites superiores de los buckets en segundos: del chunk a los reintentos del outbox
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    30.0, 60.0, 300.0, 900.0, 3600.0, 4 * 3600.0, 24 * 3600.0
+)
+
+
+@dataclass
+class StageLatencyStats:
+    """Latencia de una etapa (o del total) estimada desde su histograma."""
+    stage: str
+    count: int = 0
+    p50_ms: float = 0.0
+    p99_ms: float = 0.0
+    max_ms: float = 0.0
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con buckets fijos.
+    
+    Memoria constante sin importar cuántos eventos se observen; los
+    percentiles se interpolan dentro del bucket, suficiente para ver qué
+    etapa se degradó. Los percentiles exactos de la flota salen de
+    ``metadata.latency_ms`` de cada evento.
+    """
+    
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Inicializa el histograma vacío.
+        
+        Args:
+            buckets: Límites superiores en segundos, crecientes (se agrega +Inf)
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+    
+    def observe(self, seconds: float) -> None:
+        """
+        Registra una latencia.
+        
+        Args:
+            seconds: Latencia en segundos
+        """
+        seconds = max(float(seconds), 0.0)
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+    
+    def quantile(self, q: float) -> float:
+        """
+        Estima un percentil interpolando linealmente dentro de su bucket
+        (acotado por el mínimo y el máximo observados).
+        
+        Args:
+            q: Cuantil entre 0 y 1
+            
+        Returns:
+            Latencia estimada en segundos (0.0 sin observaciones)
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = max(self.buckets[index - 1] if index > 0 else 0.0, self.min)
+                upper = min(self.buckets[index] if index < len(self.buckets) else self.max, self.max)
+                fraction = (rank - cumulative) / bucket_count
+                return lower + (upper - lower) * fraction
+            cumulative += bucket_count
+        return self.max
+
+
+class LatencyTracker:
+    """
+    Histogramas de latencia por etapa de los eventos (thread-safe).
+    
+    Cada evento lleva una traza: el instante monótono en que terminó cada
+    etapa, más ``onset`` (inicio del sonido). Marcar una etapa observa su
+    duración desde la última etapa marcada; al insertar el evento se observa
+    también el total.
+    """
+    
+    def __init__(self):
+        """Inicializa un histograma por etapa y uno para el total."""
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, LatencyHistogram] = {
+            stage: LatencyHistogram() for stage in LATENCY_STAGES + ("total",)
+        }
+    
+    def mark(self, trace: Dict[str, float], stage: str, now: Optional[float] = None) -> None:
+        """
+        Registra el fin de una etapa en la traza de un evento y observa su duración.
+        
+        Args:
+            trace: Traza del evento (etapa -> ``time.monotonic()``), se modifica
+            stage: Etapa que terminó
+            now: Instante del fin (None = ahora)
+        """
+        now = time.monotonic() if now is None else now
+        previous = [trace[name] for name in ("onset",) + LATENCY_STAGES if name in trace]
+        trace[stage] = now
+        if not previous:
+            return
+        
+        with self._lock:
+            self._histograms[stage].observe(now - previous[-1])
+            if stage == LATENCY_STAGES[-1] and "onset" in trace:
+                self._histograms["total"].observe(now - trace["onset"])
+    
+    def get_stats(self) -> List[StageLatencyStats]:
+        """
+        Obtiene los percentiles de cada etapa y del total.
+        
+        Returns:
+            Lista de StageLatencyStats en orden de etapa
+        """
+        with self._lock:
+            return [
+                StageLatencyStats(
+                    stage=stage,
+                    count=histogram.count,
+                    p50_ms=histogram.quantile(0.5) * 1000,
+                    p99_ms=histogram.quantile(0.99) * 1000,
+                    max_ms=histogram.max * 1000
+                )
+                for stage, histogram in self._histograms.items()
+            ]
+    
+    def snapshot(self) -> Dict[str, LatencyHistogram]:
+        """
+        Copia los histogramas (para exportarlos sin retener el lock).
+        
+        Returns:
+            Diccionario etapa -> copia de su LatencyHistogram
+        """
+        with self._lock:
+            copies = {}
+            for stage, histogram in self._histograms.items():
+                copy = LatencyHistogram(histogram.buckets)
+                copy.counts = list(histogram.counts)
+                copy.count, copy.sum = histogram.count, histogram.sum
+                copy.min, copy.max = histogram.min, histogram.max
+                copies[stage] = copy
+            return copies
+
+
+def trace_latencies_ms(trace: Dict[str, float]) -> Dict[str, float]:
+    """
+    Convierte la traza de un evento en duraciones por etapa.
+    
+    Args:
+        trace: Traza del evento (etapa -> ``time.monotonic()``)
+        
+    Returns:
+        Milisegundos por etapa marcada, más ``total`` desde ``onset``
+    """
+    latencies = {}
+    previous = trace.get("onset")
+    for stage in LATENCY_STAGES:
+        if stage not in trace:
+            continue
+        if previous is not None:
+            latencies[stage] = round((trace[stage] - previous) * 1000, 1)
+        previous = trace[stage]
+    if "onset" in trace and previous is not None:
+        latencies["total"] = round((previous - trace["onset"]) * 1000, 1)
+    return latencies
+
+
+# ========== CAPA DE COORDINACIÓN: MONITOR PRINCIPAL ==========
+
+@dataclass
+class MonitorStats:
+    """Cobertura del análisis respecto a la captura."""
+    chunks_captured: int = 0  # Chunks capturados desde que arrancó el análisis
+    chunks_analyzed: int = 0
+    chunks_skipped: int = 0  # Chunks sobrescritos antes de ser analizados
+    idle_wakeups: int = 0  # Esperas que vencieron sin audio nuevo
+    triggers_merged: int = 0  # Disparos absorbidos por un evento abierto (filas y subidas ahorradas)
+    
+    @property
+    def coverage(self) -> float:
+        """Fracción de chunks capturados que fueron analizados."""
+        if self.chunks_captured == 0:
+            return 1.0
+        return min(self.chunks_analyzed / self.chunks_captured, 1.0)
+
+
+@dataclass
+class AlertEvent:
+    """Evento acústico: un episodio (uno o más disparos) en un único clip."""
+    trigger_seq: int  # Chunk del primer disparo
+    start_seq: int  # Primer chunk del clip (incluye pre-roll)
+    end_seq: int  # Fin del clip (exclusive); se extiende con cada chunk activo
+    volume: float  # Pico de volumen del episodio
+    frequency: float  # Frecuencia del chunk con el pico de volumen
+    timestamp: str  # Hora local del primer disparo (nombre de archivo)
+    trigger_count: int = 1
+    channel: int = 0  # Canal de audio (corral) del evento
+    trace: Dict[str, float] = field(default_factory=dict)  # Etapa -> time.monotonic() (LATENCY_STAGES)
+    last_active_seq: int = -1  # Último chunk sobre el umbral de salida
+    active_chunks: int = 1  # Chunks sobre el umbral de salida
+    volume_sum: float = 0.0  # Sumas sobre los chunks activos (para las medias)
+    frequency_sum: float = 0.0
+    
+    @property
+    def volume_mean(self) -> float:
+        """Volumen medio de los chunks activos del episodio."""
+        return self.volume_sum / max(self.active_chunks, 1)
+    
+    @property
+    def frequency_mean(self) -> float:
+        """Frecuencia media de los chunks activos del episodio."""
+        return self.frequency_sum / max(self.active_chunks, 1)
+
+
+class BioacousticMonitor:
+    """
+    Monitor principal que coordina captura, análisis y grabación.
+    """
+    
+    def __init__(
+        self,
+        audio_config: AudioConfig,
+        analysis_config: AnalysisConfig,
+        recording_config: RecordingConfig,
+        analyzer: Optional[AudioAnalyzer] = None,
+        supabase_client: Optional[Client] = None,
+        outbox_config: Optional[OutboxConfig] = None,
+        retention_config: Optional[RetentionConfig] = None,
+        source: Optional[AudioSource] = None,
+        metrics_config: Optional[MetricsConfig] = None,
+        rollup_config: Optional[RollupConfig] = None
+    ):
+        """
+        Inicializa el monitor bioacústico.
+        
+        Args:
+            audio_config: Configuración de captura de audio
+            analysis_config: Configuración de análisis
+            recording_config: Configuración de grabación
+            analyzer: Analizador de audio, solo para captura de un canal
+                (si None, se crea uno por canal según ``analysis_config``)
+            supabase_client: Cliente de Supabase para logging en la nube
+            outbox_config: Configuración del outbox persistente (None = valores por defecto)
+            retention_config: Configuración de retención en disco (None = valores por defecto)
+            source: Fuente de audio (None = micrófono según ``audio_config``)
+            metrics_config: Endpoint local de métricas Prometheus (None = sin endpoint)
+            rollup_config: Resúmenes acústicos periódicos hacia Supabase (None = sin resúmenes)
+        """
+        self.audio_config = audio_config
+        self.analysis_config = analysis_config
+        self.recording_config = recording_config
+        
+        # Con segmentación por histéresis los episodios se separan solos: los
+        # analizadores creados aquí no aplican cooldown
+        self._segmentation = analysis_config.segmentation
+        self._analyzer_config = (
+            replace(analysis_config, cooldown_seconds=0.0) if self._segmentation.enabled else analysis_config
+        )
+        
+        # Componentes
+        if source is not None:
+            self.source: AudioSource = source
+        elif audio_config.capture_process:
+            self.source = ProcessMicrophoneCapture(audio_config)
+        else:
+            self.source = MicrophoneCapture(audio_config)
+        
+        # Canales: cada uno es un corral con su analizador, cooldown y eventos
+        channels = audio_config.channels
+        self.channel_labels = audio_config.channel_labels or tuple(f"ch{c + 1}" for c in range(channels))
+        if len(self.channel_labels) != channels:
+            raise ValueError(f"channel_labels tiene {len(self.channel_labels)} etiquetas para {channels} canales")
+        if analyzer is not None and channels > 1:
+            raise ValueError("Con varios canales el monitor crea un analizador por canal (no pasar analyzer)")
+        # Cada directorio tiene su propio índice y cuota de retención
+        if recording_config.continuous and (
+            os.path.realpath(recording_config.segments.directory)
+            == os.path.realpath(recording_config.output_directory)
+        ):
+            raise ValueError(
+                f"segments.directory y output_directory no pueden ser el mismo directorio: "
+                f"{recording_config.output_directory}"
+            )
+
+        # Un solo proceso de inferencia para todos los canales
+        self.model: Optional[ModelAnalyzer] = None
+        if analyzer is None and analysis_config.use_cascade and analysis_config.use_model:
+            self.model = ModelAnalyzer(self._analyzer_config, audio_config.sample_rate)
+        
+        if analyzer is not None:
+            self.analyzers: List[AudioAnalyzer] = [analyzer]
+        else:
+            self.analyzers = [self._create_analyzer(channel) for channel in range(channels)]
+            if analysis_config.use_cascade and analysis_config.use_adaptive_thresholds:
+                logger.warning("⚠️ La cascada usa umbrales fijos: use_adaptive_thresholds no tiene efecto")
+        self.analyzer = self.analyzers[0]
+        
+        # Cooldowns en tiempo de audio: igual en vivo que reprocesando a toda velocidad
+        self._chunk_seconds = audio_config.chunk_size / audio_config.sample_rate
+        self._clock_seq: int = 0
+        # Primer chunk sin decidir en todos los canales (lo graba la grabación continua)
+        self._analyzed_seq: int = 0
+        for channel_analyzer in self.analyzers:
+            channel_analyzer.clock = self._audio_clock
+        self.supabase = supabase_client
+        
+        # Los clips son por canal (mono): el evento de un corral lleva su propio audio
+        self.encoder = ClipEncoder(recording_config, audio_config.sample_rate, 1)
+        
+        # Outbox persistente: los eventos se envían desde SQLite, nunca directo
+        self.outbox: Optional[AlertOutbox] = None
+        self._storage_bucket = None  # Proxy del bucket reutilizado en todas las subidas
+        if supabase_client is not None:
+            self.outbox = AlertOutbox(outbox_config or OutboxConfig())
+            self._storage_bucket = supabase_client.storage.from_("alerts")
+        self._outbox_wakeup = threading.Event()
+        self._outbox_stop = threading.Event()
+        self._outbox_thread: Optional[threading.Thread] = None
+        self._upload_pool: Optional[UploadWorkerPool] = None
+        self._outbox_lock = threading.Lock()
+        self._outbox_in_flight: set = set()  # Eventos con una request en curso
+        
+        # Resúmenes acústicos: en memoria hasta cada envío en bloque, luego en el outbox
+        self.rollup_config = rollup_config
+        self.rollups: Optional[RollupAggregator] = None
+        if rollup_config is not None and self.outbox is not None:
+            self.rollups = RollupAggregator(
+                rollup_config,
+                audio_config.sample_rate,
+                audio_config.chunk_size,
+                self.channel_labels,
+                self.source.chunk_time
+            )
+        self._rollup_rows: List[dict] = []
+        self._rollup_lock = threading.Lock()
+        self._rollups_in_flight = False
+        self._last_rollup_upload = time.monotonic()
+        
+        # Latencia por etapa: trazas de los eventos aún en el outbox (id -> traza).
+        # Tras un reinicio el reloj monótono cambia: esos eventos solo llevan
+        # las etapas medidas antes de guardarse
+        self.latency = LatencyTracker()
+        self._event_traces: Dict[str, Dict[str, float]] = {}
+        
+        # Endpoint local de métricas para un colector en el mismo dispositivo
+        self.metrics: Optional[MetricsServer] = None
+        if metrics_config is not None:
+            self.metrics = MetricsServer(self, metrics_config)
+        
+        # Estado
+        self._is_running: bool = False
+        
+        # Máquina de estados de alertas por canal: evento abierto (None = en reposo)
+        self._active_events: List[Optional[AlertEvent]] = [None] * channels
+        self._onset_runs: List[int] = [0] * channels  # Detecciones seguidas sin evento abierto
+        self._alert_counts: List[int] = [0] * channels
+        
+        # Escritura de clips fuera del thread de análisis: comandos ("open"/"close", evento).
+        # Sin tope: son referencias pequeñas y perder un "close" dejaría un clip abierto
+        self._alert_queue: "queue.Queue[Optional[Tuple[str, AlertEvent]]]" = queue.Queue()
+        self._alert_writer_thread: Optional[threading.Thread] = None
+        
+        # Métricas de cobertura del análisis
+        self._stats = MonitorStats()
+        self._start_seq: int = 0
+        self._last_display_time: float = 0.0
+        self._show_progress = sys.stdout.isatty()  # Bajo systemd la barra solo llenaría el journal
+        self._max_batch_chunks: int = 64  # Tope del lote al recuperar atraso
+        self._pre_roll_chunks = self.source.seconds_to_chunks(recording_config.pre_trigger_seconds)
+        # El clip se escribe en streaming: un episodio puede durar más que el ring buffer
+        self._max_event_chunks = self.source.seconds_to_chunks(
+            self._segmentation.max_event_seconds if self._segmentation.enabled
+            else recording_config.max_clip_seconds
+        )
+        
+        # El historial debe cubrir el pre-roll y el audio posterior al disparo
+        clip_seconds = max(
+            recording_config.pre_trigger_seconds + recording_config.duration_seconds,
+            recording_config.max_clip_seconds
+        )
+        if clip_seconds >= audio_config.ring_buffer_seconds:
+            logger.warning(
+                f"⚠ ring_buffer_seconds ({audio_config.ring_buffer_seconds}s) no cubre "
+                f"clips de {clip_seconds}s; el pre-roll se recortará"
+            )
+        
+        # Crear directorio de grabaciones
+        os.makedirs(recording_config.output_directory, exist_ok=True)
+        
+        # Cuota y edad máxima de los clips en disco (solo se borran los ya subidos).
+        # Con un outbox previo, un clip que no referencia ya se entregó; en el primer
+        # arranque (o sin Supabase) no se sabe y ningún clip existente se da por subido
+        pending_clips = None
+        if self.outbox is not None and not self.outbox.is_new:
+            pending_clips = self.outbox.pending_clip_paths()
+        self.retention = ClipRetentionManager(
+            retention_config or RetentionConfig(),
+            recording_config.output_directory,
+            pending_clips
+        )
+        
+        # Grabación continua: escribe hasta el último chunk analizado
+        self.segments: Optional[SegmentRecorder] = None
+        if recording_config.continuous:
+            self.segments = SegmentRecorder(
+                recording_config, audio_config, self.source, self.channel_labels,
+                position=lambda: self._analyzed_seq
+            )
+    
+    def _audio_clock(self) -> float:
+        """
+        Reloj de los analizadores: posición en el audio del chunk en análisis.
+        
+        Returns:
+            Segundos de audio desde el inicio de la fuente
+        """
+        return self._clock_seq * self._chunk_seconds
+    
+    def _create_analyzer(self, channel: int) -> AudioAnalyzer:
+        """
+        Crea el analizador de un canal según la configuración de análisis.
+        
+        Args:
+            channel: Canal de audio
+            
+        Returns:
+            Analizador con estado propio (STFT, cooldown, estadísticas)
+        """
+        config, sample_rate = self._analyzer_config, self.audio_config.sample_rate
+        if config.use_cascade:
+            model = ModelStreamAnalyzer(self.model, channel) if self.model is not None else None
+            return CascadeAnalyzer(config, sample_rate, model)
+        if config.use_spectral_features:
+            return SpectralAudioAnalyzer(config, sample_rate)
+        return SimpleAudioAnalyzer(config)
+    
+    def start(self) -> None:
+        """Inicia el sistema de monitoreo."""
+        logger.info("=" * 50)
+        logger.info("Sistema de Monitoreo Bioacústico v0.9 (Multi-Tenant)")
+        logger.info("=" * 50)
+        logger.info(f"Granja: {FARM_ID[:8]}...{FARM_ID[-4:]}")
+        logger.info(f"Dispositivo: {DEVICE_ID}")
+        
+        # Listar dispositivos disponibles
+        if isinstance(self.source, MicrophoneCapture):
+            self.source.list_available_devices()
+        
+        try:
+            # Iniciar captura (una fuente reproducida espera al análisis desde el primer chunk)
+            self._start_seq = self.source.get_write_sequence()
+            self._analyzed_seq = self._start_seq
+            self.source.hold("analysis", self._start_seq)
+            self.source.start()
+            self._is_running = True
+            
+            self._alert_writer_thread = threading.Thread(
+                target=self._alert_writer_loop,
+                daemon=True,
+                name="AlertWriterThread"
+            )
+            self._alert_writer_thread.start()
+            if self.segments is not None:
+                self.segments.start(self._start_seq)
+            
+            self.retention.enforce()
+            self.retention.start()
+            
+            if self.outbox is not None:
+                pending = self.outbox.pending_count()
+                if pending:
+                    logger.info(f"📦 Outbox: {pending} eventos pendientes de sesiones anteriores")
+                self._upload_pool = UploadWorkerPool(
+                    self.outbox.config.upload_workers,
+                    self.outbox.config.upload_queue_size
+                )
+                self._outbox_thread = threading.Thread(
+                    target=self._outbox_drain_loop,
+                    daemon=True,
+                    name="OutboxDrainThread"
+                )
+                self._outbox_thread.start()
+            
+            if self.metrics is not None:
+                self.metrics.start()
+            
+            if self.segments is not None:
+                segments = self.recording_config.segments
+                logger.info(
+                    f"Modo recolección de datos activo: segmentos de {segments.segment_seconds:g}s "
+                    f"en ./{segments.directory}/"
+                )
+            logger.info(f"Directorio de grabaciones: ./{self.recording_config.output_directory}/")
+            logger.info("Presiona Ctrl+C para detener\n")
+            
+            # Loop principal de monitoreo
+            self._monitoring_loop()
+            
+        except KeyboardInterrupt:
+            logger.info("\nInterrupción recibida. Apagando sistema...")
+        except Exception as e:
+            logger.error(f"Error crítico: {e}", exc_info=True)
+        finally:
+            self._shutdown()
+    
+    def _monitoring_loop(self) -> None:
+        """Loop principal de monitoreo y análisis (desde ``_start_seq``)."""
+        if self.analysis_config.consume_all_chunks:
+            self._sequential_monitoring_loop()
+        else:
+            self._sampling_monitoring_loop()
+    
+    def _sequential_monitoring_loop(self) -> None:
+        """
+        Consume cada chunk capturado en orden, sin pérdidas.
+        
+        El thread duerme en la condición del ring buffer hasta que llega el
+        siguiente chunk, en lugar de muestrear el último cada 50 ms.
+        """
+        next_seq = self._start_seq
+        
+        while self._is_running:
+            try:
+                # Si el análisis va atrasado, procesar los pendientes como un lote
+                result = self.source.wait_for_chunks(
+                    next_seq,
+                    max_chunks=self._max_batch_chunks,
+                    timeout=0.5
+                )
+                if result is None:
+                    self._stats.idle_wakeups += 1
+                    if self.source.is_exhausted and next_seq >= self.source.get_write_sequence():
+                        logger.info("\nFin de las grabaciones: análisis completo")
+                        break
+                    continue
+                
+                seq, frames = result
+                if seq > next_seq:
+                    # El análisis se quedó atrás más que el historial del ring buffer
+                    self._stats.chunks_skipped += seq - next_seq
+                next_seq = seq + len(frames)
+                
+                self._process_frames(seq, frames)
+                
+                # Solo el pre-roll queda por detrás del análisis
+                self.source.hold("analysis", next_seq - self._pre_roll_chunks)
+                
+            except Exception as e:
+                logger.error(f"Error en loop de monitoreo: {e}")
+                time.sleep(0.5)  # Pausa en caso de error
+    
+    def _sampling_monitoring_loop(self) -> None:
+        """Muestrea el último chunk cada 50 ms (modo legado)."""
+        while self._is_running:
+            try:
+                # Obtener último chunk de audio
+                latest = self.source.get_latest_chunk()
+                
+                if latest is not None:
+                    seq, audio_chunk = latest
+                    self._process_frames(seq, audio_chunk.reshape(1, -1))
+                
+                # Control de CPU - evitar busy loop
+                time.sleep(0.05)
+                
+            except Exception as e:
+                logger.error(f"Error en loop de monitoreo: {e}")
+                time.sleep(0.5)  # Pausa en caso de error
+    
+    def _process_frames(self, first_seq: int, frames: npt.NDArray[np.int16]) -> None:
+        """
+        Analiza un lote de chunks consecutivos en una sola pasada.
+        
+        Args:
+            first_seq: Secuencia del primer chunk del lote
+            frames: Vista 2-D (chunks × muestras) del ring buffer
+        """
+        # Una copia vectorizada separa los canales; cada uno se analiza como un lote
+        latest: List[FeatureFrame] = []
+        for channel, channel_frames in enumerate(deinterleave(frames, self.audio_config.channels)):
+            features = self.analyzers[channel].extract_features(channel_frames)
+            for offset, chunk_features in enumerate(features):
+                self._process_features(channel, first_seq + offset, chunk_features)
+            latest.append(features[-1])
+            
+            if self.rollups is not None:
+                rows = self.rollups.add(channel, first_seq, channel_frames, features)
+                if rows:
+                    with self._rollup_lock:
+                        self._rollup_rows.extend(rows)
+        self._stats.chunks_analyzed += len(frames)
+        
+        # El lote queda decidido recién tras el último canal; una racha de detecciones
+        # abierta todavía puede fechar un disparo en sus primeros chunks
+        self._analyzed_seq = first_seq + len(frames) - max(self._onset_runs)
+        
+        # Visualización en consola (limitada a ~10 Hz): el canal más fuerte
+        now = time.monotonic()
+        if self._show_progress and now - self._last_display_time >= 0.1:
+            self._last_display_time = now
+            channel = max(range(len(latest)), key=lambda c: latest[c].volume)
+            label = self.channel_labels[channel] if len(latest) > 1 else None
+            self._display_metrics(channel, latest[channel].volume, latest[channel].frequency, label)
+    
+    def _process_features(self, channel: int, seq: int, features: FeatureFrame) -> None:
+        """
+        Actualiza la máquina de estados de alertas de un canal para un chunk.
+        
+        Args:
+            channel: Canal de audio
+            seq: Secuencia del chunk en el ring buffer
+            features: Features del chunk en ese canal
+        """
+        analyzer = self.analyzers[channel]
+        volume, frequency = features.volume, features.frequency
+        self._clock_seq = seq
+        
+        event = self._active_events[channel]
+        if event is not None:
+            if self._segmentation.enabled:
+                # Histéresis: el episodio sigue mientras el chunk supere el umbral de salida
+                if analyzer.sustains_event(features):
+                    self._extend_alert(event, volume, frequency, seq, analyzer.continues_event(features))
+            elif analyzer.continues_event(features):
+                # Evento abierto: los nuevos disparos lo extienden en lugar de descartarse
+                self._extend_alert(event, volume, frequency, seq)
+        elif analyzer.should_trigger_on(features):
+            self._onset_runs[channel] += 1
+            run = self._onset_runs[channel]
+            if not self._segmentation.enabled or run >= self._segmentation.onset_chunks:
+                self._onset_runs[channel] = 0
+                self._handle_alert(channel, volume, frequency, seq - run + 1)
+        else:
+            self._onset_runs[channel] = 0
+        
+        # Cerrar el evento cuando ya se capturó todo su audio posterior
+        event = self._active_events[channel]
+        if event is not None and seq >= event.end_seq - 1:
+            self._finalize_alert(event)
+    
+    def get_monitor_stats(self) -> MonitorStats:
+        """
+        Obtiene las métricas de cobertura: chunks analizados vs capturados.
+        
+        Returns:
+            Snapshot de MonitorStats
+        """
+        captured = self.source.get_write_sequence() - self._start_seq
+        return replace(self._stats, chunks_captured=max(captured, 0))
+    
+    def get_alert_counts(self) -> List[int]:
+        """
+        Obtiene las alertas disparadas por canal desde el arranque.
+        
+        Returns:
+            Lista de contadores en el orden de ``channel_labels``
+        """
+        return list(self._alert_counts)
+    
+    def is_healthy(self) -> bool:
+        """
+        Indica si el monitor está corriendo y recibe audio.
+        
+        Returns:
+            True si el último chunk llegó hace menos de 5 s (o la fuente se agotó)
+        """
+        if not self._is_running:
+            return False
+        if self.source.is_exhausted:
+            return True
+        published = self.source.publish_time(self.source.get_write_sequence() - 1)
+        return published is not None and time.monotonic() - published < 5.0
+    
+    def get_threshold_stats(self) -> List[Optional[ThresholdStats]]:
+        """
+        Obtiene los umbrales RMS/ZCR vigentes de cada canal.
+        
+        Returns:
+            Lista en el orden de ``channel_labels`` (None si el analizador
+            del canal no decide por umbrales RMS/ZCR)
+        """
+        return [
+            analyzer.get_threshold_stats() if isinstance(analyzer, SimpleAudioAnalyzer) else None
+            for analyzer in self.analyzers
+        ]
+    
+    def get_latency_stats(self) -> List[StageLatencyStats]:
+        """
+        Obtiene la latencia de los eventos por etapa, del sonido a la base de datos.
+        
+        Returns:
+            Lista de StageLatencyStats (etapas en orden y el total)
+        """
+        return self.latency.get_stats()
+    
+    def get_upload_stats(self) -> Optional[UploadStats]:
+        """
+        Obtiene las métricas del pool de subidas a Supabase.
+        
+        Returns:
+            Snapshot de UploadStats o None si Supabase no está configurado
+        """
+        if self._upload_pool is None:
+            return None
+        return self._upload_pool.get_stats()
+    
+    def get_disk_stats(self) -> DiskStats:
+        """
+        Obtiene la telemetría de disco (espacio libre, clips y pendientes de subida).
+        
+        Returns:
+            Snapshot de DiskStats
+        """
+        return self.retention.get_disk_stats()
+    
+    def _display_metrics(
+        self,
+        channel: int,
+        volume: float,
+        frequency: float,
+        label: Optional[str] = None
+    ) -> None:
+        """
+        Muestra métricas en consola.
+        
+        Args:
+            channel: Canal mostrado
+            volume: Métrica de volumen
+            frequency: Métrica de frecuencia
+            label: Canal mostrado (None = captura de un canal)
+        """
+        # Barras visuales
+        vol_bar = "█" * min(int(volume / 20), 20)
+        freq_bar = "▒" * min(int(frequency / 5), 20)
         
-        return None
+        # Estado
+        status = "..."
+        analyzer = self.analyzers[channel]
+        if isinstance(analyzer, SimpleAudioAnalyzer):
+            rms_threshold, zcr_threshold = analyzer.current_thresholds()
+        else:
+            rms_threshold, zcr_threshold = self.analysis_config.rms_threshold, self.analysis_config.zcr_threshold
+        if volume > rms_threshold and frequency > zcr_threshold:
+            status = "!!! DETECTADO !!!"
+        
+        prefix = f"[{label}] " if label else ""
+        print(
+            f"\r{prefix}Vol:{int(volume):04d} |{vol_bar:<20}| "
+            f"Frq:{int(frequency):03d} |{freq_bar:<20}| {status}",
+            end='',
+            flush=True
+        )
     
-    def list_available_devices(self) -> None:
-        """Lista todos los dispositivos de entrada de audio disponibles."""
-        logger.info("=== DISPOSITIVOS DE AUDIO DISPONIBLES ===")
+    def _upload_audio_to_storage(self, local_filepath: str, storage_path: str) -> Optional[str]:
+        """
+        Sube el archivo de audio a Supabase Storage.
         
-        if not self._audio_interface:
-            self._audio_interface = pyaudio.PyAudio()
+        Args:
+            local_filepath: Ruta local del archivo
+            storage_path: Ruta en el bucket (device_id/timestamp.flac)
+            
+        Returns:
+            URL pública del archivo o None si falla
+        """
+        if not self.supabase:
+            return None
         
         try:
-            host_api_info = self._audio_interface.get_host_api_info_by_index(0)
-            num_devices = host_api_info.get('deviceCount', 0)
+            # Subir a Supabase Storage: el cuerpo se lee del archivo por bloques
+            logger.info(f"📤 Subiendo audio a Storage: {storage_path}")
+            
+            with open(local_filepath, 'rb') as audio_file:
+                self._storage_bucket.upload(
+                    path=storage_path,
+                    file=audio_file,
+                    file_options={
+                        "content-type": CLIP_CONTENT_TYPES.get(os.path.splitext(local_filepath)[1], "audio/wav"),
+                        "upsert": "true"  # Reintentos idempotentes
+                    }
+                )
+            
+            # Obtener URL pública
+            public_url = self._storage_bucket.get_public_url(storage_path)
+            
+            logger.info("✓ Audio subido exitosamente")
+            logger.info(f"  URL: {public_url[:60]}...")
+            
+            return public_url
             
-            for i in range(num_devices):
-                device_info = self._audio_interface.get_device_info_by_host_api_device_index(0, i)
-                if device_info.get('maxInputChannels', 0) > 0:
-                    device_name = device_info.get('name')
-                    # Marcar el dispositivo seleccionado
-                    marker = " [SELECCIONADO]" if i == self._resolved_device_index else ""
-                    logger.info(f"  ID {i}: {device_name}{marker}")
         except Exception as e:
-            logger.error(f"Error listando dispositivos: {e}")
-        
-        logger.info("=========================================")
+            logger.error(f"✗ Error subiendo audio a Storage: {e}")
+            return None
     
-    def start(self) -> None:
+    def _enqueue_alert(self, event: AlertEvent, local_filepath: Optional[str]) -> None:
         """
-        Inicia la captura de audio con reintentos automáticos.
-        Auto-detecta el micrófono del iPhone si está disponible.
+        Registra la alerta en el outbox persistente para enviarla a Supabase.
         
-        Raises:
-            RuntimeError: Si no se puede iniciar después de todos los reintentos
+        El evento queda confirmado en disco antes de cualquier intento de red;
+        el thread de drenado sube el clip y lo inserta cuando haya conexión.
+        
+        Args:
+            event: Evento cerrado (su traza de latencia llega hasta ``save``)
+            local_filepath: Ruta local del archivo de audio guardado (None =
+                el clip falló y el evento va sin audio)
         """
-        # Auto-detectar dispositivo si no está especificado
-        if self._resolved_device_index is None:
-            logger.info("Auto-detectando dispositivo de audio...")
-            
-            # Si prefiere iPhone, buscarlo primero
-            if self.config.prefer_iphone:
-                device_id = self._find_device_by_name(["iPhone", "iPad"])
-                if device_id is not None:
-                    self._resolved_device_index = device_id
-                    logger.info(f"→ Usando micrófono del iPhone/iPad (ID: {device_id})")
-                else:
-                    logger.warning("⚠ iPhone/iPad no encontrado, usando micrófono por defecto del Mac")
-                    # device_index = None usará el default
-            else:
-                logger.info("→ Usando micrófono por defecto del sistema")
+        channel, volume, frequency = event.channel, event.volume, event.frequency
+        timestamp, trace = event.timestamp, event.trace
+        
+        # Confidence como porcentaje normalizado del RMS
+        confidence = min(volume / 1000.0, 1.0)
+        pen_id = self.channel_labels[channel]
+        label = f"_{pen_id}" if len(self.channel_labels) > 1 else ""
+        storage_path = None
+        if local_filepath is not None:
+            storage_path = f"{DEVICE_ID}/{timestamp}{label}{os.path.splitext(local_filepath)[1]}"
         
-        # Intentar iniciar con reintentos
-        for attempt in range(1, self._max_reconnect_attempts + 1):
+        # Marcas de tiempo del reloj de muestras: el disparo y los bordes del clip,
+        # no el momento en que se encola o se sube
+        chunk_time = self.source.chunk_time
+        
+        # Audio perdido dentro del clip (el clip salta ese tramo)
+        gaps = [
+            {
+                "started_at": gap.started_at.isoformat(),
+                "duration_seconds": round(gap.duration_seconds, 3),
+                "cause": gap.cause
+            }
+            for gap in self.source.get_capture_gaps(max(event.start_seq, 0), event.end_seq)
+        ]
+        
+        # Datos del evento (MULTI-TENANT); el id local hace idempotente el reintento
+        event_data = {
+            "id": str(uuid.uuid4()),
+            "created_at": chunk_time(event.trigger_seq).isoformat(),
+            "device_id": DEVICE_ID,
+            "farm_id": FARM_ID,
+            "alert_type": "noise_threshold",
+            "confidence": float(confidence),
+            "metadata": {
+                "rms": float(volume),
+                "zcr": float(frequency),
+                "rms_mean": round(event.volume_mean, 2),
+                "zcr_mean": round(event.frequency_mean, 2),
+                "duration_seconds": round(self._event_duration(event), 3),
+                "trigger_count": event.trigger_count,
+                "trigger_sample": event.trigger_seq * self.audio_config.chunk_size,
+                "clip_started_at": chunk_time(max(event.start_seq, 0)).isoformat(),
+                "clip_ended_at": chunk_time(event.end_seq).isoformat(),
+                "capture_gaps": gaps,
+                "channel": channel,
+                "pen_id": pen_id,
+                "audio_file_local": local_filepath,
+                "codec": self.encoder.codec,
+                "sample_rate": self.encoder.output_rate,
+                "audio_url": None,
+                "storage_path": None,
+                "latency_ms": trace_latencies_ms(trace or {})
+            }
+        }
+        
+        if trace:
+            with self._outbox_lock:
+                self._event_traces[event_data["id"]] = trace
+        self.outbox.enqueue(event_data, local_filepath, storage_path)
+        self._outbox_wakeup.set()
+    
+    def _outbox_drain_loop(self) -> None:
+        """Envía los eventos del outbox a Supabase (thread separado)."""
+        while not self._outbox_stop.is_set():
             try:
-                self._initialize_audio_stream()
-                self._is_capturing = True
-                self._capture_thread = threading.Thread(
-                    target=self._capture_loop,
-                    daemon=True,
-                    name="AudioCaptureThread"
-                )
-                self._capture_thread.start()
-                logger.info("✓ Captura de audio iniciada correctamente")
-                return
-                
+                wait = self._drain_outbox_once()
+                if self.rollups is not None:
+                    wait = min(wait, self._drain_rollups_once())
+                if self.segments is not None:
+                    wait = min(wait, self._drain_segments_once())
             except Exception as e:
-                logger.error(f"Intento {attempt}/{self._max_reconnect_attempts} falló: {e}")
-                
-                if attempt < self._max_reconnect_attempts:
-                    logger.info(f"Reintentando en {self._reconnect_delay}s...")
-                    time.sleep(self._reconnect_delay)
-                else:
-                    raise RuntimeError(
-                        f"No se pudo iniciar la captura después de {self._max_reconnect_attempts} intentos"
-                    )
+                logger.error(f"✗ Error drenando el outbox: {e}")
+                wait = self.outbox.config.base_backoff_seconds
+            
+            # Una alerta nueva despierta el thread antes de que termine la espera
+            self._outbox_wakeup.wait(timeout=wait)
+            self._outbox_wakeup.clear()
     
-    def _initialize_audio_stream(self) -> None:
-        """Inicializa PyAudio y abre el stream de audio."""
-        if not self._audio_interface:
-            self._audio_interface = pyaudio.PyAudio()
+    def _drain_outbox_once(self) -> float:
+        """
+        Ejecuta un ciclo de drenado: despacha al pool hasta
+        ``max_uploads_per_cycle`` subidas de clips y un insert en bloque de los
+        eventos listos (hasta ``batch_size``).
         
-        self._stream = self._audio_interface.open(
-            format=self.config.format,
-            channels=self.config.channels,
-            rate=self.config.sample_rate,
-            input=True,
-            input_device_index=self._resolved_device_index,
-            frames_per_buffer=self.config.chunk_size
-        )
+        El trabajo por ciclo está acotado para que un atraso grande no compita
+        con las alertas en vivo, que siempre se toman primero y con prioridad
+        en la cola del pool.
+        
+        Returns:
+            Segundos a esperar antes del próximo ciclo
+        """
+        config = self.outbox.config
+        with self._outbox_lock:
+            in_flight = set(self._outbox_in_flight)
+        items = [
+            item for item in self.outbox.fetch_due(config.batch_size + len(in_flight))
+            if item.item_id not in in_flight
+        ][:config.batch_size]
+        
+        if not items:
+            next_due = self.outbox.next_due_time()
+            if next_due is None or in_flight:
+                return 60.0  # Lo despierta una alerta nueva o una request terminada
+            return max(config.drain_interval_seconds, next_due - time.time())
+        
+        ready: List[OutboxItem] = []
+        uploads = 0
+        for item in items:
+            if item.clip_path is not None and item.audio_url is None:
+                if not os.path.exists(item.clip_path):
+                    logger.warning(f"⚠ Clip no encontrado, se envía el evento sin audio: {item.clip_path}")
+                    self.outbox.mark_uploaded(item.item_id, None)
+                    item.clip_path = item.storage_path = None
+                else:
+                    # El evento se inserta en un ciclo posterior, con la URL del clip
+                    if uploads < config.max_uploads_per_cycle:
+                        if self._dispatch_outbox_task([item], self._upload_outbox_item, upload=True):
+                            uploads += 1
+                        else:
+                            uploads = config.max_uploads_per_cycle  # Cola llena
+                    continue
+            ready.append(item)
+        
+        if ready:
+            self._dispatch_outbox_task(ready, self._insert_outbox_items, upload=False)
+        
+        return config.drain_interval_seconds
     
-    def _capture_loop(self) -> None:
-        """Loop principal de captura (ejecutado en thread separado)."""
-        consecutive_errors = 0
-        max_consecutive_errors = 10
+    def _store_rollups(self) -> None:
+        """Pasa los resúmenes acumulados en memoria al outbox (una transacción)."""
+        with self._rollup_lock:
+            rows, self._rollup_rows = self._rollup_rows, []
+        if not rows:
+            return
+        dropped = self.outbox.enqueue_rollups(rows, self.rollup_config.max_pending_rows)
+        if dropped:
+            logger.warning(f"⚠ {dropped} resúmenes acústicos descartados (tope del outbox sin conexión)")
+    
+    def _drain_rollups_once(self) -> float:
+        """
+        Envía los resúmenes acústicos en un insert en bloque cada ``upload_interval_seconds``.
         
-        while self._is_capturing:
+        Los resúmenes esperan en memoria hasta el envío y entonces pasan al
+        outbox, de modo que la tarjeta SD se escribe una vez por intervalo; si
+        el insert falla quedan ahí para el próximo intervalo.
+        
+        Returns:
+            Segundos hasta el próximo envío
+        """
+        config = self.rollup_config
+        due = self._last_rollup_upload + config.upload_interval_seconds
+        now = time.monotonic()
+        if now < due or self._rollups_in_flight:
+            return max(due - now, self.outbox.config.drain_interval_seconds)
+        
+        self._last_rollup_upload = now
+        self._store_rollups()
+        row_ids, rows = self.outbox.fetch_rollups(config.batch_size)
+        if not rows:
+            return config.upload_interval_seconds
+        
+        self._rollups_in_flight = True
+        
+        def run() -> bool:
             try:
-                # Leer chunk de audio
-                audio_data = self._stream.read(
-                    self.config.chunk_size,
-                    exception_on_overflow=False
-                )
-                
-                with self._lock:
-                    # Actualizar buffer en tiempo real
-                    self._realtime_buffer.append(audio_data)
-                    
-                    # Si está grabando, acumular frames
-                    if self._is_recording:
-                        self._recording_frames.append(audio_data)
-                
-                # Reset contador de errores
-                consecutive_errors = 0
-                
-            except Exception as e:
-                consecutive_errors += 1
-                logger.warning(f"Error en captura (#{consecutive_errors}): {e}")
-                
-                if consecutive_errors >= max_consecutive_errors:
-                    logger.error("Demasiados errores consecutivos. Intentando reconectar...")
-                    self._attempt_reconnection()
-                    consecutive_errors = 0
-                
-                time.sleep(0.1)  # Evitar busy loop en caso de error
+                return self._insert_rollups(row_ids, rows)
+            finally:
+                self._rollups_in_flight = False
+                self._outbox_wakeup.set()
+        
+        # Prioridad más baja del pool: detrás de eventos en vivo y atraso
+        if not self._upload_pool.submit(run, priority=4):
+            self._rollups_in_flight = False
+            self._last_rollup_upload = now - config.upload_interval_seconds  # Reintento próximo ciclo
+        return config.upload_interval_seconds
     
-    def _attempt_reconnection(self) -> None:
-        """Intenta reconectar el stream de audio."""
-        try:
-            logger.info("Cerrando stream actual...")
-            if self._stream:
-                self._stream.stop_stream()
-                self._stream.close()
-            
-            logger.info("Reinicializando audio...")
-            time.sleep(1.0)
-            self._initialize_audio_stream()
-            logger.info("Reconexión exitosa")
+    def _insert_rollups(self, row_ids: List[int], rows: List[dict]) -> bool:
+        """
+        Inserta en bloque resúmenes acústicos del outbox (worker del pool).
+        
+        Args:
+            row_ids: Identificadores locales de las filas
+            rows: Filas para la tabla acoustic_rollups
             
+        Returns:
+            True si el insert tuvo éxito
+        """
+        try:
+            # Upsert ignorando duplicados: un reintento tras un corte no duplica filas
+            self.supabase.table("acoustic_rollups").upsert(rows, ignore_duplicates=True).execute()
         except Exception as e:
-            logger.error(f"Fallo en reconexión: {e}")
+            logger.error(f"✗ Error insertando resúmenes acústicos en Supabase: {e}")
+            return False
+        
+        self.outbox.remove_rollups(row_ids)
+        logger.info(f"✓ {len(rows)} resúmenes acústicos registrados en base de datos")
+        
+        # Atraso acumulado sin conexión: el siguiente bloque sale en el próximo ciclo
+        if self.outbox.pending_rollup_count():
+            self._last_rollup_upload -= self.rollup_config.upload_interval_seconds
+        return True
     
-    def get_latest_audio_chunk(self) -> Optional[bytes]:
+    def _drain_segments_once(self) -> float:
         """
-        Obtiene el último chunk de audio capturado.
+        Sube un segmento continuo si no hay eventos esperando y el presupuesto alcanza.
+        
+        Las alertas siempre van primero: con eventos en el outbox los
+        segmentos esperan, y en el pool tienen la prioridad más baja.
         
         Returns:
-            Datos de audio o None si no hay disponibles
+            Segundos hasta el próximo intento
         """
-        with self._lock:
-            if self._realtime_buffer:
-                return self._realtime_buffer[0]
-            return None
-    
-    def start_recording(self) -> None:
-        """Inicia la grabación de audio."""
-        with self._lock:
-            self._recording_frames = []
-            self._is_recording = True
-        logger.debug("Grabación iniciada")
+        if self.outbox.pending_count():
+            return 30.0
+        upload = self.segments.next_upload()
+        if upload is None:
+            return 60.0
+        path, row = upload
+        
+        def run() -> bool:
+            uploaded = False
+            try:
+                uploaded = self._upload_segment(path, row)
+                return uploaded
+            finally:
+                self.segments.finish_upload(path, uploaded)
+                self._outbox_wakeup.set()  # El siguiente segmento sale sin esperar el ciclo
+        
+        if not self._upload_pool.submit(run, priority=5):
+            self.segments.finish_upload(path, False)
+        return 60.0
     
-    def stop_recording_and_save(self, filepath: str) -> str:
+    def _upload_segment(self, path: str, row: dict) -> bool:
         """
-        Detiene la grabación y guarda el archivo WAV.
+        Sube un segmento continuo a Storage y lo registra en audio_segments (worker del pool).
         
         Args:
-            filepath: Ruta donde guardar el archivo
+            path: Ruta local del segmento
+            row: Fila para la tabla audio_segments (sin URL)
             
         Returns:
-            Ruta del archivo guardado
+            True si la subida y el insert tuvieron éxito
         """
-        with self._lock:
-            self._is_recording = False
-            frames_to_save = self._recording_frames.copy()
+        storage_path = f"{DEVICE_ID}/segmentos/{os.path.basename(path)}"
+        audio_url = self._upload_audio_to_storage(path, storage_path)
+        if audio_url is None:
+            return False
         
-        # Guardar archivo WAV
         try:
-            with wave.open(filepath, 'wb') as wav_file:
-                wav_file.setnchannels(self.config.channels)
-                wav_file.setsampwidth(
-                    self._audio_interface.get_sample_size(self.config.format)
-                )
-                wav_file.setframerate(self.config.sample_rate)
-                wav_file.writeframes(b''.join(frames_to_save))
-            
-            logger.info(f"Audio guardado: {filepath}")
-            return filepath
-            
+            # Upsert ignorando duplicados: reintentar tras un corte no duplica la fila
+            self.supabase.table("audio_segments").upsert(
+                [dict(row, audio_url=audio_url, storage_path=storage_path)],
+                ignore_duplicates=True
+            ).execute()
         except Exception as e:
-            logger.error(f"Error guardando audio: {e}")
-            raise
+            logger.error(f"✗ Error registrando segmento continuo en Supabase: {e}")
+            return False
+        
+        logger.info(f"✓ Segmento continuo subido: {storage_path}")
+        return True
     
-    def stop(self) -> None:
-        """Detiene la captura de audio y libera recursos."""
-        logger.info("Deteniendo captura de audio...")
-        self._is_capturing = False
+    def _dispatch_outbox_task(
+        self,
+        items: List[OutboxItem],
+        task: Callable[[List[OutboxItem]], bool],
+        upload: bool
+    ) -> bool:
+        """
+        Envía una request del outbox al pool de subidas.
         
-        if self._capture_thread and self._capture_thread.is_alive():
-            self._capture_thread.join(timeout=2.0)
+        Prioridad: eventos en vivo antes que atraso, inserts antes que subidas.
         
-        if self._stream:
-            try:
-                self._stream.stop_stream()
-                self._stream.close()
-            except Exception as e:
-                logger.warning(f"Error cerrando stream: {e}")
+        Args:
+            items: Eventos que cubre la request
+            task: Función que ejecuta la request
+            upload: True para subidas de clips, False para inserts
+            
+        Returns:
+            True si el pool aceptó la tarea
+        """
+        is_live = any(item.attempts == 0 for item in items)
+        priority = (0 if is_live else 2) + (1 if upload else 0)
+        item_ids = [item.item_id for item in items]
         
-        if self._audio_interface:
+        with self._outbox_lock:
+            self._outbox_in_flight.update(item_ids)
+        
+        def run() -> bool:
             try:
-                self._audio_interface.terminate()
-            except Exception as e:
-                logger.warning(f"Error terminando PyAudio: {e}")
+                return task(items)
+            finally:
+                with self._outbox_lock:
+                    self._outbox_in_flight.difference_update(item_ids)
+                self._outbox_wakeup.set()
         
-        logger.info("Captura de audio detenida")
-
-
-# ========== CAPA DE COORDINACIÓN: MONITOR PRINCIPAL ==========
-
-class BioacousticMonitor:
-    """
-    Monitor principal que coordina captura, análisis y grabación.
-    """
+        if self._upload_pool.submit(run, priority):
+            return True
+        
+        with self._outbox_lock:
+            self._outbox_in_flight.difference_update(item_ids)
+        return False
     
-    def __init__(
-        self,
-        audio_config: AudioConfig,
-        analysis_config: AnalysisConfig,
-        recording_config: RecordingConfig,
-        analyzer: Optional[AudioAnalyzer] = None,
-        supabase_client: Optional[Client] = None
-    ):
+    def _upload_outbox_item(self, items: List[OutboxItem]) -> bool:
         """
-        Inicializa el monitor bioacústico.
+        Sube el clip de un evento del outbox (worker del pool).
         
         Args:
-            audio_config: Configuración de captura de audio
-            analysis_config: Configuración de análisis
-            recording_config: Configuración de grabación
-            analyzer: Analizador de audio (si None, usa SimpleAudioAnalyzer)
-            supabase_client: Cliente de Supabase para logging en la nube
+            items: Lista con el evento cuyo clip se sube
+            
+        Returns:
+            True si la subida tuvo éxito
         """
-        self.audio_config = audio_config
-        self.analysis_config = analysis_config
-        self.recording_config = recording_config
+        item = items[0]
+        audio_url = self._upload_audio_to_storage(item.clip_path, item.storage_path)
+        if audio_url is None:
+            retry_in = self.outbox.reschedule(items, "upload failed")
+            logger.warning(f"⚠ Clip sin subir; reintento en {retry_in:.0f}s")
+            return False
+        
+        self.outbox.mark_uploaded(item.item_id, audio_url)
+        self.retention.mark_uploaded(item.clip_path)
+        
+        with self._outbox_lock:
+            trace = self._event_traces.get(item.event_data["id"])
+        if trace is not None:
+            self.latency.mark(trace, "upload")
+        return True
+    
+    def _insert_outbox_items(self, items: List[OutboxItem]) -> bool:
+        """
+        Inserta en bloque eventos del outbox (worker del pool).
+        
+        Args:
+            items: Eventos listos (sin clip o con el clip ya subido)
+            
+        Returns:
+            True si el insert tuvo éxito
+        """
+        sent_at = time.monotonic()
+        with self._outbox_lock:
+            traces = [self._event_traces.get(item.event_data["id"]) for item in items]
+        
+        rows = []
+        for item, trace in zip(items, traces):
+            row = dict(item.event_data)
+            row["metadata"] = dict(
+                row["metadata"],
+                audio_url=item.audio_url,
+                storage_path=item.storage_path if item.audio_url else None
+            )
+            if trace is not None:
+                # La fila no puede incluir su propio insert: la etapa llega hasta el envío
+                row["metadata"]["latency_ms"] = trace_latencies_ms(dict(trace, insert=sent_at))
+            rows.append(row)
+        
+        try:
+            # Upsert ignorando duplicados: un reintento tras un corte no duplica eventos
+            self.supabase.table("events").upsert(rows, ignore_duplicates=True).execute()
+        except Exception as e:
+            logger.error(f"✗ Error insertando eventos en Supabase: {e}")
+            retry_in = self.outbox.reschedule(items, str(e))
+            logger.warning(
+                f"⚠ {len(items)} eventos sin enviar; reintento en {retry_in:.0f}s "
+                f"({self.outbox.pending_count()} pendientes en el outbox)"
+            )
+            return False
+        
+        self.outbox.remove([item.item_id for item in items])
+        logger.info(f"✓ {len(items)} eventos registrados en base de datos")
+        
+        inserted_at = time.monotonic()
+        for item, trace in zip(items, traces):
+            if trace is not None:
+                self.latency.mark(trace, "insert", inserted_at)
+        with self._outbox_lock:
+            for item in items:
+                self._event_traces.pop(item.event_data["id"], None)
+        
+        # Hay conexión: el atraso en backoff se drena ya, en ciclos acotados
+        next_due = self.outbox.next_due_time()
+        if next_due is not None and next_due > time.time():
+            self.outbox.release_backlog()
+        return True
+    
+    def _handle_alert(self, channel: int, volume: float, frequency: float, trigger_seq: int) -> None:
+        """
+        Abre un evento de alerta sin bloquear el análisis.
         
-        # Componentes
-        self.microphone = MicrophoneCapture(audio_config)
-        self.analyzer = analyzer or SimpleAudioAnalyzer(analysis_config)
-        self.supabase = supabase_client
+        El clip cubre ``pre_trigger_seconds`` de historial antes del chunk que
+        disparó la alerta y ``duration_seconds`` después; el audio posterior se
+        sigue capturando mientras la detección continúa.
         
-        # Estado
-        self._is_running: bool = False
-        self._is_processing_alert: bool = False
+        Args:
+            channel: Canal (corral) que disparó la alerta
+            volume: Métrica de volumen que disparó la alerta
+            frequency: Métrica de frecuencia que disparó la alerta
+            trigger_seq: Secuencia del chunk que disparó la alerta
+        """
+        where = f" en {self.channel_labels[channel]}" if len(self.channel_labels) > 1 else ""
+        logger.info(f"\n>>> ALERTA DETECTADA{where} (Vol:{int(volume)}, Freq:{int(frequency)})")
+        logger.info(
+            f"Grabando {self.recording_config.pre_trigger_seconds:g}s previos + "
+            f"{self.recording_config.duration_seconds}s posteriores..."
+        )
         
-        # Crear directorio de grabaciones
-        os.makedirs(recording_config.output_directory, exist_ok=True)
+        # Con onset_chunks > 1 el episodio empieza en la primera detección de la racha,
+        # pero se abre en el chunk en análisis
+        seq = self._clock_seq
+        start_seq = trigger_seq - self._pre_roll_chunks
+        event = AlertEvent(
+            trigger_seq=trigger_seq,
+            start_seq=start_seq,
+            end_seq=self._post_trigger_end(start_seq, seq),
+            volume=volume,
+            frequency=frequency,
+            timestamp=self.source.chunk_time(trigger_seq).astimezone().strftime("%Y-%m-%d_%H-%M-%S"),
+            channel=channel,
+            last_active_seq=seq,
+            volume_sum=volume,
+            frequency_sum=frequency
+        )
+        onset = self.source.chunk_onset(trigger_seq)
+        published = self.source.publish_time(trigger_seq)
+        if onset is not None and published is not None:
+            event.trace["onset"] = onset
+            self.latency.mark(event.trace, "capture", published)
+        self.latency.mark(event.trace, "analysis")
+        self._active_events[channel] = event
+        self._alert_counts[channel] += 1
+        if self.segments is not None:
+            self.segments.mark_hit(channel, trigger_seq)
+        self.source.hold(id(event), start_seq)  # Pre-roll retenido hasta que lo escriba el clip
+        
+        # El clip empieza a escribirse ya: pre-roll ahora, el resto al llegar
+        self._alert_queue.put(("open", event))
     
-    def start(self) -> None:
-        """Inicia el sistema de monitoreo."""
-        logger.info("=" * 50)
-        logger.info("Sistema de Monitoreo Bioacústico v0.8 (Multi-Tenant)")
-        logger.info("=" * 50)
-        logger.info(f"Granja: {FARM_ID[:8]}...{FARM_ID[-4:]}")
-        logger.info(f"Dispositivo: {DEVICE_ID}")
+    def _post_trigger_end(self, start_seq: int, trigger_seq: int) -> int:
+        """
+        Calcula el fin del clip tras un chunk activo, acotado al largo máximo del evento.
         
-        # Listar dispositivos disponibles
-        self.microphone.list_available_devices()
+        El tope es ``max_event_seconds`` con segmentación y ``max_clip_seconds`` sin ella.
         
-        try:
-            # Iniciar captura
-            self.microphone.start()
-            self._is_running = True
-            
-            logger.info("Modo recolección de datos activo")
-            logger.info(f"Directorio de grabaciones: ./{self.recording_config.output_directory}/")
-            logger.info("Presiona Ctrl+C para detener\n")
-            
-            # Loop principal de monitoreo
-            self._monitoring_loop()
+        Args:
+            start_seq: Primer chunk del clip
+            trigger_seq: Secuencia del chunk activo
             
-        except KeyboardInterrupt:
-            logger.info("\nInterrupción recibida. Apagando sistema...")
-        except Exception as e:
-            logger.error(f"Error crítico: {e}", exc_info=True)
-        finally:
-            self._shutdown()
+        Returns:
+            Secuencia de fin del clip (exclusive)
+        """
+        end_seq = trigger_seq + 1 + self.source.seconds_to_chunks(
+            self.recording_config.duration_seconds
+        )
+        return min(end_seq, start_seq + self._max_event_chunks)
     
-    def _monitoring_loop(self) -> None:
-        """Loop principal de monitoreo y análisis."""
-        while self._is_running:
-            try:
-                # Si estamos procesando una alerta, esperamos
-                if self._is_processing_alert:
-                    time.sleep(0.1)
-                    continue
-                
-                # Obtener último chunk de audio
-                audio_chunk = self.microphone.get_latest_audio_chunk()
-                
-                if audio_chunk:
-                    # Analizar audio
-                    volume, frequency = self.analyzer.analyze(audio_chunk)
-                    
-                    # Visualización en consola
-                    self._display_metrics(volume, frequency)
-                    
-                    # Verificar si debe disparar alerta
-                    if self.analyzer.should_trigger_alert(volume, frequency):
-                        self._handle_alert(volume, frequency)
-                
-                # Control de CPU - evitar busy loop
-                time.sleep(0.05)
-                
-            except Exception as e:
-                logger.error(f"Error en loop de monitoreo: {e}")
-                time.sleep(0.5)  # Pausa en caso de error
+    def _extend_alert(
+        self,
+        event: AlertEvent,
+        volume: float,
+        frequency: float,
+        seq: int,
+        triggered: bool = True
+    ) -> None:
+        """
+        Suma un chunk activo al evento abierto.
+        
+        Args:
+            event: Evento abierto
+            volume: Métrica de volumen del chunk
+            frequency: Métrica de frecuencia del chunk
+            seq: Secuencia del chunk
+            triggered: Si el chunk superó también el umbral de entrada (cuenta como disparo)
+        """
+        event.end_seq = max(event.end_seq, self._post_trigger_end(event.start_seq, seq))
+        event.last_active_seq = seq
+        event.active_chunks += 1
+        event.volume_sum += volume
+        event.frequency_sum += frequency
+        if triggered:
+            event.trigger_count += 1
+            self._stats.triggers_merged += 1
+        if volume > event.volume:
+            event.volume = volume
+            event.frequency = frequency
     
-    def _display_metrics(self, volume: float, frequency: float) -> None:
+    def _finalize_alert(self, event: AlertEvent) -> None:
         """
-        Muestra métricas en consola.
+        Cierra el evento: su ``end_seq`` queda fijo y el writer completa el clip.
         
         Args:
-            volume: Métrica de volumen
-            frequency: Métrica de frecuencia
+            event: Evento a cerrar
         """
-        # Barras visuales
-        vol_bar = "█" * min(int(volume / 20), 20)
-        freq_bar = "▒" * min(int(frequency / 5), 20)
+        self._active_events[event.channel] = None
+        self.latency.mark(event.trace, "recording")
         
-        # Estado
-        status = "..."
-        if (volume > self.analysis_config.rms_threshold and 
-            frequency > self.analysis_config.zcr_threshold):
-            status = "!!! DETECTADO !!!"
+        if event.trigger_count > 1:
+            logger.info(
+                f"\nEpisodio de {self._event_duration(event):.1f}s: {event.trigger_count} disparos "
+                f"fusionados (RMS pico {event.volume:.0f}, medio {event.volume_mean:.0f})"
+            )
         
-        print(
-            f"\rVol:{int(volume):04d} |{vol_bar:<20}| "
-            f"Frq:{int(frequency):03d} |{freq_bar:<20}| {status}",
-            end='',
-            flush=True
-        )
+        self._alert_queue.put(("close", event))
     
-    def _upload_audio_to_storage(self, local_filepath: str, timestamp: str) -> Optional[str]:
+    def _event_duration(self, event: AlertEvent) -> float:
         """
-        Sube el archivo de audio a Supabase Storage.
+        Duración del episodio, del primer disparo al último chunk activo (sin pre/post-roll).
         
         Args:
-            local_filepath: Ruta local del archivo
-            timestamp: Timestamp para el nombre del archivo
+            event: Evento de alerta
             
         Returns:
-            URL pública del archivo o None si falla
+            Duración en segundos
         """
-        if not self.supabase:
-            return None
+        return (event.last_active_seq - event.trigger_seq + 1) * self._chunk_seconds
+    
+    def _alert_writer_loop(self) -> None:
+        """
+        Escribe los clips en disco a medida que llega el audio (thread separado).
         
-        try:
-            # Construir ruta en el bucket: device_id/timestamp.wav
-            storage_path = f"{DEVICE_ID}/{timestamp}.wav"
-            
-            # Leer el archivo
-            with open(local_filepath, 'rb') as audio_file:
-                audio_data = audio_file.read()
-            
-            # Subir a Supabase Storage
-            logger.info(f"📤 Subiendo audio a Storage: {storage_path}")
-            
-            self.supabase.storage.from_("alerts").upload(
-                path=storage_path,
-                file=audio_data,
-                file_options={"content-type": "audio/wav"}
-            )
-            
-            # Obtener URL pública
-            public_url = self.supabase.storage.from_("alerts").get_public_url(storage_path)
+        Con eventos abiertos (uno por canal como máximo), cada 100 ms agrega a
+        cada archivo los chunks nuevos (vistas del ring buffer, sin copias
+        intermedias); al cerrar un evento, completa su clip y lo registra en
+        el outbox. Si el clip de un canal falla, ese evento se registra igual,
+        sin audio, y los demás canales siguen grabando.
+        """
+        # Canal -> (evento, clip abierto o None si falló, próximo chunk a escribir)
+        open_clips: Dict[int, Tuple[AlertEvent, Optional[ClipWriter], int]] = {}
+        
+        while True:
+            try:
+                command = self._alert_queue.get(timeout=0.1 if open_clips else None)
+            except queue.Empty:
+                command = ("write", None)
             
-            logger.info("✓ Audio subido exitosamente")
-            logger.info(f"  URL: {public_url[:60]}...")
+            if command is None:
+                for event, writer, _ in open_clips.values():
+                    self._close_clip(event, writer)
+                break
             
-            return public_url
+            kind, command_event = command
+            try:
+                if kind == "open":
+                    channel = command_event.channel
+                    if channel in open_clips:
+                        self._close_clip(*open_clips.pop(channel)[:2])
+                    open_clips[channel] = (
+                        command_event, self._open_clip(command_event), command_event.start_seq
+                    )
+                
+                for channel, (event, writer, next_seq) in list(open_clips.items()):
+                    if writer is not None:
+                        try:
+                            next_seq = self._write_clip_chunks(writer, event, next_seq)
+                        except Exception as e:
+                            logger.error(
+                                f"✗ Error escribiendo el clip de {self.channel_labels[channel]}: {e} "
+                                "(el evento se enviará sin audio)"
+                            )
+                            self._discard_clip(event, writer)
+                            writer = None
+                        open_clips[channel] = (event, writer, next_seq)
+                    if kind == "close" and command_event is event:
+                        del open_clips[channel]
+                        self._close_clip(event, writer)
+                        
+            except Exception as e:
+                logger.error(f"Error manejando alerta: {e}")
+    
+    def _open_clip(self, event: AlertEvent) -> Optional[ClipWriter]:
+        """
+        Abre el archivo del clip de un evento recién disparado.
+        
+        Args:
+            event: Evento abierto
             
+        Returns:
+            Clip listo para escribir, o None si no se pudo crear (el evento
+            se registrará sin audio)
+        """
+        try:
+            self.retention.enforce()  # Lugar en la SD antes de escribir
+            return ClipWriter(self.encoder, self._clip_filepath(event))
         except Exception as e:
-            logger.error(f"✗ Error subiendo audio a Storage: {e}")
+            logger.error(f"✗ Error creando el clip de la alerta: {e} (el evento se enviará sin audio)")
+            self.source.release(id(event))
             return None
     
-    def _send_alert_to_supabase_async(
-        self, 
-        volume: float, 
-        frequency: float, 
-        local_filepath: str,
-        timestamp: str
-    ) -> None:
+    def _discard_clip(self, event: AlertEvent, writer: ClipWriter) -> None:
         """
-        Sube el audio a Storage y envía los datos de la alerta a Supabase.
-        Se ejecuta en un thread separado para no bloquear la captura.
+        Descarta un clip fallido y libera el audio que retenía.
         
         Args:
-            volume: Métrica de volumen
-            frequency: Métrica de frecuencia
-            local_filepath: Ruta local del archivo de audio guardado
-            timestamp: Timestamp del evento
+            event: Evento del clip
+            writer: Clip a medio escribir
         """
-        if not self.supabase:
-            logger.warning("⚠ Supabase no configurado, solo se guardó localmente")
-            return
-        
+        self.source.release(id(event))
         try:
-            # 1. Subir archivo a Storage
-            audio_url = self._upload_audio_to_storage(local_filepath, timestamp)
-            
-            # 2. Calcular confidence como porcentaje normalizado del RMS
-            confidence = min(volume / 1000.0, 1.0)  # Normalizar a 0-1
-            
-            # 3. Preparar datos del evento (MULTI-TENANT)
-            event_data = {
-                "created_at": datetime.now().isoformat(),
-                "device_id": DEVICE_ID,
-                "farm_id": FARM_ID,  # ← NUEVO: Vinculación a la granja
-                "alert_type": "noise_threshold",
-                "confidence": float(confidence),
-                "metadata": {
-                    "rms": float(volume),
-                    "zcr": float(frequency),
-                    "audio_file_local": local_filepath,
-                    "audio_url": audio_url if audio_url else None,
-                    "storage_path": f"{DEVICE_ID}/{timestamp}.wav" if audio_url else None
-                }
-            }
-            
-            # 4. Insertar evento en la base de datos
-            response = self.supabase.table("events").insert(event_data).execute()
-            
-            event_id = response.data[0].get('id', 'N/A') if response.data else 'N/A'
-            logger.info(f"✓ Evento registrado en base de datos (ID: {event_id})")
-            
-            if audio_url:
-                logger.info("✓ Sistema completo: Audio en nube + Registro en BD")
-            else:
-                logger.warning("⚠ Audio no subido, pero evento registrado (solo archivo local)")
-            
+            writer.abort()
         except Exception as e:
-            logger.error(f"✗ Error en proceso de Supabase: {e}")
-            logger.info(f"  → Archivo local conservado: {local_filepath}")
+            logger.warning(f"⚠ No se pudo descartar el clip incompleto: {e}")
     
-    def _handle_alert(self, volume: float, frequency: float) -> None:
+    def _clip_filepath(self, event: AlertEvent) -> str:
         """
-        Maneja una alerta: graba audio y registra el evento.
+        Ruta local del clip de un evento.
         
         Args:
-            volume: Métrica de volumen que disparó la alerta
-            frequency: Métrica de frecuencia que disparó la alerta
+            event: Evento de alerta
+            
+        Returns:
+            Ruta en el directorio de grabaciones
         """
-        self._is_processing_alert = True
-        
-        logger.info(f"\n>>> ALERTA DETECTADA (Vol:{int(volume)}, Freq:{int(frequency)})")
-        logger.info(f"Grabando {self.recording_config.duration_seconds} segundos...")
+        label = f"_{self.channel_labels[event.channel]}" if len(self.channel_labels) > 1 else ""
+        filename = (
+            f"alerta_{event.timestamp}{label}_vol{int(event.volume)}_freq{int(event.frequency)}"
+            f"{self.encoder.extension}"
+        )
+        return os.path.join(self.recording_config.output_directory, filename)
+    
+    def _write_clip_chunks(self, writer: ClipWriter, event: AlertEvent, next_seq: int) -> int:
+        """
+        Agrega al clip los chunks ya capturados hasta el fin actual del evento.
         
-        try:
-            # Iniciar grabación
-            self.microphone.start_recording()
-            
-            # Esperar duración de grabación con feedback visual
-            for _ in range(self.recording_config.duration_seconds * 10):
-                time.sleep(0.1)
-                print(".", end='', flush=True)
-            
-            # Generar nombre de archivo con timestamp
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            filename = f"alerta_{timestamp}_vol{int(volume)}_freq{int(frequency)}.wav"
-            filepath = os.path.join(
-                self.recording_config.output_directory,
-                filename
-            )
-            
-            # Guardar grabación localmente
-            saved_path = self.microphone.stop_recording_and_save(filepath)
-            logger.info(f"\n[OK] Archivo guardado localmente: {saved_path}")
+        Args:
+            writer: Clip abierto
+            event: Evento del clip (``end_seq`` puede crecer mientras siga abierto)
+            next_seq: Próximo chunk a escribir
             
-            # Subir a Supabase de forma asíncrona (Storage + Database)
-            # Esto NO bloquea el monitoreo, se ejecuta en paralelo
-            if self.supabase:
-                upload_thread = threading.Thread(
-                    target=self._send_alert_to_supabase_async,
-                    args=(volume, frequency, saved_path, timestamp),
-                    daemon=True,
-                    name="SupabaseUploadThread"
+        Returns:
+            Próximo chunk a escribir tras esta llamada
+        """
+        end_seq = event.end_seq
+        channels = self.audio_config.channels
+        for first_seq, frames in self.source.iter_chunks(next_seq, end_seq):
+            count = len(frames)  # Chunks del bloque (antes de separar el canal)
+            if channels > 1:
+                # Vista estridada del canal del evento (sin copiar el bloque entero)
+                frames = frames.reshape(-1, channels)[:, event.channel]
+            if first_seq > max(next_seq, 0):
+                logger.warning(
+                    f"⚠ Se perdieron {first_seq - max(next_seq, 0)} chunks del clip "
+                    "(historial del ring buffer sobrescrito)"
                 )
-                upload_thread.start()
-                logger.info("🔄 Subida a Supabase en segundo plano...")
+            writer.write(frames)
+            next_seq = first_seq + count
+        self.source.hold(id(event), next_seq)
+        return next_seq
+    
+    def _close_clip(self, event: AlertEvent, writer: Optional[ClipWriter]) -> None:
+        """
+        Cierra el clip de un evento y lo envía a Supabase vía outbox.
+        
+        Args:
+            event: Evento cerrado
+            writer: Clip del evento, ya completo (None = el clip falló; el
+                evento se envía sin audio)
+        """
+        saved_path = None
+        if writer is not None:
+            self.source.release(id(event))
+            try:
+                # El nombre final refleja el disparo más fuerte del evento
+                saved_path = writer.close(self._clip_filepath(event))
+            except Exception as e:
+                logger.error(f"✗ Error guardando el clip: {e} (el evento se enviará sin audio)")
+                self._discard_clip(event, writer)
             else:
-                logger.info("ℹ️  Supabase no configurado - solo guardado local")
-            
-        except Exception as e:
-            logger.error(f"Error manejando alerta: {e}")
-        finally:
-            logger.info("Reanudando monitoreo...\n")
-            time.sleep(0.5)  # Pausa breve antes de reanudar
-            self._is_processing_alert = False
+                self.retention.register(saved_path)
+                logger.info(f"\n[OK] Archivo guardado localmente: {saved_path}")
+        self.latency.mark(event.trace, "save")
+        
+        # Registrar en el outbox; el thread de drenado sube clip y evento
+        if self.outbox is not None:
+            self._enqueue_alert(event, saved_path)
+            logger.info("🔄 Evento en el outbox, subida a Supabase en segundo plano...")
+        else:
+            logger.info("ℹ️  Supabase no configurado - solo guardado local")
     
     def _shutdown(self) -> None:
         """Apaga el sistema de forma ordenada."""
         logger.info("Iniciando apagado del sistema...")
         self._is_running = False
-        self.microphone.stop()
+        if self.metrics is not None:
+            self.metrics.close()
+        
+        # Guardar los eventos abiertos con el audio disponible hasta ahora
+        for event in self._active_events:
+            if event is not None:
+                event.end_seq = self.source.get_write_sequence()
+                self._finalize_alert(event)
+        
+        if self._alert_writer_thread and self._alert_writer_thread.is_alive():
+            self._alert_queue.put(None)
+            self._alert_writer_thread.join(timeout=5.0)
+        
+        if self.segments is not None:
+            # El segmento parcial se guarda; se sube en el próximo arranque
+            self.segments.close()
+            segment_stats = self.segments.get_stats()
+            logger.info(
+                f"Segmentos continuos: {segment_stats.segments_written} grabados "
+                f"({segment_stats.segments_with_hits} con disparos, {segment_stats.bytes_written / 1e6:.1f} MB), "
+                f"{segment_stats.segments_uploaded} subidos, {segment_stats.chunks_lost} chunks perdidos"
+            )
+        
+        if self._outbox_thread and self._outbox_thread.is_alive():
+            self._outbox_stop.set()
+            self._outbox_wakeup.set()
+            self._outbox_thread.join(timeout=5.0)
+        
+        workers_done = True
+        if self._upload_pool is not None:
+            workers_done = self._upload_pool.close(timeout=10.0)
+            upload_stats = self._upload_pool.get_stats()
+            logger.info(
+                f"Subidas: {upload_stats.completed} ok / {upload_stats.failed} fallidas / "
+                f"{upload_stats.rejected} rechazadas por cola llena, "
+                f"latencia p50 {upload_stats.latency_p50_ms:.0f} ms / p99 {upload_stats.latency_p99_ms:.0f} ms"
+            )
+        
+        if self.outbox is not None and workers_done and not (
+            self._outbox_thread and self._outbox_thread.is_alive()
+        ):
+            pending = self.outbox.pending_count()
+            if pending:
+                logger.info(f"📦 Outbox: {pending} eventos pendientes para el próximo arranque")
+            if self.rollups is not None:
+                # Períodos parciales incluidos: se envían en el próximo arranque
+                with self._rollup_lock:
+                    self._rollup_rows.extend(self.rollups.flush())
+                self._store_rollups()
+                pending_rollups = self.outbox.pending_rollup_count()
+                if pending_rollups:
+                    logger.info(f"📦 Outbox: {pending_rollups} resúmenes acústicos pendientes")
+            self.outbox.close()
+        
+        disk = self.retention.get_disk_stats()
+        logger.info(
+            f"Disco: {disk.disk_free_bytes / 1e9:.2f} GB libres, {disk.clip_count} clips "
+            f"({disk.clip_bytes / 1e6:.1f} MB, {disk.pending_upload_count} sin subir), "
+            f"{disk.evicted_count} borrados por retención"
+        )
+        if workers_done:
+            self.retention.close()
+            if self.segments is not None:
+                self.segments.retention.close()
+        
+        self.source.stop()
+        for analyzer in self.analyzers:
+            analyzer.close()
+        if self.model is not None:
+            self.model.close()
+        
+        stats = self.source.get_capture_stats()
+        logger.info(
+            f"Captura: {stats.chunks_captured} chunks, {stats.overflow_count} overflows, "
+            f"{stats.dropped_frames} frames perdidos, {stats.reconnections} reconexiones"
+            + (f", {stats.process_restarts} reinicios del proceso de captura" if stats.process_restarts else "")
+        )
+        clock = self.source.get_clock_stats()
+        if clock is not None and clock.anchored:
+            logger.info(
+                f"Reloj de muestras: {clock.samples_counted} muestras, deriva {clock.drift_ppm:+.1f} ppm, "
+                f"{clock.resyncs} reanclajes ({clock.adc_chunks} chunks con tiempo ADC)"
+            )
+        gap_totals = self.source.get_gap_totals()
+        if gap_totals:
+            logger.info("Huecos de captura: " + ", ".join(
+                f"{cause} {count} ({seconds:.1f}s)" for cause, (count, seconds) in sorted(gap_totals.items())
+            ))
+        
+        coverage = self.get_monitor_stats()
+        logger.info(
+            f"Análisis: {coverage.chunks_analyzed}/{coverage.chunks_captured} chunks "
+            f"({coverage.coverage:.1%} de cobertura, {coverage.chunks_skipped} omitidos), "
+            f"{sum(self._alert_counts)} eventos con {coverage.triggers_merged} disparos fusionados"
+        )
+        
+        for label, thresholds in zip(self.channel_labels, self.get_threshold_stats()):
+            if thresholds is None or not thresholds.adaptive:
+                continue
+            prefix = f"[{label}] " if len(self.analyzers) > 1 else ""
+            if not thresholds.warmed_up:
+                logger.info(f"{prefix}Umbrales adaptativos sin calentar: rigieron los fijos")
+                continue
+            logger.info(
+                f"{prefix}Piso de ruido: RMS {thresholds.rms_floor:.0f} / ZCR {thresholds.zcr_floor:.0f} "
+                f"({thresholds.floor_seconds:.0f}s de historia) → umbrales "
+                f"RMS {thresholds.rms_threshold:.0f} / ZCR {thresholds.zcr_threshold:.0f}"
+            )
+        
+        for label, analyzer in zip(self.channel_labels, self.analyzers):
+            if not isinstance(analyzer, CascadeAnalyzer):
+                continue
+            prefix = f"[{label}] " if len(self.analyzers) > 1 else ""
+            for stage in analyzer.get_stage_stats():
+                logger.info(
+                    f"{prefix}Etapa {stage.name}: {stage.passed}/{stage.evaluated} "
+                    f"({stage.pass_rate:.1%}), CPU {stage.cpu_seconds:.2f}s"
+                )
+            logger.info(f"{prefix}CPU ahorrada por la cascada: ~{analyzer.estimated_cpu_saved():.2f}s")
+        
+        model = self.model
+        if model is None and isinstance(self.analyzer, CascadeAnalyzer):
+            model = self.analyzer.model
+        if isinstance(model, ModelAnalyzer):
+            model_stats = model.get_model_stats()
+            logger.info(
+                f"Modelo: {model_stats.completed}/{model_stats.requests} ventanas, "
+                f"batch medio {model_stats.mean_batch_size:.1f}, "
+                f"latencia p50 {model_stats.latency_p50_ms:.1f} ms / p99 {model_stats.latency_p99_ms:.1f} ms"
+            )
+        
+        for stage in self.get_latency_stats():
+            if stage.count:
+                logger.info(
+                    f"Latencia {stage.stage}: {stage.count} eventos, "
+                    f"p50 {stage.p50_ms:.0f} ms / p99 {stage.p99_ms:.0f} ms / máx {stage.max_ms:.0f} ms"
+                )
         logger.info("Sistema detenido correctamente")
 
 
+# ========== ENDPOINT LOCAL DE MÉTRICAS (PROMETHEUS) ==========
+
+def process_rss_bytes() -> int:
+    """
+    Memoria residente actual del proceso.
+    
+    Returns:
+        Bytes residentes (en sistemas sin /proc, el máximo histórico)
+    """
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _escape_label(value: object) -> str:
+    """Escapa un valor de label según el formato de texto de Prometheus."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class PrometheusText:
+    """Acumula métricas en el formato de texto de Prometheus (v0.0.4)."""
+    
+    def __init__(self):
+        self._lines: List[str] = []
+    
+    def add(
+        self,
+        name: str,
+        kind: str,
+        help_text: str,
+        samples: Sequence[Tuple[Dict[str, object], float]]
+    ) -> None:
+        """
+        Agrega una métrica con sus muestras.
+        
+        Args:
+            name: Nombre de la métrica
+            kind: "counter", "gauge", "summary" o "histogram"
+            help_text: Descripción (línea HELP)
+            samples: Pares (labels, valor); en histogramas el nombre de cada
+                serie lleva su sufijo en el label especial ``__name__``
+        """
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            labels = dict(labels)
+            series = labels.pop("__name__", name)
+            if labels:
+                rendered = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+                series = f"{series}{{{rendered}}}"
+            rendered_value = str(value) if isinstance(value, int) else f"{float(value):.10g}"
+            self._lines.append(f"{series} {rendered_value}")
+    
+    def render(self) -> bytes:
+        """Retorna el documento completo, listo para responder."""
+        return ("\n".join(self._lines) + "\n").encode("utf-8")
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Responde ``/metrics`` (Prometheus) y ``/health`` (para systemd o un watchdog)."""
+    
+    server: "_MetricsHTTPServer"
+    
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] == "/metrics":
+            status = 200
+            body = self.server.metrics.render()
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?")[0] == "/health":
+            healthy = self.server.metrics.monitor.is_healthy()
+            status = 200 if healthy else 503
+            body = b"ok\n" if healthy else b"unhealthy\n"
+            content_type = "text/plain; charset=utf-8"
+        else:
+            status, body, content_type = 404, b"not found\n", "text/plain; charset=utf-8"
+        
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format: str, *args) -> None:
+        """Sin log por request: el colector consulta cada pocos segundos."""
+        pass
+
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer con la referencia al MetricsServer que lo atiende."""
+    daemon_threads = True
+    metrics: "MetricsServer"
+
+
+class MetricsServer:
+    """
+    Endpoint HTTP local con las métricas del monitor en formato Prometheus.
+    
+    Cada scrape solo lee snapshots que el monitor ya mantiene (contadores y
+    percentiles bajo locks cortos); lo que consulta disco o SQLite (espacio
+    libre, clips, outbox) se cachea ``slow_metrics_seconds``. Así un colector
+    local puede consultar cada pocos segundos sin afectar la captura, que
+    además corre en su propio thread o proceso.
+    """
+    
+    def __init__(self, monitor: "BioacousticMonitor", config: MetricsConfig):
+        """
+        Prepara el endpoint (no abre el puerto hasta ``start``).
+        
+        Args:
+            monitor: Monitor cuyas métricas se exponen
+            config: Configuración del endpoint
+        """
+        self.monitor = monitor
+        self.config = config
+        self._server: Optional[_MetricsHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._slow_lock = threading.Lock()
+        self._slow_cache: Optional[Tuple[float, DiskStats, Optional[int], Optional[int]]] = None
+    
+    def start(self) -> None:
+        """Abre el puerto y atiende requests en un thread separado (sin puerto, sigue sin métricas)."""
+        try:
+            self._server = _MetricsHTTPServer((self.config.host, self.config.port), _MetricsRequestHandler)
+        except OSError as e:
+            logger.warning(f"⚠ Endpoint de métricas desactivado ({self.config.host}:{self.config.port}): {e}")
+            return
+        self._server.metrics = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.5},
+            daemon=True,
+            name="MetricsServerThread"
+        )
+        self._thread.start()
+        host, port = self._server.server_address[:2]
+        logger.info(f"📈 Métricas en http://{host}:{port}/metrics")
+    
+    @property
+    def port(self) -> Optional[int]:
+        """Puerto efectivo (útil con ``port=0``) o None si no arrancó."""
+        return self._server.server_address[1] if self._server is not None else None
+    
+    def _slow_metrics(self) -> Tuple[DiskStats, Optional[int], Optional[int]]:
+        """
+        Telemetría de disco y del outbox, cacheada entre scrapes.
+        
+        Returns:
+            Tuple (DiskStats, eventos y resúmenes pendientes en el outbox, o
+            None sin Supabase)
+        """
+        with self._slow_lock:
+            now = time.monotonic()
+            if self._slow_cache is None or now - self._slow_cache[0] >= self.config.slow_metrics_seconds:
+                outbox = self.monitor.outbox
+                self._slow_cache = (
+                    now,
+                    self.monitor.get_disk_stats(),
+                    outbox.pending_count() if outbox is not None else None,
+                    outbox.pending_rollup_count() if outbox is not None else None
+                )
+            return self._slow_cache[1:]
+    
+    def render(self) -> bytes:
+        """
+        Arma el documento de métricas.
+        
+        Returns:
+            Texto en formato Prometheus, codificado en UTF-8
+        """
+        monitor = self.monitor
+        text = PrometheusText()
+        
+        text.add("axis_edge_info", "gauge", "Identidad del dispositivo.", [
+            ({"device_id": DEVICE_ID, "farm_id": FARM_ID}, 1)
+        ])
+        
+        capture = monitor.source.get_capture_stats()
+        text.add("axis_edge_chunks_captured_total", "counter", "Chunks publicados por la fuente de audio.", [
+            ({}, capture.chunks_captured)
+        ])
+        coverage = monitor.get_monitor_stats()
+        text.add("axis_edge_chunks_analyzed_total", "counter", "Chunks analizados.", [
+            ({}, coverage.chunks_analyzed)
+        ])
+        text.add("axis_edge_chunks_skipped_total", "counter", "Chunks sobrescritos antes de analizarse.", [
+            ({}, coverage.chunks_skipped)
+        ])
+        text.add("axis_edge_capture_overflows_total", "counter", "Overflows del buffer de entrada.", [
+            ({}, capture.overflow_count)
+        ])
+        text.add("axis_edge_capture_dropped_frames_total", "counter", "Frames de audio perdidos.", [
+            ({}, capture.dropped_frames)
+        ])
+        text.add("axis_edge_capture_read_errors_total", "counter", "Errores de lectura del stream.", [
+            ({}, capture.read_errors)
+        ])
+        text.add("axis_edge_capture_reconnections_total", "counter", "Reconexiones del micrófono.", [
+            ({}, capture.reconnections)
+        ])
+        text.add("axis_edge_capture_process_restarts_total", "counter", "Reinicios del proceso de captura.", [
+            ({}, capture.process_restarts)
+        ])
+        clock = monitor.source.get_clock_stats()
+        if clock is not None:
+            text.add("axis_edge_clock_drift_ppm", "gauge", "Deriva estimada del reloj ADC respecto del sistema.", [
+                ({}, round(clock.drift_ppm, 3))
+            ])
+            text.add("axis_edge_clock_resyncs_total", "counter", "Reanclajes del reloj de muestras.", [
+                ({}, clock.resyncs)
+            ])
+        gap_totals = monitor.source.get_gap_totals()
+        text.add("axis_edge_capture_gaps_total", "counter", "Huecos de audio capturado por causa.", [
+            ({"cause": cause}, gap_totals.get(cause, (0, 0.0))[0]) for cause in CAPTURE_GAP_CAUSES
+        ])
+        text.add("axis_edge_capture_gap_seconds_total", "counter", "Segundos de audio perdidos por causa.", [
+            ({"cause": cause}, round(gap_totals.get(cause, (0, 0.0))[1], 3)) for cause in CAPTURE_GAP_CAUSES
+        ])
+        text.add("axis_edge_alerts_total", "counter", "Alertas disparadas por corral.", [
+            ({"pen_id": label}, count)
+            for label, count in zip(monitor.channel_labels, monitor.get_alert_counts())
+        ])
+        text.add("axis_edge_triggers_merged_total", "counter", "Disparos absorbidos por un evento abierto.", [
+            ({}, coverage.triggers_merged)
+        ])
+        
+        thresholds = [
+            (label, stats)
+            for label, stats in zip(monitor.channel_labels, monitor.get_threshold_stats())
+            if stats is not None
+        ]
+        if thresholds:
+            text.add("axis_edge_detection_threshold", "gauge", "Umbral de disparo vigente por corral y métrica.", [
+                sample
+                for label, stats in thresholds
+                for sample in (
+                    ({"pen_id": label, "metric": "rms"}, stats.rms_threshold),
+                    ({"pen_id": label, "metric": "zcr"}, stats.zcr_threshold),
+                )
+            ])
+            floors = [(label, stats) for label, stats in thresholds if stats.rms_floor is not None]
+            if floors:
+                text.add("axis_edge_noise_floor", "gauge", "Piso de ruido aprendido por corral y métrica.", [
+                    sample
+                    for label, stats in floors
+                    for sample in (
+                        ({"pen_id": label, "metric": "rms"}, stats.rms_floor),
+                        ({"pen_id": label, "metric": "zcr"}, stats.zcr_floor),
+                    )
+                ])
+        
+        upload = monitor.get_upload_stats()
+        disk, pending, pending_rollups = self._slow_metrics()
+        if pending is not None:
+            text.add("axis_edge_outbox_pending_events", "gauge", "Eventos en el outbox sin enviar.", [
+                ({}, pending)
+            ])
+            text.add("axis_edge_outbox_pending_rollups", "gauge", "Resúmenes acústicos en el outbox sin enviar.", [
+                ({}, pending_rollups)
+            ])
+        if upload is not None:
+            text.add("axis_edge_upload_requests_total", "counter", "Requests a Supabase por resultado.", [
+                ({"result": "completed"}, upload.completed),
+                ({"result": "failed"}, upload.failed),
+                ({"result": "rejected"}, upload.rejected),
+            ])
+            text.add("axis_edge_upload_queue_depth", "gauge", "Tareas en la cola del pool de subidas.", [
+                ({}, upload.queue_depth)
+            ])
+            text.add("axis_edge_upload_in_flight", "gauge", "Requests a Supabase en curso.", [
+                ({}, upload.in_flight)
+            ])
+            text.add(
+                "axis_edge_upload_request_latency_seconds", "summary",
+                "Duración de las requests a Supabase (últimas 512).", [
+                    ({"quantile": "0.5"}, upload.latency_p50_ms / 1000),
+                    ({"quantile": "0.99"}, upload.latency_p99_ms / 1000),
+                ]
+            )
+        
+        samples: List[Tuple[Dict[str, object], float]] = []
+        for stage, histogram in monitor.latency.snapshot().items():
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                samples.append(({"__name__": "axis_edge_event_latency_seconds_bucket", "stage": stage, "le": le}, cumulative))
+            samples.append(({"__name__": "axis_edge_event_latency_seconds_sum", "stage": stage}, histogram.sum))
+            samples.append(({"__name__": "axis_edge_event_latency_seconds_count", "stage": stage}, histogram.count))
+        text.add(
+            "axis_edge_event_latency_seconds", "histogram",
+            "Latencia de los eventos por etapa, del sonido a la base de datos.", samples
+        )
+        
+        text.add("axis_edge_disk_free_bytes", "gauge", "Espacio libre en el disco de grabaciones.", [
+            ({}, disk.disk_free_bytes)
+        ])
+        text.add("axis_edge_disk_total_bytes", "gauge", "Tamaño del disco de grabaciones.", [
+            ({}, disk.disk_total_bytes)
+        ])
+        text.add("axis_edge_clips", "gauge", "Clips en disco por estado de subida.", [
+            ({"state": "uploaded"}, disk.clip_count - disk.pending_upload_count),
+            ({"state": "pending"}, disk.pending_upload_count),
+        ])
+        text.add("axis_edge_clip_bytes", "gauge", "Bytes de clips en disco por estado de subida.", [
+            ({"state": "uploaded"}, disk.clip_bytes - disk.pending_upload_bytes),
+            ({"state": "pending"}, disk.pending_upload_bytes),
+        ])
+        text.add("axis_edge_clips_evicted_total", "counter", "Clips borrados por la retención.", [
+            ({}, disk.evicted_count)
+        ])
+        
+        if monitor.segments is not None:
+            segments = monitor.segments.get_stats()
+            text.add("axis_edge_segments_total", "counter", "Segmentos continuos por estado.", [
+                ({"state": "written"}, segments.segments_written),
+                ({"state": "with_hits"}, segments.segments_with_hits),
+                ({"state": "uploaded"}, segments.segments_uploaded),
+            ])
+            text.add("axis_edge_segment_bytes_total", "counter", "Bytes de segmentos continuos por estado.", [
+                ({"state": "written"}, segments.bytes_written),
+                ({"state": "uploaded"}, segments.bytes_uploaded),
+            ])
+            text.add("axis_edge_segment_chunks_lost_total", "counter", "Chunks que no llegaron a un segmento.", [
+                ({}, segments.chunks_lost)
+            ])
+            text.add("axis_edge_segment_write_cpu_seconds_total", "counter", "CPU de escritura y codificación de segmentos.", [
+                ({}, segments.write_cpu_seconds)
+            ])
+        
+        text.add("process_cpu_seconds_total", "counter", "CPU usada por el proceso (usuario + sistema).", [
+            ({}, time.process_time())
+        ])
+        text.add("process_resident_memory_bytes", "gauge", "Memoria residente del proceso.", [
+            ({}, process_rss_bytes())
+        ])
+        return text.render()
+    
+    def close(self) -> None:
+        """Cierra el puerto y espera al thread del servidor."""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._server = None
+
+
 # ========== PUNTO DE ENTRADA ==========
 
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """
+    Lee los argumentos de línea de comandos.
+    
+    Args:
+        argv: Argumentos (None = ``sys.argv``)
+        
+    Returns:
+        Argumentos parseados
+    """
+    parser = argparse.ArgumentParser(description="Monitor bioacústico AXIS Edge")
+    parser.add_argument(
+        "--replay",
+        metavar="RUTA",
+        help="Reprocesar grabaciones (archivo o directorio WAV/FLAC) en lugar del micrófono"
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="Con --replay, reproducir al ritmo real en lugar de lo más rápido posible"
+    )
+    parser.add_argument(
+        "--continuous",
+        action="store_true",
+        help="Grabar todo el audio en segmentos de 60 s (dataset), además de los clips de alerta"
+    )
+    parser.add_argument(
+        "--adaptive-thresholds",
+        action="store_true",
+        help="Umbrales RMS/ZCR relativos al piso de ruido aprendido de cada corral"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=MetricsConfig.port,
+        metavar="PUERTO",
+        help=f"Puerto local de métricas Prometheus (por defecto: {MetricsConfig.port}; 0 = desactivado)"
+    )
+    return parser.parse_args(argv)
+
+
 def main() -> None:
     """Punto de entrada principal de la aplicación."""
+    args = parse_args()
+    
     # Configuraciones
     audio_cfg = AudioConfig()
-    analysis_cfg = AnalysisConfig()
-    recording_cfg = RecordingConfig()
+    analysis_cfg = AnalysisConfig(use_adaptive_thresholds=args.adaptive_thresholds)
+    recording_cfg = RecordingConfig(continuous=args.continuous)
+    outbox_cfg = OutboxConfig()
+    retention_cfg = RetentionConfig()
+    metrics_cfg = MetricsConfig(port=args.metrics_port) if args.metrics_port else None
+    rollup_cfg = RollupConfig()
+    
+    # Fuente de audio: micrófono en vivo o grabaciones existentes
+    source = None
+    if args.replay:
+        audio_cfg = WavReplaySource.config_for(args.replay, audio_cfg)
+        source = WavReplaySource(audio_cfg, args.replay, realtime=args.realtime)
     
     # Inicializar Supabase
     supabase_client = initialize_supabase()
@@ -846,7 +7624,12 @@ def main() -> None:
         audio_config=audio_cfg,
         analysis_config=analysis_cfg,
         recording_config=recording_cfg,
-        supabase_client=supabase_client
+        supabase_client=supabase_client,
+        outbox_config=outbox_cfg,
+        retention_config=retention_cfg,
+        source=source,
+        metrics_config=metrics_cfg,
+        rollup_config=rollup_cfg
     )
     
     monitor.start()
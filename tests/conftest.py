@@ -0,0 +1,73 @@
+"""
+Configuración común de los tests.
+
+main.py exige FARM_ID al importarse; los tests usan una granja ficticia y
+trabajan en un directorio temporal.
+"""
+
+import os
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("FARM_ID", "00000000-0000-0000-0000-000000000000")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+SAMPLE_RATE = 48000
+CHUNK_SIZE = 1024
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Cada test corre en su propio directorio (grabaciones, outbox, índices)."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def write_wav(path: str, audio: np.ndarray) -> None:
+    """
+    Escribe una grabación WAV de 16 bits a SAMPLE_RATE.
+    
+    Args:
+        path: Ruta del archivo
+        audio: Muestras int16 (frames,) o (frames, canales)
+    """
+    audio = audio.reshape(len(audio), -1)
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(audio.shape[1])
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(np.ascontiguousarray(audio, dtype=np.int16).tobytes())
+
+
+def run_replay(
+    path: str,
+    analysis_config: "main.AnalysisConfig",
+    recording_config: "main.RecordingConfig"
+) -> "main.BioacousticMonitor":
+    """
+    Ejecuta el monitor completo sobre una grabación hasta agotarla.
+    
+    Args:
+        path: Archivo de audio
+        analysis_config: Configuración de análisis
+        recording_config: Configuración de grabación de clips
+        
+    Returns:
+        Monitor ya detenido
+    """
+    audio_config = main.WavReplaySource.config_for(path, main.AudioConfig())
+    monitor = main.BioacousticMonitor(
+        audio_config,
+        analysis_config,
+        recording_config,
+        source=main.WavReplaySource(audio_config, path)
+    )
+    monitor._display_metrics = lambda *args: None
+    monitor.start()
+    return monitor
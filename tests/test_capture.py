@@ -0,0 +1,81 @@
+"""Supervisión de la captura en modo bloqueante (stream simulado, sin PortAudio)."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import main
+
+
+CHUNK_SECONDS = main.AudioConfig.chunk_size / main.AudioConfig.sample_rate
+
+
+class _FakeStream:
+    """Stream bloqueante a tiempo real; con ``hang`` el read no retorna hasta ``release``."""
+    
+    def __init__(self, hang_after: int = -1):
+        self.hang_after = hang_after
+        self.release = threading.Event()
+        self.reads = 0
+        self._due = time.monotonic()
+    
+    def read(self, frames: int, exception_on_overflow: bool = False) -> bytes:
+        self.reads += 1
+        if self.reads == self.hang_after:
+            self.release.wait()  # Driver colgado: ni cerrar el stream lo destraba
+        self._due += CHUNK_SECONDS
+        time.sleep(max(0.0, self._due - time.monotonic()))
+        return np.zeros(frames, dtype=np.int16).tobytes()
+    
+    def is_active(self) -> bool:
+        return True
+    
+    def stop_stream(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def streams(monkeypatch):
+    """El primer stream se cuelga a los 20 chunks; los siguientes funcionan."""
+    opened = []
+    
+    class FakePyAudio:
+        def open(self, **kwargs):
+            opened.append(_FakeStream(hang_after=20 if not opened else -1))
+            return opened[-1]
+        
+        def terminate(self):
+            pass
+    
+    monkeypatch.setattr(main.pyaudio, "PyAudio", FakePyAudio)
+    return opened
+
+
+def test_hung_blocking_read_is_replaced(streams):
+    capture = main.MicrophoneCapture(main.AudioConfig(
+        use_callback=False, prefer_iphone=False, stall_timeout_seconds=0.2
+    ))
+    capture.start()
+    try:
+        deadline = time.monotonic() + 5.0
+        while capture.get_capture_stats().reconnections == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        seq = capture.get_write_sequence()
+        time.sleep(1.0)  # El reloj de muestras confirma el hueco tras medio segundo
+        assert capture.get_write_sequence() > seq  # El lector nuevo entrega audio
+        
+        # El read colgado retorna tarde: su chunk no se publica
+        captured = capture.get_capture_stats().chunks_captured
+        streams[0].release.set()
+        time.sleep(0.1)
+        stats = capture.get_capture_stats()
+        assert stats.reconnections == 1
+        assert streams[1].reads >= stats.chunks_captured - captured
+        assert [gap.cause for gap in capture.get_capture_gaps(0, capture.get_write_sequence())] == ["stall"]
+    finally:
+        capture.stop()
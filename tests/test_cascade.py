@@ -0,0 +1,54 @@
+"""Cascada de análisis: la STFT en streaming solo solapa chunks contiguos."""
+
+import numpy as np
+import pytest
+
+import main
+from conftest import CHUNK_SIZE, SAMPLE_RATE
+
+
+def _chunks(seed: int, count: int, amplitude: float) -> np.ndarray:
+    """Chunks int16 de ruido con un tono, de ``amplitude`` de pico."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(count * CHUNK_SIZE) / SAMPLE_RATE
+    audio = amplitude * (0.6 * np.sin(2 * np.pi * 3000 * t) + 0.4 * rng.uniform(-1, 1, len(t)))
+    return audio.astype(np.int16).reshape(count, CHUNK_SIZE)
+
+
+def _spectral(features: list) -> np.ndarray:
+    """Centroide, planitud y bandas mel de cada chunk, en una fila por chunk."""
+    return np.array([
+        [f.spectral_centroid, f.spectral_flatness, *f.band_energies.tolist()]
+        for f in features
+    ])
+
+
+def _cascade() -> "main.CascadeAnalyzer":
+    return main.CascadeAnalyzer(main.AnalysisConfig(use_cascade=True), SAMPLE_RATE)
+
+
+def test_gap_in_gate_restarts_the_stft():
+    loud_a, loud_b = _chunks(1, 4, 8000), _chunks(2, 4, 8000)
+    quiet = np.zeros((3, CHUNK_SIZE), dtype=np.int16)
+    features = _cascade().extract_features(np.concatenate([loud_a, quiet, loud_b]))
+    
+    assert [f.stages_passed for f in features[4:7]] == [0, 0, 0]
+    # El tramo posterior al hueco no arrastra el solape del tramo anterior
+    assert _spectral(features[7:]) == pytest.approx(_spectral(_cascade().extract_features(loud_b)))
+    assert _spectral(features[:4]) == pytest.approx(_spectral(_cascade().extract_features(loud_a)))
+
+
+def test_run_spanning_batches_keeps_the_overlap():
+    loud = _chunks(3, 8, 8000)
+    whole = _cascade().extract_features(loud)
+    
+    split = _cascade()
+    features = split.extract_features(loud[:5]) + split.extract_features(loud[5:])
+    assert _spectral(features) == pytest.approx(_spectral(whole))
+    
+    # Con un chunk silencioso al final del lote, el siguiente lote arranca de cero
+    gap = _cascade()
+    gap.extract_features(np.concatenate([loud[:5], np.zeros((1, CHUNK_SIZE), dtype=np.int16)]))
+    assert _spectral(gap.extract_features(loud[5:])) == pytest.approx(
+        _spectral(_cascade().extract_features(loud[5:]))
+    )
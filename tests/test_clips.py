@@ -0,0 +1,112 @@
+"""Clips de alerta escritos por el monitor a partir de grabaciones reproducidas."""
+
+import os
+import wave
+
+import numpy as np
+
+import main
+from conftest import SAMPLE_RATE, run_replay, write_wav
+
+
+def _burst_recording(path: str, channels: int, channel: int) -> None:
+    """12 s de ruido suave con 2 s fuertes a partir de t = 3 s en un canal."""
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, 5, (12 * SAMPLE_RATE, channels))
+    audio[3 * SAMPLE_RATE:5 * SAMPLE_RATE, channel] = rng.normal(0, 8000, 2 * SAMPLE_RATE)
+    write_wav(path, np.clip(audio, -32768, 32767).astype(np.int16))
+
+
+def _clip_seconds(directory: str) -> list:
+    durations = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".wav"):
+            with wave.open(os.path.join(directory, name), "rb") as wav_file:
+                durations.append(wav_file.getnframes() / wav_file.getframerate())
+    return durations
+
+
+def test_multichannel_clip_keeps_post_roll():
+    recording = main.RecordingConfig(codec="wav", pre_trigger_seconds=1.0, duration_seconds=3)
+    durations = {}
+    for channels, channel in ((1, 0), (4, 2)):
+        path = f"granero_{channels}.wav"
+        _burst_recording(path, channels, channel)
+        directory = f"clips_{channels}"
+        run_replay(path, main.AnalysisConfig(), main.RecordingConfig(
+            output_directory=directory,
+            codec=recording.codec,
+            pre_trigger_seconds=recording.pre_trigger_seconds,
+            duration_seconds=recording.duration_seconds
+        ))
+        durations[channels] = _clip_seconds(directory)
+    
+    # Pre-roll + episodio de 2 s + post-roll, igual con uno o cuatro canales
+    assert len(durations[1]) == len(durations[4]) == 1
+    assert durations[1][0] > 5.5
+    assert abs(durations[4][0] - durations[1][0]) < 2 * 1024 / SAMPLE_RATE
+
+
+def _writer_monitor(workdir) -> "main.BioacousticMonitor":
+    """Monitor de dos canales sin arrancar; los eventos registrados quedan en ``enqueued``."""
+    write_wav("corrales.wav", np.zeros((SAMPLE_RATE, 2), dtype=np.int16))
+    audio_config = main.WavReplaySource.config_for("corrales.wav", main.AudioConfig())
+    monitor = main.BioacousticMonitor(
+        audio_config,
+        main.AnalysisConfig(),
+        main.RecordingConfig(output_directory=str(workdir / "clips"), codec="wav"),
+        source=main.WavReplaySource(audio_config, "corrales.wav")
+    )
+    monitor.enqueued = []
+    monitor.outbox = True  # Solo para que _close_clip registre el evento
+    monitor._enqueue_alert = lambda event, path: monitor.enqueued.append((event.channel, path))
+    return monitor
+
+
+def _run_writer(monitor: "main.BioacousticMonitor") -> None:
+    """Abre y cierra un evento por canal y ejecuta el writer hasta vaciar la cola."""
+    events = [
+        main.AlertEvent(
+            trigger_seq=0, start_seq=0, end_seq=0, volume=900.0, frequency=120.0,
+            timestamp=f"2026-01-01_00-00-0{channel}", channel=channel
+        )
+        for channel in (0, 1)
+    ]
+    for event in events:
+        monitor._alert_queue.put(("open", event))
+    for event in events:
+        monitor._alert_queue.put(("close", event))
+    monitor._alert_queue.put(None)
+    monitor._alert_writer_loop()
+
+
+def test_failed_clip_still_registers_event_without_audio(workdir):
+    monitor = _writer_monitor(workdir)
+    clip_filepath = monitor._clip_filepath
+    # El clip del primer canal no se puede crear (directorio inexistente)
+    monitor._clip_filepath = lambda event: (
+        str(workdir / "no_existe" / "clip.wav") if event.channel == 0 else clip_filepath(event)
+    )
+    _run_writer(monitor)
+    
+    assert [channel for channel, _ in monitor.enqueued] == [0, 1]
+    assert monitor.enqueued[0][1] is None
+    assert os.path.exists(monitor.enqueued[1][1])
+
+
+def test_write_failure_only_aborts_its_own_channel(workdir):
+    monitor = _writer_monitor(workdir)
+    write_clip_chunks = monitor._write_clip_chunks
+    
+    def failing_write(writer, event, next_seq):
+        if event.channel == 0:
+            raise OSError("tarjeta SD llena")
+        return write_clip_chunks(writer, event, next_seq)
+    
+    monitor._write_clip_chunks = failing_write
+    _run_writer(monitor)
+    
+    assert [channel for channel, _ in monitor.enqueued] == [0, 1]
+    assert monitor.enqueued[0][1] is None
+    assert os.path.exists(monitor.enqueued[1][1])
+    assert not any(name.endswith(".part") for name in os.listdir(workdir / "clips"))
@@ -0,0 +1,114 @@
+"""Outbox persistente de eventos y resúmenes acústicos (SQLite)."""
+
+import pytest
+
+import main
+
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def config(workdir):
+    return main.OutboxConfig(
+        database_path=str(workdir / "outbox.db"),
+        base_backoff_seconds=5.0,
+        max_backoff_seconds=600.0
+    )
+
+
+@pytest.fixture
+def outbox(config):
+    outbox = main.AlertOutbox(config)
+    yield outbox
+    outbox.close()
+
+
+def _event(number: int) -> dict:
+    return {"id": f"evento-{number}", "volume_level": number}
+
+
+def test_new_events_go_before_backlog(outbox):
+    first = outbox.enqueue(_event(1), clip_path="a.flac", storage_path="farm/a.flac")
+    second = outbox.enqueue(_event(2))
+    
+    items = outbox.fetch_due(10, now=NOW)
+    assert [item.item_id for item in items] == [first, second]
+    assert items[0].event_data == _event(1)
+    assert (items[0].clip_path, items[0].storage_path, items[0].attempts) == ("a.flac", "farm/a.flac", 0)
+    
+    # El primero falla: queda reprogramado y no está listo hasta su backoff
+    delay = outbox.reschedule(items[:1], "timeout", now=NOW)
+    assert 2.5 <= delay <= 5.0
+    third = outbox.enqueue(_event(3))
+    assert [item.item_id for item in outbox.fetch_due(10, now=NOW)] == [second, third]
+    
+    # Vencido el backoff, las alertas nuevas siguen yendo antes que el atraso
+    due = outbox.fetch_due(10, now=NOW + delay)
+    assert [item.item_id for item in due] == [second, third, first]
+    assert due[-1].attempts == 1
+    
+    outbox.remove([second, third])
+    assert outbox.pending_count() == 1
+    assert outbox.next_due_time() == pytest.approx(NOW + delay)
+
+
+def test_backoff_doubles_up_to_the_cap(outbox, config):
+    for attempts in range(1, 15):
+        nominal = min(config.max_backoff_seconds, config.base_backoff_seconds * 2 ** (attempts - 1))
+        for _ in range(20):
+            assert nominal / 2 <= outbox.backoff_delay(attempts) <= nominal
+    # Sin desbordes con muchísimos intentos
+    assert outbox.backoff_delay(10_000) <= config.max_backoff_seconds
+
+
+def test_release_backlog_makes_retries_due_now(outbox):
+    outbox.enqueue(_event(1))
+    outbox.enqueue(_event(2))
+    items = outbox.fetch_due(10, now=NOW)
+    for _ in range(6):
+        outbox.reschedule(items, "sin conexión", now=NOW)
+    assert outbox.fetch_due(10, now=NOW + 1) == []
+    
+    outbox.release_backlog(now=NOW + 1)
+    due = outbox.fetch_due(10, now=NOW + 1)
+    assert [item.event_data["id"] for item in due] == ["evento-1", "evento-2"]
+    assert all(item.attempts == 6 for item in due)
+
+
+def test_pending_events_survive_reopening(config):
+    outbox = main.AlertOutbox(config)
+    item_id = outbox.enqueue(_event(1), clip_path="a.flac", storage_path="farm/a.flac")
+    outbox.mark_uploaded(item_id, "https://storage/a.flac")
+    outbox.reschedule(outbox.fetch_due(10, now=NOW), "error 503", now=NOW)
+    outbox.enqueue_rollups([{"period_start": "2026-01-01T00:00:00+00:00"}], max_pending=10)
+    outbox.close()
+    
+    reopened = main.AlertOutbox(config)
+    try:
+        assert reopened.pending_count() == 1
+        item, = reopened.fetch_due(10, now=NOW + config.max_backoff_seconds)
+        assert item.event_data == _event(1)
+        assert item.audio_url == "https://storage/a.flac"
+        assert item.attempts == 1
+        assert reopened.pending_rollup_count() == 1
+    finally:
+        reopened.close()
+
+
+def test_mark_uploaded_without_audio_drops_clip_reference(outbox):
+    item_id = outbox.enqueue(_event(1), clip_path="perdido.flac", storage_path="farm/perdido.flac")
+    outbox.mark_uploaded(item_id, None)
+    item, = outbox.fetch_due(10, now=NOW)
+    assert (item.clip_path, item.storage_path, item.audio_url) == (None, None, None)
+
+
+def test_rollup_queue_drops_oldest_rows_over_the_cap(outbox):
+    assert outbox.enqueue_rollups([{"n": n} for n in range(3)], max_pending=5) == 0
+    assert outbox.enqueue_rollups([{"n": n} for n in range(3, 7)], max_pending=5) == 2
+    assert outbox.pending_rollup_count() == 5
+    
+    row_ids, rows = outbox.fetch_rollups(10)
+    assert [row["n"] for row in rows] == [2, 3, 4, 5, 6]
+    outbox.remove_rollups(row_ids[:2])
+    assert [row["n"] for row in outbox.fetch_rollups(10)[1]] == [4, 5, 6]
@@ -0,0 +1,85 @@
+"""Cuantiles en streaming (P²) y umbrales adaptativos al piso de ruido."""
+
+import numpy as np
+import pytest
+
+import main
+
+
+def _lognormal(seed: int, size: int, level: float = 150.0) -> np.ndarray:
+    """RMS de chunks de ruido de galpón: positivo y con cola a la derecha."""
+    return level * np.random.default_rng(seed).lognormal(0.0, 0.5, size)
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.1])
+def test_p2_matches_exact_quantile(q):
+    values = _lognormal(seed=1, size=20000)
+    estimator = main.P2Quantile(q)
+    for value in values:
+        estimator.update(float(value))
+    assert estimator.count == len(values)
+    assert estimator.value == pytest.approx(np.quantile(values, q), rel=0.005)
+
+
+def test_p2_is_exact_with_few_samples():
+    estimator = main.P2Quantile(0.5)
+    assert estimator.value is None
+    for value in (9.0, 1.0, 5.0):
+        estimator.update(value)
+    assert estimator.value == 5.0
+    
+    estimator.reset()
+    assert estimator.count == 0
+    assert estimator.value is None
+
+
+@pytest.mark.parametrize("q", [0.0, 1.0, -0.5])
+def test_p2_rejects_invalid_quantile(q):
+    with pytest.raises(ValueError):
+        main.P2Quantile(q)
+
+
+def test_sliding_quantile_recenters_after_level_shift():
+    horizon = 300.0
+    window = main.SlidingQuantile(0.5, horizon)
+    before = _lognormal(seed=2, size=600, level=100.0)
+    after = _lognormal(seed=3, size=int(horizon), level=400.0)
+    for second, value in enumerate(before):
+        window.update(float(value), float(second))
+    assert window.value == pytest.approx(100.0, rel=0.1)
+    
+    shift = len(before)
+    for second, value in enumerate(after):
+        window.update(float(value), float(shift + second))
+    now = float(shift + len(after) - 1)
+    
+    # Un horizonte después del cambio el piso ya no recuerda el nivel viejo
+    assert window.value == pytest.approx(400.0, rel=0.1)
+    assert horizon / 2 <= window.covered_seconds(now) <= horizon
+
+
+def test_adaptive_thresholds_keep_fixed_values_until_warmed_up():
+    config = main.AnalysisConfig(
+        rms_threshold=300.0,
+        zcr_threshold=80,
+        use_adaptive_thresholds=True,
+        adaptive=main.AdaptiveThresholdConfig(warmup_seconds=30.0, rms_ratio=4.0, min_rms=60.0)
+    )
+    thresholds = main.AdaptiveThresholds(config)
+    chunk_seconds = 1024 / 48000
+    now = 0.0
+    while now < 29.0:
+        thresholds.update(50.0, 20.0, now)
+        now += chunk_seconds
+    assert not thresholds.warmed_up
+    assert thresholds.rms_threshold == 300.0
+    assert thresholds.zcr_threshold == 80.0
+    
+    while now < 31.0:
+        thresholds.update(50.0, 20.0, now)
+        now += chunk_seconds
+    stats = thresholds.get_stats()
+    assert stats.warmed_up
+    assert stats.rms_floor == pytest.approx(50.0)
+    assert stats.rms_threshold == pytest.approx(200.0)  # piso × rms_ratio
+    assert stats.zcr_threshold == 40.0  # min_zcr: el piso × ratio queda por debajo
@@ -0,0 +1,56 @@
+"""Índice de retención de clips en disco."""
+
+import os
+import time
+
+import main
+
+
+def _write(path: str, size: int, age_days: float = 0.0) -> None:
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    mtime = time.time() - age_days * 86400.0
+    os.utime(path, (mtime, mtime))
+
+
+def test_existing_clips_are_kept_when_upload_state_is_unknown(workdir):
+    _write("viejo.wav", 100, age_days=40)
+    retention = main.ClipRetentionManager(main.RetentionConfig(max_age_days=30), str(workdir))
+    try:
+        assert retention.enforce() == 0
+        assert os.path.exists("viejo.wav")
+        assert retention.get_disk_stats().pending_upload_count == 1
+    finally:
+        retention.close()
+
+
+def test_clips_pending_in_outbox_survive_eviction(workdir):
+    _write("pendiente.wav", 100, age_days=40)
+    _write("entregado.wav", 100, age_days=40)
+    outbox_config = main.OutboxConfig(database_path=str(workdir / "outbox.db"))
+    outbox = main.AlertOutbox(outbox_config)
+    outbox.enqueue({"id": "evento-1"}, clip_path="pendiente.wav", storage_path="farm/pendiente.wav")
+    outbox.close()
+    
+    # Índice perdido con el outbox intacto: solo lo no referenciado se da por subido
+    outbox = main.AlertOutbox(outbox_config)
+    assert not outbox.is_new
+    retention = main.ClipRetentionManager(
+        main.RetentionConfig(max_age_days=30), str(workdir), outbox.pending_clip_paths()
+    )
+    try:
+        assert retention.enforce() == 1
+        assert os.path.exists("pendiente.wav")
+        assert not os.path.exists("entregado.wav")
+    finally:
+        retention.close()
+        outbox.close()
+
+
+def test_partial_files_are_removed_on_open(workdir):
+    _write("cortado.flac.part", 100)
+    _write("completo.flac", 100)
+    retention = main.ClipRetentionManager(main.RetentionConfig(), str(workdir))
+    retention.close()
+    assert not os.path.exists("cortado.flac.part")
+    assert os.path.exists("completo.flac")
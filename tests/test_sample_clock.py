@@ -0,0 +1,101 @@
+"""Reloj de muestras: deriva del ADC, reanclaje y conversión a UTC."""
+
+import time
+from datetime import timezone
+
+import numpy as np
+import pytest
+
+import main
+from conftest import CHUNK_SIZE, SAMPLE_RATE
+
+
+CHUNK_SECONDS = CHUNK_SIZE / SAMPLE_RATE
+
+
+def _true_onsets(num_chunks: int, drift_ppm: float = 50.0) -> np.ndarray:
+    """Instantes reales de cada chunk con un cristal de ADC que atrasa ``drift_ppm``."""
+    return 1000.0 + np.arange(num_chunks) * CHUNK_SECONDS * (1 + drift_ppm * 1e-6)
+
+
+def _arrivals(onsets: np.ndarray, seed: int = 5) -> np.ndarray:
+    """Llegadas de los chunks: jitter del scheduler y algún callback muy tardío."""
+    rng = np.random.default_rng(seed)
+    delays = rng.exponential(0.002, len(onsets))
+    stalls = rng.random(len(onsets)) < 0.002
+    delays[stalls] += rng.uniform(0.05, 0.15, stalls.sum())
+    return onsets + delays
+
+
+def test_tracks_adc_drift_from_arrival_times():
+    onsets = _true_onsets(int(600 / CHUNK_SECONDS))
+    clock = main.SampleClock(SAMPLE_RATE, CHUNK_SIZE)
+    for seq, arrival in enumerate(_arrivals(onsets).tolist()):
+        assert clock.observe(seq, arrival, from_adc=False) is None
+    
+    settled = np.arange(int(120 / CHUNK_SECONDS), len(onsets))
+    errors = np.abs([clock.onset(int(seq)) - onsets[seq] for seq in settled])
+    assert np.percentile(errors, 99) < 0.002
+    stats = clock.get_stats()
+    assert stats.drift_ppm == pytest.approx(50.0, abs=10.0)
+    assert stats.resyncs == 0
+    assert stats.arrival_chunks == len(onsets)
+
+
+def test_converges_on_adc_times_without_steps():
+    onsets = _true_onsets(int(420 / CHUNK_SECONDS))
+    clock = main.SampleClock(SAMPLE_RATE, CHUNK_SIZE)
+    for seq, onset in enumerate(onsets.tolist()):
+        assert clock.observe(seq, onset, from_adc=True) is None
+    errors = np.abs([clock.onset(seq) - onset for seq, onset in enumerate(onsets.tolist())])
+    
+    # Mientras el lazo aprende la deriva el error queda por debajo de un chunk
+    assert errors.max() < CHUNK_SECONDS
+    assert errors[int(300 / CHUNK_SECONDS):].max() < 1e-5
+    stats = clock.get_stats()
+    assert stats.drift_ppm == pytest.approx(50.0, abs=1.0)
+    assert stats.adc_chunks == len(onsets)
+
+
+def test_reanchors_after_lost_audio():
+    onsets = _true_onsets(3000)
+    gap_seq, gap_seconds = 2000, 0.3
+    onsets[gap_seq:] += gap_seconds  # Audio perdido: el contador sigue, el tiempo no
+    clock = main.SampleClock(SAMPLE_RATE, CHUNK_SIZE)
+    
+    resyncs = []
+    for seq, onset in enumerate(onsets.tolist()):
+        result = clock.observe(seq, onset, from_adc=True)
+        if result is not None:
+            resyncs.append(result)
+    
+    (start, jump), = resyncs
+    assert start == gap_seq
+    assert jump == pytest.approx(gap_seconds, abs=1e-3)
+    # Los chunks previos conservan su fecha; los posteriores siguen al tramo nuevo
+    assert clock.onset(gap_seq - 1) == pytest.approx(onsets[gap_seq - 1], abs=1e-3)
+    assert clock.onset(gap_seq) == pytest.approx(onsets[gap_seq], abs=1e-3)
+    assert clock.onset(2999) == pytest.approx(onsets[2999], abs=1e-3)
+    assert clock.get_stats().resyncs == 1
+
+
+def test_late_burst_does_not_reanchor():
+    onsets = _true_onsets(3000)
+    arrivals = onsets + 0.001
+    arrivals[1500:1505] += 0.12  # Callbacks demorados que se recuperan enseguida
+    clock = main.SampleClock(SAMPLE_RATE, CHUNK_SIZE)
+    for seq, arrival in enumerate(arrivals.tolist()):
+        assert clock.observe(seq, arrival, from_adc=False) is None
+    assert clock.onset(1502) == pytest.approx(onsets[1502], abs=0.002)
+
+
+def test_unanchored_clock_raises():
+    with pytest.raises(RuntimeError):
+        main.SampleClock(SAMPLE_RATE, CHUNK_SIZE).onset(0)
+
+
+def test_to_datetime_is_utc_aware():
+    now = time.monotonic()
+    moment = main.SampleClock.to_datetime(now)
+    assert moment.tzinfo is timezone.utc
+    assert abs(moment.timestamp() - time.time()) < 0.1
@@ -0,0 +1,94 @@
+"""Máquina de estados de eventos: histéresis de entrada/salida por episodio."""
+
+import numpy as np
+import pytest
+
+import main
+from conftest import SAMPLE_RATE, write_wav
+
+
+QUIET = (50.0, 20.0)  # Bajo ambos umbrales
+LOUD = (500.0, 100.0)  # Supera rms_threshold=300 y zcr_threshold=80: dispara
+VALLEY = (200.0, 20.0)  # Solo supera el umbral de salida (300 × 0.5)
+
+
+def _monitor(segmentation: main.SegmentationConfig) -> "main.BioacousticMonitor":
+    """Monitor sin arrancar sobre una grabación corta: los features se inyectan a mano."""
+    write_wav("silencio.wav", np.zeros(SAMPLE_RATE, dtype=np.int16))
+    audio_config = main.WavReplaySource.config_for("silencio.wav", main.AudioConfig())
+    return main.BioacousticMonitor(
+        audio_config,
+        main.AnalysisConfig(segmentation=segmentation),
+        main.RecordingConfig(codec="wav", pre_trigger_seconds=1.0, duration_seconds=1),
+        source=main.WavReplaySource(audio_config, "silencio.wav")
+    )
+
+
+def _feed(monitor: "main.BioacousticMonitor", frames: list, first_seq: int = 0) -> list:
+    """
+    Procesa una secuencia de (volumen, frecuencia) y retorna los eventos cerrados.
+    """
+    for seq, (volume, frequency) in enumerate(frames, start=first_seq):
+        monitor._process_features(0, seq, main.FeatureFrame(volume=volume, frequency=frequency))
+    events = []
+    while not monitor._alert_queue.empty():
+        command, event = monitor._alert_queue.get_nowait()
+        if command == "close":
+            events.append(event)
+    return events
+
+
+def test_one_event_per_episode():
+    monitor = _monitor(main.SegmentationConfig())
+    post_roll = monitor.source.seconds_to_chunks(monitor.recording_config.duration_seconds)
+    
+    # Episodio: 10 chunks que disparan (pico en el 5°) y 10 de valle que lo sostienen
+    episode = [LOUD] * 10 + [VALLEY] * 10
+    episode[5] = (900.0, 120.0)
+    frames = [QUIET] * 100 + episode + [QUIET] * (post_roll + 20) + [LOUD] * 3 + [QUIET] * (post_roll + 5)
+    events = _feed(monitor, frames)
+    
+    assert len(events) == 2
+    first, second = events
+    assert first.trigger_seq == 100
+    assert first.start_seq == 100 - monitor._pre_roll_chunks
+    assert first.last_active_seq == 119
+    assert first.end_seq == 120 + post_roll
+    assert first.trigger_count == 10
+    assert first.active_chunks == 20
+    assert (first.volume, first.frequency) == (900.0, 120.0)
+    assert first.volume_mean == pytest.approx(sum(v for v, _ in episode) / 20)
+    assert first.frequency_mean == pytest.approx(sum(f for _, f in episode) / 20)
+    
+    assert second.trigger_count == 3
+    assert monitor.get_monitor_stats().triggers_merged == 9 + 2
+    assert monitor.get_alert_counts() == [2]
+
+
+def test_onset_requires_consecutive_detections():
+    monitor = _monitor(main.SegmentationConfig(onset_chunks=3))
+    post_roll = monitor.source.seconds_to_chunks(monitor.recording_config.duration_seconds)
+    frames = [QUIET] * 100 + [LOUD, LOUD, QUIET] + [LOUD] * 4 + [QUIET] * (post_roll + 5)
+    event, = _feed(monitor, frames)
+    
+    # La racha aislada de 2 no abre nada; el episodio empieza en la primera de la racha de 3
+    assert event.trigger_seq == 103
+    assert event.trigger_count == 2  # El 3° abre el evento y el 4° se fusiona
+
+
+def test_long_episode_is_split_at_max_event_seconds():
+    monitor = _monitor(main.SegmentationConfig(max_event_seconds=4.0))
+    max_chunks = monitor._max_event_chunks
+    post_roll = monitor.source.seconds_to_chunks(monitor.recording_config.duration_seconds)
+    loud_chunks = 3 * max_chunks
+    events = _feed(monitor, [QUIET] * 100 + [LOUD] * loud_chunks + [QUIET] * (post_roll + 5))
+    
+    assert len(events) >= 3
+    for event in events:
+        assert event.end_seq - event.start_seq <= max_chunks
+    # Cada parte empieza justo donde terminó la anterior: ningún chunk queda afuera
+    for previous, event in zip(events, events[1:]):
+        assert event.trigger_seq == previous.last_active_seq + 1
+    assert events[0].trigger_seq == 100
+    assert events[-1].last_active_seq == 100 + loud_chunks - 1
+    assert sum(event.trigger_count for event in events) == loud_chunks
@@ -0,0 +1,84 @@
+"""Grabación continua por segmentos: disparos de cada canal en su segmento."""
+
+import os
+
+import numpy as np
+import pytest
+
+import main
+from conftest import CHUNK_SIZE, SAMPLE_RATE, write_wav
+
+
+def test_hit_on_second_channel_at_segment_boundary(workdir, monkeypatch):
+    # El thread de escritura se reemplaza por llamadas explícitas entre canal y canal
+    monkeypatch.setattr(main.SegmentRecorder, "_record_loop", lambda self: None)
+    
+    rng = np.random.default_rng(0)
+    audio = rng.normal(0, 5, (3 * SAMPLE_RATE, 2))
+    hit_seq = 89  # Último tramo del primer segmento de 2 s (94 chunks)
+    start = hit_seq * CHUNK_SIZE
+    audio[start:start + 3 * CHUNK_SIZE, 1] = rng.normal(0, 8000, 3 * CHUNK_SIZE)
+    write_wav("corrales.wav", np.clip(audio, -32768, 32767).astype(np.int16))
+    
+    audio_config = main.WavReplaySource.config_for("corrales.wav", main.AudioConfig())
+    source = main.WavReplaySource(audio_config, "corrales.wav")
+    monitor = main.BioacousticMonitor(
+        audio_config,
+        main.AnalysisConfig(),
+        main.RecordingConfig(
+            output_directory=str(workdir / "clips"),
+            codec="wav",
+            continuous=True,
+            segments=main.SegmentConfig(
+                segment_seconds=2.0, directory=str(workdir / "segmentos"), upload_bytes_per_day=0
+            )
+        ),
+        source=source
+    )
+    segments = monitor.segments
+    
+    # Entre el canal 0 y el canal 1 de cada lote corre una pasada de escritura
+    channel_1 = monitor.analyzers[1]
+    extract_features = channel_1.extract_features
+    
+    def extract_after_write(frames):
+        segments._write_available()
+        return extract_features(frames)
+    
+    channel_1.extract_features = extract_after_write
+    
+    source.start()
+    segments.start(0)
+    while not source.is_exhausted:
+        source.wait_for_chunks(source.get_write_sequence(), max_chunks=1, timeout=0.1)
+    total = source.get_write_sequence()
+    try:
+        for batch_seq in range(0, total, 64):
+            for first_seq, frames in source.iter_chunks(batch_seq, min(batch_seq + 64, total)):
+                monitor._process_frames(first_seq, frames)
+    finally:
+        segments.close()
+        source.stop()
+    
+    names = sorted(name for name in os.listdir(workdir / "segmentos") if name.endswith(".wav"))
+    assert len(names) == 2
+    assert "_disparos1" in names[0] and "_disparos" not in names[1]
+    assert segments.get_stats().segments_with_hits == 1
+    assert segments.retention.pending_uploads(10, hits_only=True)[0][2]["hits"] == [
+        {"offset_seconds": round(hit_seq * CHUNK_SIZE / SAMPLE_RATE, 3), "pen_id": "ch2"}
+    ]
+
+
+def test_segment_directory_shared_with_clips_is_rejected(workdir):
+    write_wav("corrales.wav", np.zeros((SAMPLE_RATE, 1), dtype=np.int16))
+    audio_config = main.WavReplaySource.config_for("corrales.wav", main.AudioConfig())
+    recording_config = main.RecordingConfig(
+        output_directory="grabaciones",
+        continuous=True,
+        segments=main.SegmentConfig(directory=str(workdir / "grabaciones"))
+    )
+    with pytest.raises(ValueError):
+        main.BioacousticMonitor(
+            audio_config, main.AnalysisConfig(), recording_config,
+            source=main.WavReplaySource(audio_config, "corrales.wav")
+        )